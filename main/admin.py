@@ -1,15 +1,34 @@
 from django.contrib import admin
+from django.db import router
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from .models import Character, Episode, Location, SearchHistory
+from .models import Character, Episode, Location, SearchHistory, SearchHistoryRollup
+
+
+class WriterDatabaseAdmin(admin.ModelAdmin):
+    """Админка читает рабочую базу, а не снимок зеркала: правки видны сразу"""
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(router.db_for_write(self.model))
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        kwargs.setdefault('using', router.db_for_write(db_field.related_model))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        kwargs.setdefault('using', router.db_for_write(db_field.related_model))
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
 
 
 @admin.register(Location)
-class LocationAdmin(admin.ModelAdmin):
-    list_display = ['name', 'type', 'dimension', 'api_id', 'created']
+class LocationAdmin(WriterDatabaseAdmin):
+    list_display = ['name', 'type', 'dimension', 'api_id', 'current_characters_count', 'created']
     list_filter = ['type', 'dimension', 'created']
     search_fields = ['name', 'type', 'dimension']
-    readonly_fields = ['api_id', 'url', 'created', 'updated']
+    readonly_fields = [
+        'api_id', 'url', 'created', 'updated',
+        'origin_characters_count', 'current_characters_count'
+    ]
     ordering = ['name']
 
     fieldsets = (
@@ -20,6 +39,10 @@ class LocationAdmin(admin.ModelAdmin):
             'fields': ('api_id', 'url'),
             'classes': ['collapse']
         }),
+        ('Статистика', {
+            'fields': ('origin_characters_count', 'current_characters_count'),
+            'classes': ['collapse']
+        }),
         ('Системная информация', {
             'fields': ('created', 'updated'),
             'classes': ['collapse']
@@ -28,20 +51,16 @@ class LocationAdmin(admin.ModelAdmin):
 
 
 @admin.register(Episode)
-class EpisodeAdmin(admin.ModelAdmin):
+class EpisodeAdmin(WriterDatabaseAdmin):
     list_display = ['name', 'episode', 'air_date', 'api_id', 'characters_count']
-    list_filter = ['air_date', 'created']
+    list_filter = ['season', 'created']
     search_fields = ['name', 'episode']
-    readonly_fields = ['api_id', 'url', 'created', 'updated', 'characters_count']
-    ordering = ['episode']
-
-    def characters_count(self, obj):
-        return obj.characters.count()
-    characters_count.short_description = 'Персонажей'
+    readonly_fields = ['api_id', 'url', 'created', 'updated', 'characters_count', 'season', 'number', 'aired']
+    ordering = ['season', 'number']
 
     fieldsets = (
         ('Основная информация', {
-            'fields': ('name', 'episode', 'air_date')
+            'fields': ('name', 'episode', 'air_date', ('season', 'number', 'aired'))
         }),
         ('API данные', {
             'fields': ('api_id', 'url'),
@@ -59,7 +78,7 @@ class EpisodeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Character)
-class CharacterAdmin(admin.ModelAdmin):
+class CharacterAdmin(WriterDatabaseAdmin):
     list_display = [
         'name', 'status', 'species', 'gender', 
         'origin_name', 'location_name', 'api_id', 'image_preview'
@@ -90,10 +109,6 @@ class CharacterAdmin(admin.ModelAdmin):
         return '-'
     image_preview.short_description = 'Изображение'
 
-    def episodes_count(self, obj):
-        return obj.episodes.count()
-    episodes_count.short_description = 'Эпизодов'
-
     fieldsets = (
         ('Основная информация', {
             'fields': ('name', 'status', 'species', 'type', 'gender')
@@ -139,4 +154,19 @@ class SearchHistoryAdmin(admin.ModelAdmin):
         ('Системная информация', {
             'fields': ('created',),
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(SearchHistoryRollup)
+class SearchHistoryRollupAdmin(admin.ModelAdmin):
+    list_display = ['query', 'search_type', 'day', 'count', 'last_results_count']
+    list_filter = ['search_type', 'day']
+    search_fields = ['query']
+    readonly_fields = ['query', 'search_type', 'day', 'count', 'last_results_count', 'updated']
+    ordering = ['-day', '-count']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
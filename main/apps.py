@@ -1,6 +1,57 @@
+import atexit
+
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        from .models import Character, Episode, Location
+        from .services import search_history_buffer, sync_service
+        from .snapshots import snapshot_store
+        from .trending import trending_tracker
+
+        def flush_buffers(sender, **kwargs):
+            search_history_buffer.flush_if_due()
+            trending_tracker.persist_if_due()
+
+        # Сброс буферов по таймеру проверяется после каждого запроса,
+        # оставшаяся история поиска сохраняется при завершении процесса
+        # (приблизительные счетчики популярных запросов допускают потерю последнего интервала)
+        request_finished.connect(flush_buffers, weak=False, dispatch_uid='main.flush_buffers')
+        atexit.register(search_history_buffer.flush)
+
+        def reopen_snapshot(sender, **kwargs):
+            snapshot_store.reopen_if_published()
+
+        # Новый снимок зеркала подхватывается в начале следующего запроса
+        request_started.connect(reopen_snapshot, weak=False, dispatch_uid='main.reopen_snapshot')
+
+        def capture_related(sender, instance, **kwargs):
+            sync_service.capture_related(instance)
+
+        def record_deletion(sender, instance, **kwargs):
+            sync_service.record_deletion(instance)
+
+        def episodes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+            sync_service.episodes_changed(instance, action, reverse, pk_set)
+
+        def character_saved(sender, instance, created, **kwargs):
+            sync_service.character_saved(instance, created)
+
+        # Счетчики связей обновляются в той же транзакции, что и сами связи
+        m2m_changed.connect(episodes_changed, sender=Character.episodes.through, weak=False,
+                            dispatch_uid='main.counters.episodes')
+        post_save.connect(character_saved, sender=Character, weak=False,
+                          dispatch_uid='main.counters.locations')
+
+        # Удаления из зеркала (админка, команды, queryset.delete()) попадают в ленту изменений
+        for model in (Character, Episode, Location):
+            pre_delete.connect(capture_related, sender=model, weak=False,
+                               dispatch_uid=f'main.counters.{model._meta.model_name}')
+            post_delete.connect(record_deletion, sender=model, weak=False,
+                                dispatch_uid=f'main.tombstone.{model._meta.model_name}')
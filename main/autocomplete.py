@@ -0,0 +1,79 @@
+"""
+Автодополнение названий по префиксу.
+
+Для каждого типа хранится отсортированный список ключей: полное название
+и каждый его "хвост", начинающийся с нового слова ("rick sanchez",
+"sanchez"). Поиск префикса - это bisect по списку, поэтому запрос не
+обращается ни к внешнему API, ни к БД.
+"""
+from bisect import bisect_left
+from typing import Dict, List
+
+from .memory_index import InMemoryIndex
+from .models import Character, Episode, Location
+
+INDEX_MODELS = {
+    'character': Character,
+    'episode': Episode,
+    'location': Location,
+}
+
+MAX_SUGGESTIONS = 8
+
+
+class PrefixTable:
+    """Отсортированный префиксный индекс по именам одного типа"""
+
+    def __init__(self, names: List[str]):
+        self.names: List[str] = sorted(set(filter(None, names)))
+        entries = []
+        for name_id, name in enumerate(self.names):
+            words = name.lower().split()
+            for position in range(len(words)):
+                entries.append((' '.join(words[position:]), position, name_id))
+        entries.sort()
+        self.keys = [key for key, _, _ in entries]
+        self.name_ids = [name_id for _, _, name_id in entries]
+
+    def complete(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> List[str]:
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+
+        seen = set()
+        result = []
+        index = bisect_left(self.keys, prefix)
+        while index < len(self.keys) and self.keys[index].startswith(prefix):
+            name_id = self.name_ids[index]
+            if name_id not in seen:
+                seen.add(name_id)
+                result.append(self.names[name_id])
+                if len(result) >= limit:
+                    break
+            index += 1
+        return result
+
+
+class AutocompleteIndex(InMemoryIndex):
+    """Префиксный индекс по именам персонажей, эпизодов и локаций"""
+
+    def __init__(self):
+        super().__init__()
+        self.tables: Dict[str, PrefixTable] = {}
+
+    def build(self) -> None:
+        self.tables = {
+            search_type: PrefixTable(list(model.objects.order_by().values_list('name', flat=True)))
+            for search_type, model in INDEX_MODELS.items()
+        }
+
+    def complete(self, search_type: str, prefix: str, limit: int = MAX_SUGGESTIONS) -> List[str]:
+        self.ensure_fresh()
+        table = self.tables.get(search_type)
+        if table is None:
+            return []
+        return table.complete(prefix, limit)
+
+
+# Глобальный экземпляр индекса
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,149 @@
+"""
+Пакетные запросы к API: несколько GET запросов за один HTTP запрос.
+
+Подзапросы разрешаются через URLconf и выполняются теми же view, что и
+обычные запросы, поэтому ответы совпадают с отдельными вызовами. Запросы
+к локальному зеркалу быстрые и выполняются по очереди в потоке запроса
+на его соединении с БД. Поиск ждет внешний API, поэтому поисковые
+подзапросы выполняются параллельно в пуле потоков, пока идут остальные.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+# Разрешенные в пакете эндпоинты (имена URL)
+ALLOWED_VIEWS = {
+    'api-character-list', 'api-character-detail',
+    'api-episode-list', 'api-episode-detail',
+    'api-location-list', 'api-location-detail',
+    'api-search', 'api-suggest', 'api-trending', 'api-changes', 'api-facets',
+}
+# Эндпоинты, которые ждут внешний API - выполняются параллельно
+UPSTREAM_VIEWS = {'api-search'}
+
+# Заголовки родительского запроса, которые получают подзапросы (клиент для
+# ограничения частоты поиска определяется так же, как у обычного запроса:
+# из X-Forwarded-For берется только адрес от доверенного прокси, NUM_PROXIES)
+INHERITED_META = (
+    'HTTP_HOST', 'SERVER_NAME', 'SERVER_PORT', 'REMOTE_ADDR', 'HTTP_X_FORWARDED_FOR',
+    'HTTP_X_API_KEY', 'HTTP_ACCEPT_LANGUAGE', 'wsgi.url_scheme',
+)
+
+
+class BatchError(ValueError):
+    """Неверный подзапрос: ответ 400 для этого элемента"""
+
+
+class BatchExecutor:
+    """Выполняет подзапросы пакета и собирает ответы"""
+
+    @property
+    def max_items(self) -> int:
+        return getattr(settings, 'BATCH_MAX_ITEMS', 20)
+
+    @property
+    def max_workers(self) -> int:
+        return getattr(settings, 'BATCH_MAX_WORKERS', 8)
+
+    def build_request(self, parent, item) -> tuple:
+        """HttpRequest подзапроса и найденный view"""
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise BatchError('Ожидается объект с полем path')
+        if item.get('method', 'GET').upper() != 'GET':
+            raise BatchError('Поддерживаются только GET запросы')
+
+        url = urlsplit(item['path'])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            raise BatchError(f'Неизвестный путь: {url.path}')
+        if match.url_name not in ALLOWED_VIEWS:
+            raise BatchError(f'Путь недоступен в пакетном запросе: {url.path}')
+
+        params = item.get('params') or {}
+        if not isinstance(params, dict):
+            raise BatchError('Поле params должно быть объектом')
+        query = QueryDict(url.query, mutable=True)
+        for key, value in params.items():
+            query.setlist(key, value if isinstance(value, list) else [str(value)])
+
+        request = HttpRequest()
+        request.method = 'GET'
+        request.path = request.path_info = url.path
+        request.META = {key: parent.META[key] for key in INHERITED_META if key in parent.META}
+        request.META.update(REQUEST_METHOD='GET', QUERY_STRING=query.urlencode())
+        request.GET = query
+        request.COOKIES = parent.COOKIES
+        request.user = getattr(parent, 'user', None)
+        request._dont_enforce_csrf_checks = True
+        return request, match
+
+    def call(self, request, match) -> Dict:
+        """Выполняет view и возвращает статус и тело ответа"""
+        try:
+            if iscoroutinefunction(match.func):
+                response = async_to_sync(match.func)(request, *match.args, **match.kwargs)
+            else:
+                response = match.func(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+        except Http404 as e:
+            return {'status': 404, 'body': {'detail': str(e)}}
+        except Exception as e:
+            logger.error(f"Batch sub-request {request.path} failed: {e}")
+            return {'status': 500, 'body': {'detail': 'Внутренняя ошибка'}}
+
+        content = response.content
+        try:
+            body = json.loads(content) if content else None
+        except ValueError:
+            body = content.decode(response.charset or 'utf-8', errors='replace')
+        return {'status': response.status_code, 'body': body}
+
+    def call_in_thread(self, request, match) -> Dict:
+        try:
+            return self.call(request, match)
+        finally:
+            # Соединения с БД привязаны к потоку пула
+            connections.close_all()
+
+    def execute(self, parent, items: List) -> List[Dict]:
+        results: List[Dict] = [None] * len(items)
+        local, upstream = [], []
+        for index, item in enumerate(items):
+            try:
+                request, match = self.build_request(parent, item)
+            except BatchError as e:
+                results[index] = {'status': 400, 'body': {'detail': str(e)}}
+                continue
+            (upstream if match.url_name in UPSTREAM_VIEWS else local).append((index, request, match))
+
+        workers = min(self.max_workers, len(upstream))
+        with ThreadPoolExecutor(max_workers=workers or 1) as pool:
+            futures = [
+                (index, pool.submit(self.call_in_thread, request, match))
+                for index, request, match in upstream
+            ]
+            # Локальные подзапросы выполняются, пока поисковые ждут внешний API
+            for index, request, match in local:
+                results[index] = self.call(request, match)
+            for index, future in futures:
+                results[index] = future.result()
+
+        for index, item in enumerate(items):
+            item_id = item.get('id') if isinstance(item, dict) else None
+            results[index] = {'id': index if item_id is None else item_id, **results[index]}
+        return results
+
+
+batch_executor = BatchExecutor()
@@ -0,0 +1,158 @@
+"""
+Потоковая выгрузка локального зеркала в NDJSON и CSV.
+
+Таблица читается через QuerySet.iterator(chunk_size) и отдается по мере
+чтения, поэтому память не зависит от размера таблицы. Связи (эпизоды
+персонажа, персонажи эпизода, жители локации) подтягиваются одним
+запросом на каждую пачку строк - как списки api_id, без загрузки всей
+промежуточной таблицы. Сжатие gzip выполняется на лету.
+"""
+import csv
+from datetime import date, datetime, timezone as dt_timezone
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Character, Episode, Location
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Ресурс -> (модель, колонки, колонки связанных моделей, связь со списком api_id)
+EXPORTS = {
+    'characters': (
+        Character,
+        ('api_id', 'name', 'status', 'species', 'type', 'gender', 'image', 'url', 'created', 'updated'),
+        {'origin_api_id': 'origin__api_id', 'location_api_id': 'location__api_id'},
+        'episodes',
+    ),
+    'episodes': (
+        Episode,
+        ('api_id', 'name', 'air_date', 'episode', 'season', 'number', 'aired', 'url', 'created', 'updated'),
+        {},
+        'characters',
+    ),
+    'locations': (
+        Location,
+        ('api_id', 'name', 'type', 'dimension', 'url', 'created', 'updated'),
+        {},
+        'current_characters',
+    ),
+}
+
+
+def parse_updated_since(value: Optional[str]) -> Optional[datetime]:
+    """Дата или дата-время ISO 8601; ValueError для неверного значения"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+class MirrorExport:
+    """Выгрузка одного ресурса зеркала"""
+
+    def __init__(self, resource: str, updated_since: Optional[datetime] = None):
+        self.model, self.columns, self.related_columns, self.relation = EXPORTS[resource]
+        self.updated_since = updated_since
+
+    @property
+    def chunk_size(self) -> int:
+        return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+    @property
+    def fields(self) -> List[str]:
+        return [*self.columns, *self.related_columns, self.relation]
+
+    def queryset(self):
+        queryset = self.model.objects.all()
+        if self.updated_since is not None:
+            queryset = queryset.filter(updated__gte=self.updated_since)
+        related = {name: F(path) for name, path in self.related_columns.items()}
+        # order_by('pk'): стабильный порядок без сортировки по Meta.ordering
+        return queryset.order_by('pk').values('pk', *self.columns, **related)
+
+    def relation_ids(self, pks: List[int]) -> Dict[int, List[int]]:
+        """api_id связанных записей для пачки строк одним запросом"""
+        related = {pk: [] for pk in pks}
+        rows = (
+            self.model.objects.filter(pk__in=pks, **{f'{self.relation}__isnull': False})
+            .order_by('pk', f'{self.relation}__api_id')
+            .values_list('pk', f'{self.relation}__api_id')
+        )
+        for pk, api_id in rows:
+            related[pk].append(api_id)
+        return related
+
+    def batches(self) -> Iterator[List[Dict]]:
+        """Пачки строк со списками связанных api_id"""
+        rows = self.queryset().iterator(chunk_size=self.chunk_size)
+        while True:
+            batch = list(islice(rows, self.chunk_size))
+            if not batch:
+                return
+            related = self.relation_ids([row['pk'] for row in batch])
+            for row in batch:
+                row[self.relation] = related[row.pop('pk')]
+            yield batch
+
+    def ndjson(self) -> Iterator[bytes]:
+        for batch in self.batches():
+            yield b''.join(orjson.dumps(row) + b'\n' for row in batch)
+
+    def csv(self) -> Iterator[bytes]:
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer)
+        fields = self.fields
+        yield writer.writerow(fields).encode()
+        for batch in self.batches():
+            lines = []
+            for row in batch:
+                row[self.relation] = ' '.join(map(str, row[self.relation]))
+                lines.append(writer.writerow([_csv_value(row[field]) for field in fields]))
+            yield ''.join(lines).encode()
+
+    def stream(self, fmt: str) -> Iterator[bytes]:
+        return self.ndjson() if fmt == 'ndjson' else self.csv()
+
+
+class _LineBuffer:
+    """Псевдо-файл для csv.writer: writerow возвращает строку вместо записи"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+async def aiterate(chunks: Iterator[bytes]):
+    """
+    Асинхронная обертка для ASGI: синхронный итератор StreamingHttpResponse
+    Django читает целиком в память, а так пачки читаются по одной в потоке БД.
+    """
+    chunks = iter(chunks)
+    sentinel = object()
+    while True:
+        chunk = await sync_to_async(next)(chunks, sentinel)
+        if chunk is sentinel:
+            return
+        yield chunk
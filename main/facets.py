@@ -0,0 +1,45 @@
+"""
+Фасеты фильтров списков: значение -> число записей зеркала.
+
+Для каждого фасета (status, gender, species у персонажей; type, dimension у
+локаций) считается число записей по каждому значению при остальных
+активных фильтрах - например, виды среди мертвых персонажей. Счетчики
+берутся из колоночных снимков (main.columnar) без GROUP BY к БД; снимки
+перестраиваются после синхронизации, а посчитанные наборы фильтров
+запоминаются в снимке до следующей перестройки.
+"""
+from typing import Dict, List
+
+from .columnar import character_columns, location_columns
+
+# Ресурс -> колоночный снимок
+FACET_SOURCES = {
+    'characters': character_columns,
+    'locations': location_columns,
+}
+
+
+class FacetService:
+    """Фасеты списков персонажей и локаций из памяти"""
+
+    def facets(self, resource: str, **filters) -> Dict:
+        """Число найденных записей и фасеты (по убыванию числа) для фильтров filters"""
+        table = FACET_SOURCES[resource].current()
+        counts = table.facet_counts(**filters)
+        return {
+            # Без полной синхронизации счетчики покрывают только часть внешнего API
+            'complete': table.complete,
+            'count': table.mask(**filters).bit_count(),
+            'facets': {facet: self.ordered(values) for facet, values in counts.items()},
+        }
+
+    @staticmethod
+    def ordered(values: Dict) -> List[Dict]:
+        return [
+            {'value': value, 'count': count}
+            for value, count in sorted(values.items(), key=lambda item: (-item[1], str(item[0])))
+        ]
+
+
+# Глобальный экземпляр сервиса фасетов
+facet_service = FacetService()
@@ -0,0 +1,96 @@
+"""
+Кэш HTML фрагментов карточек персонажей, эпизодов и локаций.
+
+Одна и та же карточка выводится на списках, в поиске и на страницах эпизодов
+и локаций. Ключ фрагмента - имя фрагмента, id сущности и ее версия: `updated`
+для записей из БД или хэш содержимого для ответов внешнего API, у которых
+нет времени изменения. Изменившаяся сущность получает новый ключ, поэтому
+явная инвалидация не нужна, а старые записи истекают по таймауту.
+"""
+import json
+import time
+import hashlib
+import logging
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .timing import current_timings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'fragment'
+
+
+class FragmentCache:
+    """Кэш фрагментов с ключом по id и версии сущности"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def timeout(self) -> int:
+        return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 3600)
+
+    def version(self, obj) -> Optional[str]:
+        if isinstance(obj, dict):
+            payload = json.dumps(obj, sort_keys=True, default=str)
+            return hashlib.md5(payload.encode()).hexdigest()
+        updated = getattr(obj, 'updated', None)
+        if updated is None:
+            return None
+        return str(int(updated.timestamp() * 1_000_000))
+
+    def make_key(self, fragment: str, obj) -> Optional[str]:
+        entity_id = obj.get('id') if isinstance(obj, dict) else getattr(obj, 'pk', None)
+        version = self.version(obj)
+        if entity_id is None or version is None:
+            return None
+        return f"{KEY_PREFIX}:{fragment}:{entity_id}:{version}"
+
+    def render(self, fragment: str, obj, render_func: Callable[[], str]) -> str:
+        """Возвращает фрагмент из кэша или рендерит и сохраняет его"""
+        key = self.make_key(fragment, obj)
+        if key is None:
+            return render_func()
+
+        started = time.perf_counter()
+        timings = current_timings()
+        try:
+            content = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read fragment cache: {e}")
+            content = None
+
+        if content is not None:
+            self.hits += 1
+            if timings is not None:
+                timings.incr('fragment_hits')
+        else:
+            self.misses += 1
+            content = render_func()
+            try:
+                cache.set(key, str(content), self.timeout)
+            except Exception as e:
+                logger.warning(f"Failed to store fragment in cache: {e}")
+            if timings is not None:
+                timings.incr('fragment_misses')
+
+        if timings is not None:
+            timings.add('fragments', time.perf_counter() - started)
+        return mark_safe(content)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None,
+        }
+
+
+# Глобальный экземпляр кэша фрагментов
+fragment_cache = FragmentCache()
@@ -0,0 +1,220 @@
+"""
+Полнотекстовый индекс по локальному зеркалу данных.
+
+На SQLite используются виртуальные таблицы FTS5 (ранжирование bm25),
+на PostgreSQL - отдельные таблицы с колонкой tsvector и GIN индексом
+(ранжирование ts_rank). Таблицы создаются миграцией 0002_fulltext_index,
+а поддерживаются в актуальном состоянии через DataSyncService.
+"""
+import re
+import logging
+from typing import Dict, List, Optional
+
+from django.db import DatabaseError, connection, connections, router, transaction
+
+from .models import Character, Episode, Location
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Таблица индекса и порядок индексируемых колонок для каждого типа поиска
+INDEX_TABLES = {
+    'character': ('main_character_fts', ['name', 'species', 'type', 'origin_name', 'location_name']),
+    'episode': ('main_episode_fts', ['name', 'episode']),
+    'location': ('main_location_fts', ['name', 'type', 'dimension']),
+}
+
+INDEX_MODELS = {
+    'character': Character,
+    'episode': Episode,
+    'location': Location,
+}
+
+
+def tokenize(query: str) -> List[str]:
+    """Разбивает запрос на токены, отбрасывая синтаксис FTS/tsquery"""
+    return [token.lower() for token in TOKEN_RE.findall(query or '')][:10]
+
+
+def character_document(character: Character) -> Dict[str, str]:
+    """Документ персонажа для индексации"""
+    return {
+        'name': character.name,
+        'species': character.species,
+        'type': character.type,
+        'origin_name': character.origin.name if character.origin_id else '',
+        'location_name': character.location.name if character.location_id else '',
+    }
+
+
+def episode_document(episode: Episode) -> Dict[str, str]:
+    """Документ эпизода для индексации"""
+    return {'name': episode.name, 'episode': episode.episode}
+
+
+def location_document(location: Location) -> Dict[str, str]:
+    """Документ локации для индексации"""
+    return {'name': location.name, 'type': location.type, 'dimension': location.dimension}
+
+
+DOCUMENT_BUILDERS = {
+    'character': character_document,
+    'episode': episode_document,
+    'location': location_document,
+}
+
+
+class FullTextIndex:
+    """Полнотекстовый индекс для персонажей, эпизодов и локаций"""
+
+    @property
+    def vendor(self) -> str:
+        return connection.vendor
+
+    @property
+    def available(self) -> bool:
+        """Индекс поддерживается только на SQLite и PostgreSQL"""
+        return self.vendor in ('sqlite', 'postgresql')
+
+    def index(self, search_type: str, obj) -> None:
+        """Добавляет или обновляет документ в индексе"""
+        if not self.available:
+            return
+        table, columns = INDEX_TABLES[search_type]
+        document = DOCUMENT_BUILDERS[search_type](obj)
+        values = [document[column] or '' for column in columns]
+
+        try:
+            # Савепоинт, чтобы ошибка индекса не прерывала внешнюю транзакцию синхронизации
+            with transaction.atomic(), connection.cursor() as cursor:
+                self._write(cursor, table, columns, obj.pk, values)
+        except DatabaseError as e:
+            logger.warning(f"Full-text index update failed for {search_type} {obj.pk}: {e}")
+
+    def _write(self, cursor, table: str, columns: List[str], pk: int, values: List[str]) -> None:
+        if self.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [pk])
+            cursor.execute(
+                f"INSERT INTO {table} (rowid, {', '.join(columns)}) "
+                f"VALUES (%s, {', '.join(['%s'] * len(columns))})",
+                [pk] + values
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {table} (id, document) "
+                f"VALUES (%s, to_tsvector('simple', %s)) "
+                f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document",
+                [pk, ' '.join(values)]
+            )
+
+    def index_character(self, character: Character) -> None:
+        self.index('character', character)
+
+    def index_episode(self, episode: Episode) -> None:
+        self.index('episode', episode)
+
+    def index_location(self, location: Location) -> None:
+        self.index('location', location)
+
+    def remove(self, search_type: str, pk: int) -> None:
+        """Удаляет документ из индекса"""
+        if not self.available:
+            return
+        table, _ = INDEX_TABLES[search_type]
+        key = 'rowid' if self.vendor == 'sqlite' else 'id'
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {table} WHERE {key} = %s", [pk])
+        except DatabaseError as e:
+            logger.warning(f"Full-text index removal failed for {search_type} {pk}: {e}")
+
+    def rebuild(self, search_type: Optional[str] = None) -> None:
+        """Полностью перестраивает индекс из таблиц моделей"""
+        if not self.available:
+            return
+        search_types = [search_type] if search_type else list(INDEX_TABLES)
+        with connection.cursor() as cursor:
+            for current_type in search_types:
+                table, _ = INDEX_TABLES[current_type]
+                cursor.execute(f"DELETE FROM {table}")
+                cursor.execute(REBUILD_SQL[self.vendor][current_type])
+
+    def search_ids(self, search_type: str, query: str, limit: int = 20) -> List[int]:
+        """Возвращает первичные ключи найденных объектов в порядке релевантности"""
+        tokens = tokenize(query)
+        if not tokens or not self.available:
+            return []
+        table, _ = INDEX_TABLES[search_type]
+
+        # Та же база, из которой читаются найденные строки (снимок зеркала, если включен)
+        with connections[router.db_for_read(Character)].cursor() as cursor:
+            if self.vendor == 'sqlite':
+                # Каждый токен ищется как префикс, токены объединяются через AND
+                match = ' '.join(f'"{token}"*' for token in tokens)
+                cursor.execute(
+                    f"SELECT rowid FROM {table} WHERE {table} MATCH %s "
+                    f"ORDER BY bm25({table}) LIMIT %s",
+                    [match, limit]
+                )
+            else:
+                tsquery = ' & '.join(f'{token}:*' for token in tokens)
+                cursor.execute(
+                    f"SELECT id FROM {table}, to_tsquery('simple', %s) AS query "
+                    f"WHERE document @@ query "
+                    f"ORDER BY ts_rank(document, query) DESC, id LIMIT %s",
+                    [tsquery, limit]
+                )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search(self, search_type: str, query: str, limit: int = 20) -> List:
+        """Возвращает объекты моделей в порядке релевантности"""
+        ids = self.search_ids(search_type, query, limit)
+        model = INDEX_MODELS[search_type]
+        queryset = model.objects.all()
+        if search_type == 'character':
+            queryset = queryset.select_related('origin', 'location')
+        objects = queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+
+# SQL для полной перестройки индекса (используется rebuild())
+REBUILD_SQL = {
+    'sqlite': {
+        'character': (
+            "INSERT INTO main_character_fts (rowid, name, species, type, origin_name, location_name) "
+            "SELECT c.id, c.name, c.species, c.type, COALESCE(o.name, ''), COALESCE(l.name, '') "
+            "FROM main_character c "
+            "LEFT JOIN main_location o ON o.id = c.origin_id "
+            "LEFT JOIN main_location l ON l.id = c.location_id"
+        ),
+        'episode': (
+            "INSERT INTO main_episode_fts (rowid, name, episode) "
+            "SELECT id, name, episode FROM main_episode"
+        ),
+        'location': (
+            "INSERT INTO main_location_fts (rowid, name, type, dimension) "
+            "SELECT id, name, type, dimension FROM main_location"
+        ),
+    },
+    'postgresql': {
+        'character': (
+            "INSERT INTO main_character_fts (id, document) "
+            "SELECT c.id, to_tsvector('simple', concat_ws(' ', c.name, c.species, c.type, o.name, l.name)) "
+            "FROM main_character c "
+            "LEFT JOIN main_location o ON o.id = c.origin_id "
+            "LEFT JOIN main_location l ON l.id = c.location_id"
+        ),
+        'episode': (
+            "INSERT INTO main_episode_fts (id, document) "
+            "SELECT id, to_tsvector('simple', concat_ws(' ', name, episode)) FROM main_episode"
+        ),
+        'location': (
+            "INSERT INTO main_location_fts (id, document) "
+            "SELECT id, to_tsvector('simple', concat_ws(' ', name, type, dimension)) FROM main_location"
+        ),
+    },
+}
+
+# Глобальный экземпляр индекса
+fulltext_index = FullTextIndex()
@@ -0,0 +1,115 @@
+"""
+Нечеткий поиск по названиям с помощью триграммного индекса в памяти.
+
+Используется для подсказок "Возможно, вы имели в виду" при опечатках
+("Rik Sanches" -> "Rick Sanchez"). Имена хранятся один раз (sys.intern),
+списки вхождений триграмм - в array('I'), поэтому индекс по всему зеркалу
+занимает сотни килобайт, а запрос выполняется за доли миллисекунды.
+"""
+import sys
+import heapq
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, List, Set, Tuple
+
+from .memory_index import InMemoryIndex
+from .models import Character, Episode, Location
+
+INDEX_MODELS = {
+    'character': Character,
+    'episode': Episode,
+    'location': Location,
+}
+
+# Минимальное сходство кандидата (как порог по умолчанию в pg_trgm)
+SIMILARITY_THRESHOLD = 0.3
+
+
+def trigrams(text: str) -> Set[str]:
+    """Триграммы строки в стиле pg_trgm: каждое слово дополняется пробелами"""
+    result = set()
+    for word in text.lower().split():
+        padded = f'  {word} '
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+class TrigramTable:
+    """Триграммный индекс по именам одного типа"""
+
+    def __init__(self, names: List[str]):
+        self.names: List[str] = []
+        self.sizes = array('H')
+        postings: Dict[str, List[int]] = defaultdict(list)
+
+        for name in sorted(set(filter(None, names))):
+            grams = trigrams(name)
+            if not grams:
+                continue
+            name_id = len(self.names)
+            self.names.append(sys.intern(name))
+            self.sizes.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                postings[gram].append(name_id)
+
+        self.postings: Dict[str, array] = {
+            sys.intern(gram): array('I', ids) for gram, ids in postings.items()
+        }
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Возвращает лучшие совпадения в виде (имя, сходство)"""
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        shared = Counter()
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is not None:
+                shared.update(ids)
+
+        query_size = len(grams)
+        sizes = self.sizes
+        scored = (
+            (count / (query_size + sizes[name_id] - count), name_id)
+            for name_id, count in shared.items()
+        )
+        best = heapq.nlargest(
+            limit,
+            (item for item in scored if item[0] >= SIMILARITY_THRESHOLD)
+        )
+        return [(self.names[name_id], round(score, 3)) for score, name_id in best]
+
+
+class FuzzyNameIndex(InMemoryIndex):
+    """Триграммный индекс по именам персонажей, эпизодов и локаций"""
+
+    def __init__(self):
+        super().__init__()
+        self.tables: Dict[str, TrigramTable] = {}
+
+    def build(self) -> None:
+        self.tables = {
+            search_type: TrigramTable(list(model.objects.order_by().values_list('name', flat=True)))
+            for search_type, model in INDEX_MODELS.items()
+        }
+
+    def search(self, search_type: str, query: str, limit: int = 5) -> List[Tuple[str, float]]:
+        self.ensure_fresh()
+        table = self.tables.get(search_type)
+        if table is None:
+            return []
+        return table.search(query, limit)
+
+    def suggest(self, search_type: str, query: str, limit: int = 5) -> List[str]:
+        """Варианты "Возможно, вы имели в виду" без самого запроса"""
+        normalized = (query or '').strip().lower()
+        return [
+            name for name, _ in self.search(search_type, query, limit + 1)
+            if name.lower() != normalized
+        ][:limit]
+
+
+# Глобальный экземпляр индекса
+fuzzy_index = FuzzyNameIndex()
@@ -0,0 +1,77 @@
+"""
+Карточки персонажей для состава эпизода и жителей локации.
+
+Ответ API содержит только ссылки на персонажей. Вместо запроса на каждую
+ссылку карточки собираются за один шаг: сначала из локального зеркала,
+а промахи - одним запросом к API по нескольким id (`character/1,2,3`).
+Разрешаются только id текущей страницы состава, поэтому даже эпизод
+с сотней персонажей стоит не больше одного запроса к API.
+"""
+import logging
+from typing import Dict, List
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+
+from .models import Character
+
+logger = logging.getLogger(__name__)
+
+
+def parse_character_ids(urls: List[str]) -> List[int]:
+    """id персонажей из ссылок вида .../api/character/42"""
+    ids = []
+    for url in urls or []:
+        try:
+            ids.append(int(str(url).rstrip('/').split('/')[-1]))
+        except ValueError:
+            logger.warning(f"Could not parse character URL: {url}")
+    return ids
+
+
+def cast_page(urls: List[str], page_number) -> Page:
+    """Страница состава: id персонажей, которые нужно показать"""
+    page_size = getattr(settings, 'CAST_PAGE_SIZE', 24)
+    return Paginator(parse_character_ids(urls), page_size).get_page(page_number)
+
+
+def card(api_id: int, name: str, image: str, status: str, species: str) -> Dict:
+    return {'id': api_id, 'name': name, 'image': image, 'status': status, 'species': species}
+
+
+def mirror_cards(api_ids: List[int]) -> Dict[int, Dict]:
+    """Карточки персонажей, которые уже есть в локальном зеркале"""
+    rows = Character.objects.filter(api_id__in=api_ids).values_list(
+        'api_id', 'name', 'image', 'status', 'species'
+    )
+    return {row[0]: card(*row) for row in rows}
+
+
+def payload_card(data: Dict) -> Dict:
+    return card(data['id'], data.get('name', ''), data.get('image', ''),
+                data.get('status', 'unknown'), data.get('species', ''))
+
+
+def _merge(api_ids: List[int], found: Dict[int, Dict], fetched: List[Dict]) -> List[Dict]:
+    for data in fetched:
+        found[data['id']] = payload_card(data)
+    return [found[api_id] for api_id in api_ids if api_id in found]
+
+
+def hydrate_characters(api_ids: List[int], service) -> List[Dict]:
+    """Карточки в исходном порядке: зеркало плюс один запрос к API за промахами"""
+    api_ids = list(api_ids)
+    found = mirror_cards(api_ids)
+    missing = [api_id for api_id in api_ids if api_id not in found]
+    fetched = service.get_characters_batch(missing) if missing else []
+    return _merge(api_ids, found, fetched)
+
+
+async def ahydrate_characters(api_ids: List[int], service) -> List[Dict]:
+    """Асинхронный вариант hydrate_characters для AsyncRickAndMortyAPIService"""
+    api_ids = list(api_ids)
+    found = await sync_to_async(mirror_cards)(api_ids)
+    missing = [api_id for api_id in api_ids if api_id not in found]
+    fetched = await service.get_characters_batch(missing) if missing else []
+    return _merge(api_ids, found, fetched)
@@ -0,0 +1,104 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.models import Character, Location
+from main.fulltext import fulltext_index
+import random
+import time
+
+
+SYLLABLES = ['ri', 'ck', 'mor', 'ty', 'sum', 'mer', 'beth', 'jer', 'ry', 'squan', 'chy',
+             'bird', 'per', 'son', 'gaz', 'or', 'pi', 'ckle', 'zar', 'glo', 'mi', 'no']
+SPECIES = ['Human', 'Alien', 'Robot', 'Humanoid', 'Animal', 'Cronenberg', 'Mythological Creature']
+QUERIES = ['rick', 'morty sanchez', 'squanchy', 'bird person', 'human', 'zarglo', 'nonexistent']
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает полнотекстовый индекс и icontains на синтетическом наборе данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=100000,
+            help='Количество синтетических персонажей (по умолчанию: 100000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Количество повторов каждого запроса (по умолчанию: 20)',
+        )
+
+    def handle(self, *args, **options):
+        if not fulltext_index.available:
+            self.stdout.write(self.style.ERROR('❌ Полнотекстовый индекс недоступен для этой СУБД'))
+            return
+
+        # Все данные создаются внутри транзакции и откатываются в конце
+        with transaction.atomic():
+            self.populate(options['rows'])
+            self.run_benchmark(options['repeat'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('✅ Бенчмарк завершен, синтетические данные удалены'))
+
+    def random_name(self, rng):
+        words = [
+            ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+            for _ in range(2)
+        ]
+        return ' '.join(words)
+
+    def populate(self, rows):
+        """Создает синтетические локации и персонажей"""
+        self.stdout.write(f'📦 Создаем {rows} синтетических персонажей...')
+        rng = random.Random(42)
+        start = time.perf_counter()
+
+        offset = 10_000_000  # api_id за пределами реальных данных
+        locations = Location.objects.bulk_create([
+            Location(api_id=offset + i, name=self.random_name(rng), type='Planet', dimension=f'D-{i}')
+            for i in range(500)
+        ])
+        characters = (
+            Character(
+                api_id=offset + i,
+                name=self.random_name(rng),
+                status=rng.choice(['alive', 'dead', 'unknown']),
+                species=rng.choice(SPECIES),
+                gender=rng.choice(['female', 'male', 'genderless', 'unknown']),
+                origin=rng.choice(locations),
+                location=rng.choice(locations),
+            )
+            for i in range(rows)
+        )
+        Character.objects.bulk_create(characters, batch_size=5000)
+        fulltext_index.rebuild()
+
+        self.stdout.write(f'⏱️  Данные и индекс подготовлены за {time.perf_counter() - start:.1f} с')
+
+    def timed(self, func, repeat):
+        timings = []
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings[len(timings) // 2] * 1000, result
+
+    def run_benchmark(self, repeat):
+        self.stdout.write(f'{"Запрос":<16}{"icontains, мс":>16}{"FTS, мс":>12}{"найдено (icontains/FTS)":>28}')
+        for query in QUERIES:
+            icontains_ms, icontains_ids = self.timed(
+                lambda: list(Character.objects.filter(name__icontains=query).values_list('id', flat=True)[:20]),
+                repeat
+            )
+            fts_ms, fts_ids = self.timed(
+                lambda: fulltext_index.search_ids('character', query, 20),
+                repeat
+            )
+            self.stdout.write(
+                f'{query:<16}{icontains_ms:>16.2f}{fts_ms:>12.2f}'
+                f'{f"{len(icontains_ids)}/{len(fts_ids)}":>28}'
+            )
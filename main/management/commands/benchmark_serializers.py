@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from main.models import Character, Episode, Location
+from main.serializers import CharacterListSerializer, EpisodeSerializer, LocationSerializer
+from main.fast_serialization import fast_row_serializer
+from main.renderers import ORJSONRenderer
+from main.views import characters_with_relations
+import json
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает ModelSerializer + JSONRenderer и FastRowSerializer + orjson на списках API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=2000,
+            help='Количество синтетических записей каждого типа (по умолчанию: 2000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Количество повторов каждого замера (по умолчанию: 50)',
+        )
+
+    def handle(self, *args, **options):
+        # Все данные создаются внутри транзакции и откатываются в конце
+        with transaction.atomic():
+            self.populate(options['rows'])
+            self.run_benchmark(options['repeat'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('✅ Бенчмарк завершен, синтетические данные удалены'))
+
+    def populate(self, rows):
+        """Создает синтетические локации, эпизоды и персонажей"""
+        self.stdout.write(f'📦 Создаем по {rows} синтетических записей...')
+        rng = random.Random(42)
+        offset = 10_000_000  # api_id за пределами реальных данных
+        locations = Location.objects.bulk_create([
+            Location(api_id=offset + i, name=f'Planet {i}', type='Planet', dimension=f'D-{i}')
+            for i in range(rows)
+        ])
+        Episode.objects.bulk_create([
+            Episode(api_id=offset + i, name=f'Episode {i}', episode=f'S{i // 100:02d}E{i % 100:02d}')
+            for i in range(rows)
+        ])
+        Character.objects.bulk_create([
+            Character(
+                api_id=offset + i,
+                name=f'Character {i}',
+                status=rng.choice(['alive', 'dead', 'unknown']),
+                gender=rng.choice(['female', 'male', 'genderless', 'unknown']),
+                origin=rng.choice(locations),
+                location=rng.choice(locations),
+            )
+            for i in range(rows)
+        ], batch_size=5000)
+
+    def timed(self, func, repeat):
+        timings = []
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings[len(timings) // 2] * 1000, result
+
+    def run_benchmark(self, repeat):
+        cases = [
+            (CharacterListSerializer, characters_with_relations()),
+            (EpisodeSerializer, Episode.objects.all()),
+            (LocationSerializer, Location.objects.all()),
+        ]
+        self.stdout.write(
+            f'{"Сериализатор":<26}{"строк":>7}{"DRF, мс":>10}{"fast, мс":>10}'
+            f'{"DRF, стр/с":>12}{"fast, стр/с":>13}{"ускорение":>11}'
+        )
+        for serializer_class, queryset in cases:
+            fast = fast_row_serializer(serializer_class)
+            for size in (20, 100):
+                page = queryset.order_by('name', 'id')
+                drf_ms, drf_body = self.timed(
+                    lambda: JSONRenderer().render(serializer_class(list(page[:size]), many=True).data),
+                    repeat
+                )
+                fast_ms, fast_body = self.timed(
+                    lambda: ORJSONRenderer().render(fast.serialize(page.values(*fast.columns)[:size])),
+                    repeat
+                )
+                if json.loads(drf_body) != json.loads(fast_body):
+                    self.stdout.write(self.style.ERROR(f'❌ {serializer_class.__name__}: ответы различаются'))
+                self.stdout.write(
+                    f'{serializer_class.__name__:<26}{size:>7}{drf_ms:>10.2f}{fast_ms:>10.2f}'
+                    f'{size / drf_ms * 1000:>12.0f}{size / fast_ms * 1000:>13.0f}{drf_ms / fast_ms:>10.1f}x'
+                )
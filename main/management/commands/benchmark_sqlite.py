@@ -0,0 +1,213 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, transaction
+from main.models import Character, Episode, Location, SearchHistory
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = (('default', '0'), ('tuned', '1'))
+# Продакшен-настройки (DEBUG=False) перенаправляют на HTTPS, если запрос пришел не через прокси
+PROXY_HEADERS = {'X-Forwarded-Proto': 'https'}
+READ_PATHS = (
+    '/api/characters/?status=alive',
+    '/api/characters/?page_size=50',
+    '/api/episodes/?season=1',
+    '/api/locations/',
+)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLite со стандартными настройками и профиль SQLITE_TUNED: '
+        'чтение API через несколько воркеров gunicorn при параллельной записи'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Воркеров gunicorn (по умолчанию: 4)')
+        parser.add_argument('--readers', type=int, default=16, help='Параллельных HTTP клиентов (по умолчанию: 16)')
+        parser.add_argument('--writers', type=int, default=2, help='Процессов записи (по умолчанию: 2)')
+        parser.add_argument('--seconds', type=float, default=10, help='Длительность замера (по умолчанию: 10)')
+        parser.add_argument('--rows', type=int, default=2000, help='Синтетических персонажей (по умолчанию: 2000)')
+        parser.add_argument('--port', type=int, default=8765, help='Порт gunicorn (по умолчанию: 8765)')
+        # Внутренние роли дочерних процессов
+        parser.add_argument('--role', choices=['prepare', 'write'], help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['role'] == 'prepare':
+            return self.prepare(options['rows'])
+        if options['role'] == 'write':
+            return self.write_loop(options['seconds'])
+
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise CommandError('Для бенчмарка нужен пакет httpx')
+
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for profile, tuned in PROFILES:
+                env = {
+                    **os.environ,
+                    'SQLITE_PATH': os.path.join(tmp, f'{profile}.sqlite3'),
+                    'SQLITE_TUNED': tuned,
+                    'DEBUG': 'False',
+                }
+                env.pop('DATABASE_URL', None)
+                self.stdout.write(f'📦 {profile}: создаем базу и {options["rows"]} синтетических персонажей...')
+                self.manage(env, 'migrate', '-v0')
+                self.manage(env, 'benchmark_sqlite', '--role', 'prepare', '--rows', str(options['rows']))
+                results[profile] = self.run_profile(env, options)
+
+        self.report(results, options['seconds'])
+        self.stdout.write(self.style.SUCCESS('✅ Бенчмарк завершен, временные базы удалены'))
+
+    def manage(self, env, *args, **kwargs):
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args]
+        return subprocess.run(command, env=env, check=True, cwd=settings.BASE_DIR, **kwargs)
+
+    def prepare(self, rows):
+        """Синтетические локации, эпизоды и персонажи с api_id от 1"""
+        rng = random.Random(42)
+        locations = Location.objects.bulk_create([
+            Location(api_id=i + 1, name=f'Planet {i}', type='Planet', dimension=f'D-{i % 40}')
+            for i in range(max(rows // 10, 1))
+        ])
+        Episode.objects.bulk_create([
+            Episode(api_id=i + 1, name=f'Episode {i}', episode=f'S{i // 10 + 1:02d}E{i % 10 + 1:02d}',
+                    season=i // 10 + 1, number=i % 10 + 1)
+            for i in range(50)
+        ])
+        Character.objects.bulk_create([
+            Character(
+                api_id=i + 1,
+                name=f'Character {rng.randint(0, 10 ** 6)}',
+                status=rng.choice(['alive', 'dead', 'unknown']),
+                gender=rng.choice(['female', 'male', 'genderless', 'unknown']),
+                origin=rng.choice(locations),
+                location=rng.choice(locations),
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+
+    def write_loop(self, seconds):
+        """Запись как у sync_data и буфера истории: чтение и обновление строки в одной транзакции"""
+        rng = random.Random(os.getpid())
+        pks = list(Character.objects.values_list('pk', flat=True))
+        ok, errors, timings = 0, 0, []
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    character = Character.objects.get(pk=rng.choice(pks))
+                    character.name = f'Character {rng.randint(0, 10 ** 6)}'
+                    character.save()
+                    SearchHistory.objects.bulk_create([
+                        SearchHistory(query=f'q{rng.randint(0, 1000)}', search_type='character', results_count=1)
+                        for _ in range(10)
+                    ])
+                ok += 1
+                timings.append(time.perf_counter() - start)
+            except OperationalError:
+                errors += 1
+        self.stdout.write(json.dumps({'ok': ok, 'errors': errors, 'timings': timings}))
+
+    def run_profile(self, env, options):
+        import httpx
+
+        base_url = f'http://127.0.0.1:{options["port"]}'
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'rick_and_morty_app.wsgi:application',
+             '-w', str(options['workers']), '-b', f'127.0.0.1:{options["port"]}', '--log-level', 'error'],
+            env=env, cwd=settings.BASE_DIR,
+        )
+        try:
+            self.wait_ready(base_url)
+            writers = [
+                subprocess.Popen(
+                    [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_sqlite',
+                     '--role', 'write', '--seconds', str(options['seconds'])],
+                    env=env, cwd=settings.BASE_DIR, stdout=subprocess.PIPE, text=True,
+                )
+                for _ in range(options['writers'])
+            ]
+
+            reads = {'ok': 0, 'errors': 0, 'timings': []}
+            lock = threading.Lock()
+            deadline = time.monotonic() + options['seconds']
+
+            def reader(seed):
+                rng = random.Random(seed)
+                with httpx.Client(base_url=base_url, headers=PROXY_HEADERS, timeout=30) as client:
+                    while time.monotonic() < deadline:
+                        path = rng.choice(READ_PATHS + (f'/api/characters/{rng.randint(1, options["rows"])}/',))
+                        start = time.perf_counter()
+                        try:
+                            status = client.get(path).status_code
+                        except httpx.HTTPError:
+                            status = None
+                        elapsed = time.perf_counter() - start
+                        with lock:
+                            if status == 200:
+                                reads['ok'] += 1
+                                reads['timings'].append(elapsed)
+                            else:
+                                reads['errors'] += 1
+
+            threads = [threading.Thread(target=reader, args=(seed,)) for seed in range(options['readers'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            writes = {'ok': 0, 'errors': 0, 'timings': []}
+            for writer in writers:
+                output, _ = writer.communicate()
+                result = json.loads(output.strip().splitlines()[-1])
+                for key in writes:
+                    writes[key] += result[key]
+            return {'reads': reads, 'writes': writes}
+        finally:
+            server.terminate()
+            server.wait()
+
+    def wait_ready(self, base_url, timeout=30):
+        import httpx
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f'{base_url}/api/episodes/', headers=PROXY_HEADERS, timeout=2).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise CommandError('gunicorn не запустился')
+
+    def report(self, results, seconds):
+        self.stdout.write(
+            f'{"Профиль":<10}{"чтений/с":>10}{"ошибок":>8}{"p95, мс":>10}'
+            f'{"записей/с":>12}{"ошибок":>8}{"p95, мс":>10}'
+        )
+        for profile, result in results.items():
+            reads, writes = result['reads'], result['writes']
+            self.stdout.write(
+                f'{profile:<10}{reads["ok"] / seconds:>10.1f}{reads["errors"]:>8}'
+                f'{percentile(reads["timings"], 0.95):>10.1f}'
+                f'{writes["ok"] / seconds:>12.1f}{writes["errors"]:>8}'
+                f'{percentile(writes["timings"], 0.95):>10.1f}'
+            )
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main.services import search_history_buffer
+
+
+class Command(BaseCommand):
+    help = 'Удаляет старые записи истории поиска (дневные агрегаты сохраняются)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.SEARCH_HISTORY_RETENTION_DAYS,
+            help=f'Хранить записи за последние N дней (по умолчанию: {settings.SEARCH_HISTORY_RETENTION_DAYS})',
+        )
+
+    def handle(self, *args, **options):
+        deleted = search_history_buffer.prune(options['days'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Удалено {deleted} записей истории поиска старше {options["days"]} дней')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.snapshots import snapshot_store
+
+
+class Command(BaseCommand):
+    help = 'Публикует снимок зеркала для чтения (ANALYZE + VACUUM INTO, переключение current.sqlite3)'
+
+    def handle(self, *args, **options):
+        if not snapshot_store.enabled:
+            raise CommandError('Режим снимков выключен: задайте SNAPSHOT_DIR (только для SQLite)')
+        path = snapshot_store.publish()
+        self.stdout.write(self.style.SUCCESS(f'✅ Опубликован снимок {path}'))
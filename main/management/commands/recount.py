@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.models import Character, Episode, Location
+from main.services import sync_service
+
+
+class Command(BaseCommand):
+    help = 'Сверяет хранимые счетчики связей с фактическими и исправляет расхождения'
+
+    def handle(self, *args, **options):
+        total = 0
+        for model in (Character, Episode, Location):
+            with transaction.atomic():
+                fixed = sync_service.recount(model)
+            total += fixed
+            self.stdout.write(f'🔢 {model._meta.verbose_name_plural}: исправлено {fixed}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Счетчики сверены, исправлено строк: {total}'))
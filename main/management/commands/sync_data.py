@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand, CommandError
 from main.services import api_service, sync_service
-from main.models import Character, Episode, Location
+from main.models import Character, Episode, Location, MirrorCoverage
+from main.page_cache import page_cache
+from main.snapshots import snapshot_store
 import time
 
 
@@ -33,18 +35,31 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         limit = options['limit']
         
-        if not any([options['characters'], options['episodes'], options['locations']]):
-            # Если не указаны конкретные типы, синхронизируем все
-            self.sync_characters(limit)
-            self.sync_episodes(limit)
-            self.sync_locations(limit)
-        else:
-            if options['characters']:
+        with page_cache.record_purges() as purged:
+            if not any([options['characters'], options['episodes'], options['locations']]):
+                # Если не указаны конкретные типы, синхронизируем все
                 self.sync_characters(limit)
-            if options['episodes']:
                 self.sync_episodes(limit)
-            if options['locations']:
                 self.sync_locations(limit)
+                page_cache.purge('list:characters', 'list:episodes', 'list:locations')
+            else:
+                if options['characters']:
+                    self.sync_characters(limit)
+                    page_cache.purge('list:characters')
+                if options['episodes']:
+                    self.sync_episodes(limit)
+                    page_cache.purge('list:episodes')
+                if options['locations']:
+                    self.sync_locations(limit)
+                    page_cache.purge('list:locations')
+
+        if snapshot_store.enabled:
+            # Чтение переключается на новый снимок зеркала (SNAPSHOT_DIR)
+            path = snapshot_store.publish()
+            self.stdout.write(f'📸 Опубликован снимок {path}')
+            # Страницы, отрисованные во время синхронизации и VACUUM INTO, читали
+            # старый снимок, но закэшированы с новыми версиями тегов - сбрасываем еще раз
+            page_cache.purge(*purged)
 
         self.stdout.write(
             self.style.SUCCESS('✅ Синхронизация завершена!')
@@ -66,6 +81,9 @@ class Command(BaseCommand):
                     self.style.WARNING(f'⚠️  Не удалось получить данные со страницы {page}')
                 )
                 break
+            if page == 1:
+                # Полнота зеркала: списки из памяти включаются, когда записей не меньше
+                MirrorCoverage.record('character', api_data.get('info', {}).get('count', 0))
                 
             for char_data in api_data['results']:
                 try:
@@ -107,6 +125,8 @@ class Command(BaseCommand):
             api_data = api_service.get_episodes(page=page)
             if not api_data or 'results' not in api_data:
                 break
+            if page == 1:
+                MirrorCoverage.record('episode', api_data.get('info', {}).get('count', 0))
                 
             for episode_data in api_data['results']:
                 try:
@@ -147,6 +167,8 @@ class Command(BaseCommand):
             api_data = api_service.get_locations(page=page)
             if not api_data or 'results' not in api_data:
                 break
+            if page == 1:
+                MirrorCoverage.record('location', api_data.get('info', {}).get('count', 0))
                 
             for location_data in api_data['results']:
                 try:
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from main.services import warm_trending_cache
+
+
+class Command(BaseCommand):
+    help = 'Прогревает кэш API для популярных поисковых запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Количество популярных запросов для прогрева (по умолчанию: 10)',
+        )
+
+    def handle(self, *args, **options):
+        warmed = warm_trending_cache(options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Прогрето запросов: {warmed}'))
@@ -0,0 +1,75 @@
+"""
+Базовый класс для индексов, которые держатся в памяти процесса.
+
+Индекс строится из локального зеркала при первом обращении и перестраивается,
+когда меняется сигнатура данных (количество строк и максимальный `updated`
+по каждой модели). Сигнатура проверяется не чаще раза в `refresh_interval`
+секунд, поэтому изменения, записанные другим процессом (например,
+`manage.py sync_data`), подхватываются без общей памяти между воркерами.
+"""
+import time
+import logging
+import threading
+from typing import Optional, Tuple
+
+from django.db.models import Count, Max
+
+from .models import Character, Episode, Location
+
+logger = logging.getLogger(__name__)
+
+
+def mirror_signature() -> Tuple:
+    """Дешевая сигнатура состояния локального зеркала"""
+    signature = []
+    for model in (Character, Episode, Location):
+        stats = model.objects.order_by().aggregate(count=Count('id'), updated=Max('updated'))
+        signature.append((stats['count'], stats['updated']))
+    return tuple(signature)
+
+
+class InMemoryIndex:
+    """Индекс в памяти с ленивой сборкой и перестройкой после синхронизации"""
+
+    refresh_interval = 30
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._built = False
+
+    def build(self) -> None:
+        """Строит индекс из БД; реализуется в наследниках"""
+        raise NotImplementedError
+
+    def ensure_fresh(self) -> None:
+        """Строит индекс при первом обращении и перестраивает его при изменении данных"""
+        if self._checked_at and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            if self._checked_at and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            try:
+                signature = mirror_signature()
+                if not self._built or signature != self._signature:
+                    started = time.perf_counter()
+                    self.build()
+                    self._signature = signature
+                    self._built = True
+                    logger.info(
+                        f"{self.__class__.__name__} rebuilt in "
+                        f"{(time.perf_counter() - started) * 1000:.1f} ms"
+                    )
+            except Exception as e:
+                logger.warning(f"Failed to build {self.__class__.__name__}: {e}")
+            finally:
+                self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Принудительно перестраивает индекс при следующем обращении"""
+        with self._lock:
+            self._built = False
+            self._signature = None
+            self._checked_at = 0.0
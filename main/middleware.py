@@ -3,18 +3,26 @@ Middleware для мониторинга базы данных (только д
 """
 import logging
 import os
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.db import connection
 from django.conf import settings
 from django.http import JsonResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .timing import start_request_timings, finish_request_timings
 
 logger = logging.getLogger(__name__)
 
 class DatabaseInitMiddleware:
     """Middleware для мониторинга базы данных (только на production)"""
+    sync_capable = True
+    async_capable = True
     
     def __init__(self, get_response):
         self.get_response = get_response
         self.db_checked = False
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
         
         # Запускаем проверку только в production окружении
         self.is_production = os.environ.get('RENDER') or not settings.DEBUG
@@ -52,7 +60,18 @@ class DatabaseInitMiddleware:
         finally:
             self.db_checked = True
     
+    def unhealthy_response(self):
+        logger.error("Database is unhealthy, returning 503")
+        return JsonResponse({
+            'error': 'Database not initialized',
+            'message': 'Please wait for database initialization to complete',
+            'status': 503
+        }, status=503)
+    
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        
         # Для health endpoint - всегда проверяем БД
         if request.path == '/health/':
             # Пропускаем middleware для health check
@@ -65,12 +84,75 @@ class DatabaseInitMiddleware:
             
             # Если БД нездорова, возвращаем 503 Service Unavailable
             if not db_healthy:
-                logger.error("Database is unhealthy, returning 503")
-                return JsonResponse({
-                    'error': 'Database not initialized',
-                    'message': 'Please wait for database initialization to complete',
-                    'status': 503
-                }, status=503)
+                return self.unhealthy_response()
             
         response = self.get_response(request)
         return response
+    
+    async def __acall__(self, request):
+        if request.path != '/health/' and not self.db_checked and self.is_production:
+            if not await sync_to_async(self.check_database_health)():
+                return self.unhealthy_response()
+        return await self.get_response(request)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, который не выключает асинхронный режим под ASGI.
+    
+    Синхронный middleware в цепочке заставляет Django держать поток на каждый
+    запрос, и async views теряют смысл. Поиск файла - это обращение к словарю
+    в памяти, поэтому его можно выполнить прямо в event loop.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+    
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestTimingMiddleware:
+    """Добавляет к ответу заголовок Server-Timing с замерами запроса"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = start_request_timings()
+        try:
+            response = self.get_response(request)
+            response['Server-Timing'] = timings.server_timing()
+            return response
+        finally:
+            finish_request_timings(token)
+
+    async def __acall__(self, request):
+        timings, token = start_request_timings()
+        try:
+            response = await self.get_response(request)
+            response['Server-Timing'] = timings.server_timing()
+            return response
+        finally:
+            finish_request_timings(token)
@@ -0,0 +1,77 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS main_character_fts USING fts5("
+    "name, species, type, origin_name, location_name, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS main_episode_fts USING fts5("
+    "name, episode, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS main_location_fts USING fts5("
+    "name, type, dimension, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO main_character_fts (rowid, name, species, type, origin_name, location_name) "
+    "SELECT c.id, c.name, c.species, c.type, COALESCE(o.name, ''), COALESCE(l.name, '') "
+    "FROM main_character c "
+    "LEFT JOIN main_location o ON o.id = c.origin_id "
+    "LEFT JOIN main_location l ON l.id = c.location_id",
+    "INSERT INTO main_episode_fts (rowid, name, episode) SELECT id, name, episode FROM main_episode",
+    "INSERT INTO main_location_fts (rowid, name, type, dimension) "
+    "SELECT id, name, type, dimension FROM main_location",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE TABLE IF NOT EXISTS main_character_fts ("
+    "id bigint PRIMARY KEY REFERENCES main_character(id) ON DELETE CASCADE, document tsvector NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS main_episode_fts ("
+    "id bigint PRIMARY KEY REFERENCES main_episode(id) ON DELETE CASCADE, document tsvector NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS main_location_fts ("
+    "id bigint PRIMARY KEY REFERENCES main_location(id) ON DELETE CASCADE, document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS main_character_fts_gin ON main_character_fts USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS main_episode_fts_gin ON main_episode_fts USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS main_location_fts_gin ON main_location_fts USING GIN (document)",
+    "INSERT INTO main_character_fts (id, document) "
+    "SELECT c.id, to_tsvector('simple', concat_ws(' ', c.name, c.species, c.type, o.name, l.name)) "
+    "FROM main_character c "
+    "LEFT JOIN main_location o ON o.id = c.origin_id "
+    "LEFT JOIN main_location l ON l.id = c.location_id",
+    "INSERT INTO main_episode_fts (id, document) "
+    "SELECT id, to_tsvector('simple', concat_ws(' ', name, episode)) FROM main_episode",
+    "INSERT INTO main_location_fts (id, document) "
+    "SELECT id, to_tsvector('simple', concat_ws(' ', name, type, dimension)) FROM main_location",
+]
+
+BACKWARD = [
+    "DROP TABLE IF EXISTS main_character_fts",
+    "DROP TABLE IF EXISTS main_episode_fts",
+    "DROP TABLE IF EXISTS main_location_fts",
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    """Создает таблицы полнотекстового индекса для поддерживаемых СУБД"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = SQLITE_FORWARD
+    elif vendor == 'postgresql':
+        statements = POSTGRES_FORWARD
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for statement in BACKWARD:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
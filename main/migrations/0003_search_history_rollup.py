@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchhistory',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SearchHistoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(help_text='Поисковый запрос', max_length=500)),
+                ('search_type', models.CharField(help_text='Тип поиска', max_length=20)),
+                ('day', models.DateField(help_text='День')),
+                ('count', models.PositiveIntegerField(default=0, help_text='Количество запросов за день')),
+                ('last_results_count', models.IntegerField(default=0, help_text='Количество результатов в последнем запросе')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Статистика поиска',
+                'verbose_name_plural': 'Статистика поиска',
+                'ordering': ['-day', '-count'],
+                'constraints': [models.UniqueConstraint(fields=('query', 'search_type', 'day'), name='unique_search_rollup_per_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_search_history_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Имя счетчика', max_length=50, unique=True)),
+                ('counters', models.JSONField(default=dict, help_text='Счетчики Space-Saving')),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Популярные запросы',
+                'verbose_name_plural': 'Популярные запросы',
+            },
+        ),
+    ]
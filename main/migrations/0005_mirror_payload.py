@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_trending_sketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='character',
+            name='payload',
+            field=models.JSONField(blank=True, editable=False, help_text='Последний ответ API', null=True),
+        ),
+        migrations.AddField(
+            model_name='episode',
+            name='payload',
+            field=models.JSONField(blank=True, editable=False, help_text='Последний ответ API', null=True),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='payload',
+            field=models.JSONField(blank=True, editable=False, help_text='Последний ответ API', null=True),
+        ),
+    ]
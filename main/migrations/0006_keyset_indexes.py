@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_mirror_payload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['name', 'id'], name='character_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='episode',
+            index=models.Index(fields=['episode', 'id'], name='episode_episode_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['name', 'id'], name='location_name_id_idx'),
+        ),
+    ]
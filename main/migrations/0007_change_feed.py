@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(choices=[('character', 'Персонаж'), ('episode', 'Эпизод'), ('location', 'Локация')], help_text='Тип записи', max_length=20)),
+                ('api_id', models.IntegerField(help_text='ID из Rick and Morty API')),
+                ('deleted', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+            options={
+                'verbose_name': 'Удаленная запись',
+                'verbose_name_plural': 'Удаленные записи',
+                'ordering': ['deleted'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['updated', 'id'], name='character_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='episode',
+            index=models.Index(fields=['updated', 'id'], name='episode_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['updated', 'id'], name='location_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted', 'id'], name='tombstone_deleted_id_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:05
+
+import logging
+
+from django.db import DatabaseError, migrations, models, transaction
+
+logger = logging.getLogger(__name__)
+
+# icontains (ILIKE '%...%') в PostgreSQL ускоряется только триграммным индексом
+TRIGRAM_COLUMNS = [
+    ('main_character', 'name'),
+    ('main_character', 'species'),
+    ('main_episode', 'name'),
+    ('main_episode', 'episode'),
+    ('main_location', 'name'),
+    ('main_location', 'type'),
+    ('main_location', 'dimension'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """GIN индексы pg_trgm для фильтров icontains (только PostgreSQL)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        # Расширение может быть недоступно без прав суперпользователя - индексы тогда не нужны
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DatabaseError as e:
+        logger.warning(f"pg_trgm unavailable, trigram indexes skipped: {e}")
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm ON {table} '
+            f'USING GIN (UPPER("{column}") gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['status', 'name', 'id'], name='character_status_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['gender', 'name', 'id'], name='character_gender_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['species', 'name'], name='character_species_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['type', 'name'], name='location_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['dimension', 'name'], name='location_dimension_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchhistory',
+            index=models.Index(fields=['search_type', 'created'], name='searchhistory_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchhistoryrollup',
+            index=models.Index(fields=['day', 'count'], name='rollup_day_count_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
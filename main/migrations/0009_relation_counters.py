@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:07
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk')).values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    """Начальные значения счетчиков: один UPDATE с подзапросом на таблицу"""
+    Character = apps.get_model('main', 'Character')
+    Episode = apps.get_model('main', 'Episode')
+    Location = apps.get_model('main', 'Location')
+    through = Character.episodes.through
+
+    Character.objects.update(episodes_count=_count(through, 'character'))
+    Episode.objects.update(characters_count=_count(through, 'episode'))
+    Location.objects.update(
+        origin_characters_count=_count(Character, 'origin'),
+        current_characters_count=_count(Character, 'location'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='character',
+            name='episodes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Эпизодов с персонажем'),
+        ),
+        migrations.AddField(
+            model_name='episode',
+            name='characters_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Персонажей в эпизоде'),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='current_characters_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Живут сейчас'),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='origin_characters_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Происходят отсюда'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
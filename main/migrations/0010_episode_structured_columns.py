@@ -0,0 +1,79 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:10
+
+import re
+from datetime import datetime
+
+from django.db import migrations, models
+
+# Копия разбора из main.models на момент миграции: последующие изменения
+# модели не должны менять результат уже примененной миграции
+EPISODE_CODE_RE = re.compile(r'^\s*S(\d+)\s*E(\d+)\s*$', re.IGNORECASE)
+AIR_DATE_FORMATS = ('%B %d, %Y', '%b %d, %Y', '%Y-%m-%d')
+
+
+def parse_episode_code(code):
+    match = EPISODE_CODE_RE.match(code or '')
+    if not match:
+        return 0, 0
+    return int(match.group(1)), int(match.group(2))
+
+
+def parse_air_date(value):
+    for fmt in AIR_DATE_FORMATS:
+        try:
+            return datetime.strptime((value or '').strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def backfill_episodes(apps, schema_editor):
+    """Разбирает код и дату выхода уже сохраненных эпизодов"""
+    Episode = apps.get_model('main', 'Episode')
+    episodes = list(Episode.objects.only('episode', 'air_date'))
+    for episode in episodes:
+        episode.season, episode.number = parse_episode_code(episode.episode)
+        episode.aired = parse_air_date(episode.air_date)
+    Episode.objects.bulk_update(episodes, ['season', 'number', 'aired'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_relation_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='episode',
+            options={'ordering': ['season', 'number'], 'verbose_name': 'Эпизод', 'verbose_name_plural': 'Эпизоды'},
+        ),
+        migrations.RemoveIndex(
+            model_name='episode',
+            name='episode_episode_id_idx',
+        ),
+        migrations.AddField(
+            model_name='episode',
+            name='aired',
+            field=models.DateField(blank=True, editable=False, help_text='Дата выхода (дата)', null=True),
+        ),
+        migrations.AddField(
+            model_name='episode',
+            name='number',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Номер в сезоне'),
+        ),
+        migrations.AddField(
+            model_name='episode',
+            name='season',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Сезон (0 - не распознан)'),
+        ),
+        migrations.RunPython(backfill_episodes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='episode',
+            index=models.Index(fields=['season', 'number', 'id'], name='episode_season_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='episode',
+            index=models.Index(fields=['aired', 'id'], name='episode_aired_idx'),
+        ),
+    ]
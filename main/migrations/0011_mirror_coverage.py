@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_episode_structured_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MirrorCoverage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(choices=[('character', 'Персонаж'), ('episode', 'Эпизод'), ('location', 'Локация')], help_text='Тип записи', max_length=20, unique=True)),
+                ('upstream_count', models.PositiveIntegerField(help_text='Записей во внешнем API')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Полнота зеркала',
+                'verbose_name_plural': 'Полнота зеркала',
+            },
+        ),
+    ]
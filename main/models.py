@@ -1,16 +1,64 @@
+import re
+from datetime import date, datetime
+from typing import Optional, Tuple
+
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
 
 
-class Location(models.Model):
+EPISODE_CODE_RE = re.compile(r'^\s*S(\d+)\s*E(\d+)\s*$', re.IGNORECASE)
+AIR_DATE_FORMATS = ('%B %d, %Y', '%b %d, %Y', '%Y-%m-%d')
+
+
+def parse_episode_code(code: str) -> Tuple[int, int]:
+    """Сезон и номер из кода вида S01E01; (0, 0), если код не распознан"""
+    match = EPISODE_CODE_RE.match(code or '')
+    if not match:
+        return 0, 0
+    return int(match.group(1)), int(match.group(2))
+
+
+def parse_air_date(value: str) -> Optional[date]:
+    """Дата выхода из строки API ("December 2, 2013") или None"""
+    for fmt in AIR_DATE_FORMATS:
+        try:
+            return datetime.strptime((value or '').strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class RelationCountersMixin:
+    """
+    Счетчики связей пишет только DataSyncService.recount (UPDATE по подзапросу):
+    save() существующей записи не перезаписывает их значениями из памяти.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Location(RelationCountersMixin, models.Model):
     """Модель для локаций из Rick and Morty"""
     api_id = models.IntegerField(unique=True, help_text="ID из Rick and Morty API")
     name = models.CharField(max_length=200, help_text="Название локации")
     type = models.CharField(max_length=100, blank=True, help_text="Тип локации")
     dimension = models.CharField(max_length=200, blank=True, help_text="Измерение")
     url = models.URLField(blank=True, help_text="URL в API")
+    payload = models.JSONField(null=True, blank=True, editable=False, help_text="Последний ответ API")
+    # Счетчики связей поддерживает DataSyncService, расхождения исправляет команда recount
+    origin_characters_count = models.PositiveIntegerField(default=0, editable=False, help_text="Происходят отсюда")
+    current_characters_count = models.PositiveIntegerField(default=0, editable=False, help_text="Живут сейчас")
+    counter_fields = ('origin_characters_count', 'current_characters_count')
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
@@ -18,6 +66,15 @@ class Location(models.Model):
         verbose_name = "Локация"
         verbose_name_plural = "Локации"
         ordering = ['name']
+        indexes = [
+            # Ключ keyset пагинации API
+            models.Index(fields=['name', 'id'], name='location_name_id_idx'),
+            # Лента изменений /api/changes/
+            models.Index(fields=['updated', 'id'], name='location_updated_id_idx'),
+            # Фильтры админки по типу и измерению с сортировкой по имени
+            models.Index(fields=['type', 'name'], name='location_type_name_idx'),
+            models.Index(fields=['dimension', 'name'], name='location_dimension_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -26,29 +83,47 @@ class Location(models.Model):
         return reverse('location-detail', kwargs={'pk': self.pk})
 
 
-class Episode(models.Model):
+class Episode(RelationCountersMixin, models.Model):
     """Модель для эпизодов Rick and Morty"""
     api_id = models.IntegerField(unique=True, help_text="ID из Rick and Morty API")
     name = models.CharField(max_length=200, help_text="Название эпизода")
     air_date = models.CharField(max_length=100, blank=True, help_text="Дата выхода")
     episode = models.CharField(max_length=20, blank=True, help_text="Номер эпизода (например, S01E01)")
+    # Разобранные из episode/air_date колонки для фильтров, сортировки и диапазонов дат
+    season = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Сезон (0 - не распознан)")
+    number = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Номер в сезоне")
+    aired = models.DateField(null=True, blank=True, editable=False, help_text="Дата выхода (дата)")
     url = models.URLField(blank=True, help_text="URL в API")
+    payload = models.JSONField(null=True, blank=True, editable=False, help_text="Последний ответ API")
+    characters_count = models.PositiveIntegerField(default=0, editable=False, help_text="Персонажей в эпизоде")
+    counter_fields = ('characters_count',)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Эпизод"
         verbose_name_plural = "Эпизоды"
-        ordering = ['episode']
+        ordering = ['season', 'number']
+        indexes = [
+            # Хронологический порядок, фильтр по сезону и ключ пагинации API
+            models.Index(fields=['season', 'number', 'id'], name='episode_season_number_idx'),
+            models.Index(fields=['aired', 'id'], name='episode_aired_idx'),
+            models.Index(fields=['updated', 'id'], name='episode_updated_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.episode} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        self.season, self.number = parse_episode_code(self.episode)
+        self.aired = parse_air_date(self.air_date)
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('episode-detail', kwargs={'pk': self.pk})
 
 
-class Character(models.Model):
+class Character(RelationCountersMixin, models.Model):
     """Модель для персонажей Rick and Morty"""
     
     STATUS_CHOICES = [
@@ -104,6 +179,9 @@ class Character(models.Model):
         help_text="Эпизоды с участием персонажа"
     )
     url = models.URLField(blank=True, help_text="URL в API")
+    payload = models.JSONField(null=True, blank=True, editable=False, help_text="Последний ответ API")
+    episodes_count = models.PositiveIntegerField(default=0, editable=False, help_text="Эпизодов с персонажем")
+    counter_fields = ('episodes_count',)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
@@ -111,10 +189,25 @@ class Character(models.Model):
         verbose_name = "Персонаж"
         verbose_name_plural = "Персонажи"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='character_name_id_idx'),
+            models.Index(fields=['updated', 'id'], name='character_updated_id_idx'),
+            # Фильтр API/админки по точному значению плюс сортировка по ключу пагинации
+            models.Index(fields=['status', 'name', 'id'], name='character_status_name_idx'),
+            models.Index(fields=['gender', 'name', 'id'], name='character_gender_name_idx'),
+            models.Index(fields=['species', 'name'], name='character_species_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Локации на момент загрузки: по ним post_save пересчитывает счетчики локаций
+        instance.loaded_locations = {instance.__dict__.get('origin_id'), instance.__dict__.get('location_id')}
+        return instance
+
     def get_absolute_url(self):
         return reverse('character-detail', kwargs={'pk': self.pk})
 
@@ -162,12 +255,119 @@ class SearchHistory(models.Model):
         help_text="Тип поиска"
     )
     results_count = models.IntegerField(default=0, help_text="Количество найденных результатов")
-    created = models.DateTimeField(auto_now_add=True)
+    # Время запроса задается при постановке в буфер, а не при записи пачкой
+    created = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
 
     class Meta:
         verbose_name = "История поиска"
         verbose_name_plural = "История поиска"
         ordering = ['-created']
+        indexes = [
+            # Фильтр админки по типу с сортировкой по времени
+            models.Index(fields=['search_type', 'created'], name='searchhistory_type_created_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.query} ({self.search_type})"
\ No newline at end of file
+        return f"{self.query} ({self.search_type})"
+
+
+class SearchHistoryRollup(models.Model):
+    """Агрегированная статистика поисковых запросов по дням"""
+    query = models.CharField(max_length=500, help_text="Поисковый запрос")
+    search_type = models.CharField(max_length=20, help_text="Тип поиска")
+    day = models.DateField(help_text="День")
+    count = models.PositiveIntegerField(default=0, help_text="Количество запросов за день")
+    last_results_count = models.IntegerField(default=0, help_text="Количество результатов в последнем запросе")
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Статистика поиска"
+        verbose_name_plural = "Статистика поиска"
+        ordering = ['-day', '-count']
+        indexes = [
+            models.Index(fields=['day', 'count'], name='rollup_day_count_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['query', 'search_type', 'day'],
+                name='unique_search_rollup_per_day'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.query} ({self.search_type}, {self.day}): {self.count}"
+
+
+class TrendingSketch(models.Model):
+    """Сохраненное состояние счетчиков популярных запросов (общее для всех воркеров)"""
+    name = models.CharField(max_length=50, unique=True, help_text="Имя счетчика")
+    counters = models.JSONField(default=dict, help_text="Счетчики Space-Saving")
+    updated = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Популярные запросы"
+        verbose_name_plural = "Популярные запросы"
+
+    def __str__(self):
+        return self.name
+
+
+class Tombstone(models.Model):
+    """Удаленная из зеркала запись - для ленты изменений /api/changes/"""
+    resource = models.CharField(
+        max_length=20,
+        choices=[
+            ('character', 'Персонаж'),
+            ('episode', 'Эпизод'),
+            ('location', 'Локация'),
+        ],
+        help_text="Тип записи"
+    )
+    api_id = models.IntegerField(help_text="ID из Rick and Morty API")
+    deleted = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        verbose_name = "Удаленная запись"
+        verbose_name_plural = "Удаленные записи"
+        ordering = ['deleted']
+        indexes = [
+            models.Index(fields=['deleted', 'id'], name='tombstone_deleted_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.resource}:{self.api_id} ({self.deleted})"
+
+
+class MirrorCoverage(models.Model):
+    """
+    Число записей во внешнем API (info.count) на момент синхронизации:
+    зеркало полное, когда в нем не меньше записей
+    """
+    resource = models.CharField(
+        max_length=20,
+        unique=True,
+        choices=[
+            ('character', 'Персонаж'),
+            ('episode', 'Эпизод'),
+            ('location', 'Локация'),
+        ],
+        help_text="Тип записи"
+    )
+    upstream_count = models.PositiveIntegerField(help_text="Записей во внешнем API")
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Полнота зеркала"
+        verbose_name_plural = "Полнота зеркала"
+
+    def __str__(self):
+        return f"{self.resource}: {self.upstream_count}"
+
+    @classmethod
+    def record(cls, resource: str, upstream_count: int) -> None:
+        cls.objects.update_or_create(resource=resource, defaults={'upstream_count': upstream_count})
+
+    @classmethod
+    def expected(cls, resource: str):
+        """Записей во внешнем API по последней синхронизации или None"""
+        return cls.objects.filter(resource=resource).values_list('upstream_count', flat=True).first()
@@ -0,0 +1,185 @@
+"""
+Кэш готовых HTML страниц для анонимных пользователей.
+
+Ключ - путь плюс нормализованные GET параметры. Каждая запись помечается
+тегами (например, `character:1` или `list:characters`). Инвалидация по тегу
+увеличивает версию тега, и все записи, сохраненные со старой версией,
+считаются устаревшими - так DataSyncService сбрасывает ровно те страницы,
+на которых показаны измененные данные.
+"""
+import hashlib
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'pagecache'
+
+
+def tag_response(response: HttpResponse, *tags: str) -> HttpResponse:
+    """Помечает ответ тегами для кэша страниц"""
+    existing = getattr(response, 'cache_tags', set())
+    response.cache_tags = existing | {tag for tag in tags if tag}
+    return response
+
+
+class PageCache:
+    """Кэш страниц с инвалидацией по тегам"""
+
+    def __init__(self):
+        self._recorders: List[Set[str]] = []
+
+    @property
+    def timeout(self) -> int:
+        return getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+    @property
+    def max_age(self) -> int:
+        return getattr(settings, 'PAGE_CACHE_MAX_AGE', 60)
+
+    def is_cacheable_request(self, request) -> bool:
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return False
+        # Ожидающие flash-сообщения выводятся на странице
+        return 'messages' not in request.COOKIES
+
+    def make_key(self, request) -> str:
+        params = sorted(
+            (key, value)
+            for key, values in request.GET.lists()
+            for value in values
+            if value != ''
+        )
+        raw = f"{request.path}?{urlencode(params)}"
+        return f"{KEY_PREFIX}:page:{hashlib.md5(raw.encode()).hexdigest()}"
+
+    def tag_key(self, tag: str) -> str:
+        return f"{KEY_PREFIX}:tag:{tag}"
+
+    def tag_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = list(tags)
+        stored = cache.get_many([self.tag_key(tag) for tag in tags])
+        return {tag: stored.get(self.tag_key(tag), 0) for tag in tags}
+
+    def get(self, request) -> Optional[dict]:
+        entry = cache.get(self.make_key(request))
+        if entry is None:
+            return None
+        if self.tag_versions(entry['tags']) != entry['tags']:
+            return None
+        return entry
+
+    def set(self, request, response: HttpResponse, etag: str) -> None:
+        tags = getattr(response, 'cache_tags', set())
+        entry = {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': etag,
+            'tags': self.tag_versions(tags),
+        }
+        cache.set(self.make_key(request), entry, self.timeout)
+
+    def purge(self, *tags: str) -> None:
+        """Инвалидирует все страницы, помеченные любым из тегов"""
+        for recorder in self._recorders:
+            recorder.update(tags)
+        for tag in tags:
+            key = self.tag_key(tag)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Тег еще не встречался: любая сохраненная запись имеет версию 0
+                cache.set(key, 1, None)
+
+    @contextmanager
+    def record_purges(self):
+        """Множество тегов, сброшенных внутри блока (для повторного сброса после публикации снимка)"""
+        recorder: Set[str] = set()
+        self._recorders.append(recorder)
+        try:
+            yield recorder
+        finally:
+            self._recorders.remove(recorder)
+
+    def finalize(self, request, response: HttpResponse, etag: str, status: str) -> HttpResponse:
+        """Добавляет заголовки кэширования и отвечает 304 на совпадающий If-None-Match"""
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in [value.strip() for value in if_none_match.split(',')]:
+            response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['X-Page-Cache'] = status
+        patch_cache_control(response, public=True, max_age=self.max_age)
+        return response
+
+
+page_cache = PageCache()
+
+
+def _lookup(request) -> Tuple[bool, Optional[HttpResponse]]:
+    """Возвращает (можно ли кэшировать запрос, ответ из кэша или None)"""
+    if not page_cache.is_cacheable_request(request):
+        return False, None
+    entry = page_cache.get(request)
+    if entry is None:
+        return True, None
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    return True, page_cache.finalize(request, response, entry['etag'], 'HIT')
+
+
+def _store(request, response: HttpResponse) -> HttpResponse:
+    if (
+        response.status_code != 200
+        or getattr(response, 'streaming', False)
+        or response.cookies
+        or not hasattr(response, 'cache_tags')
+    ):
+        return response
+
+    etag = f'"{hashlib.md5(response.content).hexdigest()}"'
+    try:
+        page_cache.set(request, response, etag)
+    except Exception as e:
+        logger.warning(f"Failed to store page in cache: {e}")
+    return page_cache.finalize(request, response, etag, 'MISS')
+
+
+def cache_page_with_tags(view_func):
+    """Декоратор: кэширует страницу, если view пометил ответ тегами через tag_response()"""
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            # Сессия и кэш синхронные - выполняем их вне event loop
+            cacheable, cached = await sync_to_async(_lookup)(request)
+            if cached is not None:
+                return cached
+            response = await view_func(request, *args, **kwargs)
+            if not cacheable:
+                return response
+            return await sync_to_async(_store)(request, response)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        cacheable, cached = _lookup(request)
+        if cached is not None:
+            return cached
+        response = view_func(request, *args, **kwargs)
+        if not cacheable:
+            return response
+        return _store(request, response)
+
+    return wrapper
@@ -0,0 +1,186 @@
+"""
+Keyset (cursor) пагинация для API над локальным зеркалом.
+
+Вместо OFFSET страница начинается после последнего ключа предыдущей
+страницы: `WHERE (name > :name) OR (name = :name AND id > :id)`. С составным
+индексом по тем же полям любая страница стоит столько же, сколько первая.
+Курсор непрозрачный: base64 от JSON с ключом и направлением.
+
+Число записей считается в одном из режимов (настройка API_COUNT_MODE или
+параметр ?count=): `exact` - COUNT(*), `approximate` - оценка из статистики
+БД для таблицы без фильтров или COUNT с ограничением сверху, `none` - без
+подсчета.
+"""
+import json
+import base64
+import logging
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+logger = logging.getLogger(__name__)
+
+COUNT_MODES = ('exact', 'approximate', 'none')
+
+
+def table_row_estimate(model) -> Optional[int]:
+    """Оценка числа строк таблицы без полного сканирования"""
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+                row = cursor.fetchone()
+                # -1: таблица еще не анализировалась
+                return int(row[0]) if row and row[0] >= 0 else None
+            if connection.vendor == 'sqlite':
+                try:
+                    cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                    row = cursor.fetchone()
+                    if row:
+                        return int(row[0].split()[0])
+                except DatabaseError:
+                    # sqlite_stat1 появляется только после ANALYZE
+                    pass
+                # Зеркало почти не удаляет строки, поэтому MAX(id) близок к числу строк
+                cursor.execute(f'SELECT MAX(id) FROM "{table}"')
+                row = cursor.fetchone()
+                return int(row[0] or 0)
+    except DatabaseError as e:
+        logger.warning(f"Row estimate failed for {table}: {e}")
+    return None
+
+
+def approximate_count(queryset, cap: int) -> int:
+    """Оценка для таблицы без фильтров, иначе COUNT не больше cap строк"""
+    if not queryset.query.where:
+        estimate = table_row_estimate(queryset.model)
+        if estimate is not None:
+            return estimate
+    return queryset.order_by()[:cap].count()
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по составному ключу view.keyset_ordering"""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    max_page_size = 100
+
+    def get_page_size(self, request) -> int:
+        default = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except ValueError:
+            size = default
+        return min(max(size, 1), self.max_page_size)
+
+    def get_count_mode(self, request) -> str:
+        mode = request.query_params.get(self.count_query_param) or getattr(settings, 'API_COUNT_MODE', 'exact')
+        return mode if mode in COUNT_MODES else 'exact'
+
+    def encode_cursor(self, position: List, reverse: bool) -> str:
+        raw = json.dumps({'k': position, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request) -> Tuple[Optional[List], bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            data = json.loads(raw)
+            position = data['k']
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError(position)
+            return position, bool(data.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound('Неверный курсор')
+
+    def keyset_filter(self, position: List, reverse: bool) -> Q:
+        """(a > x) OR (a = x AND b > y) ... для ключа (a, b, ...)"""
+        operator = 'lt' if reverse else 'gt'
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            equal = dict(zip(self.ordering[:index], position[:index]))
+            condition |= Q(**equal, **{f'{field}__{operator}': position[index]})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', ('id',)))
+        self.page_size = self.get_page_size(request)
+        self.count_mode = self.get_count_mode(request)
+        position, reverse = self.decode_cursor(request)
+
+        if self.count_mode == 'exact':
+            self.count = queryset.count()
+        elif self.count_mode == 'approximate':
+            self.count = approximate_count(queryset, getattr(settings, 'API_APPROXIMATE_COUNT_CAP', 1000))
+        else:
+            self.count = None
+
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position, reverse))
+        order = [f'-{field}' if reverse else field for field in self.ordering]
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.rows = rows
+        return rows
+
+    def position(self, row) -> List:
+        # Строки бывают объектами модели или словарями .values() (быстрые списки)
+        if isinstance(row, dict):
+            return [row[field] for field in self.ordering]
+        return [getattr(row, field) for field in self.ordering]
+
+    def get_link(self, row, reverse: bool) -> str:
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.position(row), reverse))
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.rows:
+            return None
+        return self.get_link(self.rows[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.get_link(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'count_approximate': self.count_mode == 'approximate',
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'count_approximate': {'type': 'boolean'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
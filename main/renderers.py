@@ -0,0 +1,24 @@
+"""
+JSON рендерер API на orjson.
+
+orjson сериализует словари и списки в несколько раз быстрее стандартного
+json, которым пользуется JSONRenderer DRF. Формат ответа тот же:
+компактный UTF-8 без экранирования не-ASCII символов. Даты и все, что orjson
+не знает (lazy строки, Decimal), кодируются так же, как в DRF.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer с сериализацией через orjson"""
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=JSONEncoder().default, option=options)
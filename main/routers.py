@@ -0,0 +1,35 @@
+"""
+Маршрутизация БД для режима снимков (main.snapshots).
+
+Чтение зеркала (персонажи, эпизоды, локации, лента удалений) идет в
+неизменяемый снимок, пока он опубликован. Вся запись и остальные модели
+(история поиска, сессии, админка) - в рабочую базу default.
+"""
+from django.db import DEFAULT_DB_ALIAS
+
+from .snapshots import SNAPSHOT_DB, snapshot_store
+
+SNAPSHOT_MODELS = {
+    'main.Character', 'main.Character_episodes', 'main.Episode', 'main.Location', 'main.Tombstone',
+    'main.MirrorCoverage',
+}
+
+
+class SnapshotRouter:
+    """Чтение зеркала из снимка, запись в рабочую базу"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label in SNAPSHOT_MODELS and snapshot_store.available:
+            return SNAPSHOT_DB
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Явно: иначе запись экземпляра, прочитанного из снимка, ушла бы в снимок
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Снимок - копия рабочей базы, связи между их строками корректны
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != SNAPSHOT_DB
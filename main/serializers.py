@@ -1,8 +1,75 @@
+from typing import Optional, Set
+
 from rest_framework import serializers
 from .models import Character, Episode, Location, SearchHistory
 
 
-class LocationSerializer(serializers.ModelSerializer):
+def _choice_label(choices):
+    """Человекочитаемое значение choices, как в свойствах *_display модели"""
+    labels = dict(choices)
+    return lambda value: labels.get(value, value)
+
+
+def _split_param(value: Optional[str]) -> Set[str]:
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Выбор полей ответа параметрами ?fields= и ?expand=.
+    
+    Без ?fields= сериализатор отдает все поля. С ?fields= остаются только
+    перечисленные; вложенные связи (Meta.expandable_fields) можно добавить
+    через ?expand=. Meta.field_sources задает колонки, от которых зависит
+    поле, если оно не совпадает с колонкой модели - по ним view загружает
+    из БД только нужное (.only()).
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        # Вложенные сериализаторы создаются без request и отдаются целиком
+        if request is None:
+            return
+        selected = self.selected_fields(request)
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+    
+    @classmethod
+    def selected_fields(cls, request) -> Optional[Set[str]]:
+        """Запрошенные поля или None, если нужны все"""
+        fields = _split_param(request.query_params.get(cls.fields_query_param))
+        expand = _split_param(request.query_params.get(cls.expand_query_param))
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        
+        errors = {}
+        unknown = fields - set(cls.Meta.fields)
+        if unknown:
+            errors[cls.fields_query_param] = f"Неизвестные поля: {', '.join(sorted(unknown))}"
+        unknown = expand - expandable
+        if unknown:
+            errors[cls.expand_query_param] = f"Нельзя раскрыть: {', '.join(sorted(unknown))}"
+        if errors:
+            raise serializers.ValidationError(errors)
+        
+        if not fields:
+            return None
+        return fields | expand
+    
+    @classmethod
+    def source_columns(cls, selected: Set[str]) -> Set[str]:
+        """Колонки модели (пути ORM), нужные для выбранных полей"""
+        sources = getattr(cls.Meta, 'field_sources', {})
+        columns = set()
+        for name in selected:
+            columns.update(sources.get(name, (name,)))
+        return columns
+
+
+class LocationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для локаций"""
     
     class Meta:
@@ -14,25 +81,25 @@ class LocationSerializer(serializers.ModelSerializer):
         read_only_fields = ['created', 'updated']
 
 
-class EpisodeSerializer(serializers.ModelSerializer):
+class EpisodeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для эпизодов"""
     
     class Meta:
         model = Episode
         fields = [
-            'id', 'api_id', 'name', 'air_date', 'episode', 
-            'url', 'created', 'updated'
+            'id', 'api_id', 'name', 'air_date', 'episode',
+            'season', 'number', 'aired', 'url', 'created', 'updated'
         ]
         read_only_fields = ['created', 'updated']
 
 
-class CharacterListSerializer(serializers.ModelSerializer):
+class CharacterListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для списка персонажей (упрощенный)"""
-    origin_name = serializers.CharField(source='origin.name', read_only=True)
-    location_name = serializers.CharField(source='location.name', read_only=True)
+    # allow_null: без локации поле равно null, а не пропадает из ответа
+    origin_name = serializers.CharField(source='origin.name', read_only=True, allow_null=True)
+    location_name = serializers.CharField(source='location.name', read_only=True, allow_null=True)
     status_display = serializers.CharField(read_only=True)
     gender_display = serializers.CharField(read_only=True)
-    episodes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Character
@@ -41,12 +108,20 @@ class CharacterListSerializer(serializers.ModelSerializer):
             'species', 'type', 'gender', 'gender_display',
             'origin_name', 'location_name', 'image', 'episodes_count'
         ]
-
-    def get_episodes_count(self, obj):
-        return obj.episodes.count()
-
-
-class CharacterDetailSerializer(serializers.ModelSerializer):
+        field_sources = {
+            'status_display': ('status',),
+            'gender_display': ('gender',),
+            'origin_name': ('origin__name',),
+            'location_name': ('location__name',),
+        }
+        # Свойства модели для FastRowSerializer, который работает без экземпляров
+        fast_converters = {
+            'status_display': _choice_label(Character.STATUS_CHOICES),
+            'gender_display': _choice_label(Character.GENDER_CHOICES),
+        }
+
+
+class CharacterDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Детальный сериализатор для персонажа"""
     origin = LocationSerializer(read_only=True)
     location = LocationSerializer(read_only=True)
@@ -63,31 +138,33 @@ class CharacterDetailSerializer(serializers.ModelSerializer):
             'created', 'updated'
         ]
         read_only_fields = ['created', 'updated']
+        expandable_fields = ['origin', 'location', 'episodes']
+        field_sources = {
+            'status_display': ('status',),
+            'gender_display': ('gender',),
+            'episodes': (),
+        }
 
 
-class EpisodeDetailSerializer(serializers.ModelSerializer):
+class EpisodeDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Детальный сериализатор для эпизода"""
     characters = CharacterListSerializer(many=True, read_only=True)
-    characters_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Episode
         fields = [
-            'id', 'api_id', 'name', 'air_date', 'episode',
+            'id', 'api_id', 'name', 'air_date', 'episode', 'season', 'number', 'aired',
             'characters', 'characters_count', 'url', 'created', 'updated'
         ]
         read_only_fields = ['created', 'updated']
-
-    def get_characters_count(self, obj):
-        return obj.characters.count()
+        expandable_fields = ['characters']
+        field_sources = {'characters': ()}
 
 
-class LocationDetailSerializer(serializers.ModelSerializer):
+class LocationDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Детальный сериализатор для локации"""
     origin_characters = CharacterListSerializer(many=True, read_only=True)
     current_characters = CharacterListSerializer(many=True, read_only=True)
-    origin_characters_count = serializers.SerializerMethodField()
-    current_characters_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Location
@@ -98,12 +175,11 @@ class LocationDetailSerializer(serializers.ModelSerializer):
             'url', 'created', 'updated'
         ]
         read_only_fields = ['created', 'updated']
-
-    def get_origin_characters_count(self, obj):
-        return obj.origin_characters.count()
-
-    def get_current_characters_count(self, obj):
-        return obj.current_characters.count()
+        expandable_fields = ['origin_characters', 'current_characters']
+        field_sources = {
+            'origin_characters': (),
+            'current_characters': (),
+        }
 
 
 class SearchHistorySerializer(serializers.ModelSerializer):
@@ -147,6 +223,9 @@ class EpisodeFilterSerializer(serializers.Serializer):
     """Сериализатор для фильтрации эпизодов"""
     name = serializers.CharField(max_length=200, required=False)
     episode = serializers.CharField(max_length=20, required=False)
+    season = serializers.IntegerField(min_value=1, required=False)
+    aired_after = serializers.DateField(required=False)
+    aired_before = serializers.DateField(required=False)
     page = serializers.IntegerField(min_value=1, default=1)
 
 
@@ -1,9 +1,22 @@
+import asyncio
+import httpx
 import requests
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, suppress
+from datetime import timedelta
 from typing import Dict, List, Optional, Any
 from django.conf import settings
 from django.core.cache import cache
-from django.db import transaction
-from .models import Character, Episode, Location, SearchHistory
+from django.db import router, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Character, Episode, Location, SearchHistory, SearchHistoryRollup, Tombstone
+from .fulltext import fulltext_index
+from .trending import trending_tracker
+from .page_cache import page_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,7 +32,7 @@ class RickAndMortyAPIService:
             'User-Agent': 'Rick and Morty Django App/1.0'
         })
 
-    def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
+    def _make_request(self, endpoint: str, params: Optional[Dict] = None, expected: tuple = (dict,)) -> Optional[Any]:
         """Выполняет HTTP запрос к API"""
         try:
             url = f"{self.base_url}{endpoint}"
@@ -31,20 +44,7 @@ class RickAndMortyAPIService:
                 
             response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            
-            # Проверяем content-type
-            content_type = response.headers.get('content-type', '')
-            if 'application/json' not in content_type:
-                logger.warning(f"Unexpected content-type for {endpoint}: {content_type}")
-            
-            data = response.json()
-            
-            # Проверяем, что получили валидные данные
-            if not isinstance(data, dict):
-                logger.warning(f"API returned non-dict data for {endpoint}: {type(data)}")
-                return None
-                
-            return data
+            return self._parse_response(endpoint, response, expected)
         except requests.exceptions.Timeout as e:
             logger.error(f"API request timeout for {endpoint}: {e}")
             return None
@@ -64,15 +64,54 @@ class RickAndMortyAPIService:
             logger.error(f"Unexpected error in API request for {endpoint}: {e}")
             return None
 
-    def get_characters(self, page: int = 1, name: str = None, status: str = None, 
-                      species: str = None, gender: str = None) -> Optional[Dict]:
-        """Получает список персонажей с фильтрацией"""
-        cache_key = f"characters_p{page}_{name}_{status}_{species}_{gender}"
+    @staticmethod
+    def _parse_response(endpoint: str, response, expected: tuple = (dict,)) -> Optional[Any]:
+        """Проверяет ответ API и возвращает JSON объект (или список для запросов по нескольким id)"""
+        # Проверяем content-type
+        content_type = response.headers.get('content-type', '')
+        if 'application/json' not in content_type:
+            logger.warning(f"Unexpected content-type for {endpoint}: {content_type}")
+        
+        data = response.json()
+        
+        # Проверяем, что получили валидные данные
+        if not isinstance(data, expected):
+            logger.warning(f"API returned unexpected data for {endpoint}: {type(data)}")
+            return None
+            
+        return data
+
+    def _cached_request(self, cache_key: str, endpoint: str, params: Optional[Dict],
+                        timeout: int) -> Optional[Dict]:
+        """Запрос к API через общий кэш"""
         cached_result = cache.get(cache_key)
         
         if cached_result:
             return cached_result
             
+        result = self._make_request(endpoint, params)
+        if result:
+            cache.set(cache_key, result, timeout)
+            
+        return result
+
+    @staticmethod
+    def characters_cache_key(page: int = 1, name: str = None, status: str = None,
+                             species: str = None, gender: str = None) -> str:
+        return f"characters_p{page}_{name}_{status}_{species}_{gender}"
+
+    @staticmethod
+    def episodes_cache_key(page: int = 1, name: str = None, episode: str = None) -> str:
+        return f"episodes_p{page}_{name}_{episode}"
+
+    @staticmethod
+    def locations_cache_key(page: int = 1, name: str = None, type: str = None, dimension: str = None) -> str:
+        return f"locations_p{page}_{name}_{type}_{dimension}"
+
+    def get_characters(self, page: int = 1, name: str = None, status: str = None, 
+                      species: str = None, gender: str = None) -> Optional[Dict]:
+        """Получает список персонажей с фильтрацией"""
+        cache_key = self.characters_cache_key(page, name, status, species, gender)
         params = {'page': page}
         if name:
             params['name'] = name
@@ -82,70 +121,34 @@ class RickAndMortyAPIService:
             params['species'] = species
         if gender:
             params['gender'] = gender
-            
-        result = self._make_request('character', params)
-        if result:
-            cache.set(cache_key, result, 300)  # Кэш на 5 минут
-            
-        return result
+
+        return self._cached_request(cache_key, 'character', params, 300)
 
     def get_character(self, character_id: int) -> Optional[Dict]:
         """Получает данные конкретного персонажа"""
         cache_key = f"character_{character_id}"
-        cached_result = cache.get(cache_key)
-        
-        if cached_result:
-            return cached_result
-            
-        result = self._make_request(f'character/{character_id}')
-        if result:
-            cache.set(cache_key, result, 600)  # Кэш на 10 минут
-            
-        return result
+        return self._cached_request(cache_key, f'character/{character_id}', None, 600)
 
     def get_episodes(self, page: int = 1, name: str = None, episode: str = None) -> Optional[Dict]:
         """Получает список эпизодов с фильтрацией"""
-        cache_key = f"episodes_p{page}_{name}_{episode}"
-        cached_result = cache.get(cache_key)
-        
-        if cached_result:
-            return cached_result
-            
+        cache_key = self.episodes_cache_key(page, name, episode)
         params = {'page': page}
         if name:
             params['name'] = name
         if episode:
             params['episode'] = episode
-            
-        result = self._make_request('episode', params)
-        if result:
-            cache.set(cache_key, result, 300)
-            
-        return result
+
+        return self._cached_request(cache_key, 'episode', params, 300)
 
     def get_episode(self, episode_id: int) -> Optional[Dict]:
         """Получает данные конкретного эпизода"""
         cache_key = f"episode_{episode_id}"
-        cached_result = cache.get(cache_key)
-        
-        if cached_result:
-            return cached_result
-            
-        result = self._make_request(f'episode/{episode_id}')
-        if result:
-            cache.set(cache_key, result, 600)
-            
-        return result
+        return self._cached_request(cache_key, f'episode/{episode_id}', None, 600)
 
     def get_locations(self, page: int = 1, name: str = None, type: str = None, 
                      dimension: str = None) -> Optional[Dict]:
         """Получает список локаций с фильтрацией"""
-        cache_key = f"locations_p{page}_{name}_{type}_{dimension}"
-        cached_result = cache.get(cache_key)
-        
-        if cached_result:
-            return cached_result
-            
+        cache_key = self.locations_cache_key(page, name, type, dimension)
         params = {'page': page}
         if name:
             params['name'] = name
@@ -153,27 +156,161 @@ class RickAndMortyAPIService:
             params['type'] = type
         if dimension:
             params['dimension'] = dimension
-            
-        result = self._make_request('location', params)
-        if result:
-            cache.set(cache_key, result, 300)
-            
-        return result
+
+        return self._cached_request(cache_key, 'location', params, 300)
 
     def get_location(self, location_id: int) -> Optional[Dict]:
         """Получает данные конкретной локации"""
         cache_key = f"location_{location_id}"
-        cached_result = cache.get(cache_key)
+        return self._cached_request(cache_key, f'location/{location_id}', None, 600)
+
+    def get_characters_batch(self, character_ids: List[int]) -> List[Dict]:
+        """Получает нескольких персонажей одним запросом (character/1,2,3)"""
+        return self._cached_batch_request('character', character_ids, 600)
+
+    @staticmethod
+    def _batch_items(data) -> Dict[int, Dict]:
+        """Ответ на запрос по нескольким id: список, а для одного id - объект"""
+        if isinstance(data, dict):
+            data = [data]
+        return {item['id']: item for item in data or [] if isinstance(item, dict) and 'id' in item}
+
+    def _cached_batch_request(self, resource: str, ids: List[int], timeout: int) -> List[Dict]:
+        """Берет объекты из кэша по одному ключу на id, промахи загружает одним запросом"""
+        keys = {api_id: f"{resource}_{api_id}" for api_id in ids}
+        cached = cache.get_many(list(keys.values()))
+        found = {api_id: cached[key] for api_id, key in keys.items() if key in cached}
         
+        missing = [api_id for api_id in keys if api_id not in found]
+        if missing:
+            data = self._make_request(f"{resource}/{','.join(map(str, missing))}", expected=(dict, list))
+            fetched = self._batch_items(data)
+            cache.set_many({keys[api_id]: item for api_id, item in fetched.items() if api_id in keys}, timeout)
+            found.update(fetched)
+        
+        return [found[api_id] for api_id in ids if api_id in found]
+
+
+class AsyncRickAndMortyAPIService(RickAndMortyAPIService):
+    """
+    Неблокирующий клиент API для async views.
+    
+    Методы get_* наследуются без изменений и возвращают корутины, так как
+    _cached_request здесь асинхронный. Пока ответ API не пришел, event loop
+    обслуживает другие запросы.
+    """
+    
+    def __init__(self):
+        self.base_url = settings.RICK_AND_MORTY_API_BASE_URL
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop = None
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            headers={'User-Agent': 'Rick and Morty Django App/1.0'},
+            timeout=10,
+            limits=httpx.Limits(max_connections=getattr(settings, 'UPSTREAM_MAX_CONNECTIONS', 100)),
+        )
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        HTTP клиент для запроса. Loop сервера ASGI работает в главном потоке
+        весь срок процесса и держит общий пул соединений. Временные loop
+        async_to_sync (async views под WSGI, подзапросы пакета) живут в других
+        потоках один вызов - их клиент закрывается вместе с запросом.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            async with self._new_client() as client:
+                yield client
+            return
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            previous = self._client
+            self._client = self._new_client()
+            self._client_loop = loop
+            if previous is not None:
+                # Предыдущий loop главного потока (например, повторный asyncio.run) уже завершен:
+                # закрываем его пул, ошибки закрытия транспорта на остановленном loop не важны
+                with suppress(RuntimeError):
+                    await previous.aclose()
+        yield self._client
+
+    async def _make_request(self, endpoint: str, params: Optional[Dict] = None,
+                            expected: tuple = (dict,)) -> Optional[Any]:
+        """Выполняет HTTP запрос к API без блокировки воркера"""
+        try:
+            url = f"{self.base_url}{endpoint}"
+            
+            if not url.startswith(('http://', 'https://')):
+                logger.error(f"Invalid URL scheme for {url}")
+                return None
+            
+            async with self.session() as client:
+                response = await client.get(url, params=params)
+            response.raise_for_status()
+            return self._parse_response(endpoint, response, expected)
+        except httpx.TimeoutException as e:
+            logger.error(f"API request timeout for {endpoint}: {e}")
+            return None
+        except httpx.HTTPStatusError as e:
+            logger.error(f"API HTTP error for {endpoint}: {e}")
+            return None
+        except httpx.HTTPError as e:
+            logger.error(f"API request failed for {endpoint}: {e}")
+            return None
+        except ValueError as e:
+            logger.error(f"Invalid JSON response for {endpoint}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error in API request for {endpoint}: {e}")
+            return None
+
+    async def _cached_request(self, cache_key: str, endpoint: str, params: Optional[Dict],
+                              timeout: int) -> Optional[Dict]:
+        cached_result = await cache.aget(cache_key)
         if cached_result:
             return cached_result
-            
-        result = self._make_request(f'location/{location_id}')
+        
+        result = await self._make_request(endpoint, params)
         if result:
-            cache.set(cache_key, result, 600)
-            
+            await cache.aset(cache_key, result, timeout)
         return result
 
+    async def _cached_batch_request(self, resource: str, ids: List[int], timeout: int) -> List[Dict]:
+        keys = {api_id: f"{resource}_{api_id}" for api_id in ids}
+        cached = await cache.aget_many(list(keys.values()))
+        found = {api_id: cached[key] for api_id, key in keys.items() if key in cached}
+        
+        missing = [api_id for api_id in keys if api_id not in found]
+        if missing:
+            data = await self._make_request(f"{resource}/{','.join(map(str, missing))}", expected=(dict, list))
+            fetched = self._batch_items(data)
+            await cache.aset_many({keys[api_id]: item for api_id, item in fetched.items() if api_id in keys}, timeout)
+            found.update(fetched)
+        
+        return [found[api_id] for api_id in ids if api_id in found]
+
+
+# Хранимые счетчики связей: модель -> {поле: (модель со ссылкой, поле ссылки)}
+RELATION_COUNTERS = {
+    Character: {'episodes_count': (Character.episodes.through, 'character')},
+    Episode: {'characters_count': (Character.episodes.through, 'episode')},
+    Location: {
+        'origin_characters_count': (Character, 'origin'),
+        'current_characters_count': (Character, 'location'),
+    },
+}
+
+
+def _count_subquery(model, field: str):
+    """Число строк model, ссылающихся на внешнюю строку через field"""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
 
 class DataSyncService:
     """Сервис для синхронизации данных с локальной БД"""
@@ -181,6 +318,104 @@ class DataSyncService:
     def __init__(self):
         self.api_service = RickAndMortyAPIService()
 
+    @staticmethod
+    def _field_state(obj) -> tuple:
+        """Значения синхронизируемых полей для определения изменений"""
+        return tuple(
+            getattr(obj, field.attname) for field in obj._meta.concrete_fields
+            if field.name not in ('id', 'created', 'updated')
+        )
+
+    @property
+    def freshness_window(self) -> int:
+        return getattr(settings, 'MIRROR_FRESHNESS_SECONDS', 86400)
+
+    def get_fresh(self, queryset, api_id: int):
+        """
+        Строка зеркала с сохраненным ответом API, если она синхронизирована
+        в пределах MIRROR_FRESHNESS_SECONDS; иначе None (нужно обновление из API)
+        """
+        if not self.freshness_window:
+            return None
+        cutoff = timezone.now() - timedelta(seconds=self.freshness_window)
+        try:
+            rows = queryset.filter(api_id=api_id, updated__gte=cutoff, payload__isnull=False)
+            row = rows.first()
+            writer = router.db_for_write(queryset.model)
+            if row is None and rows.db != writer:
+                # Строка, обновленная запросом после публикации снимка, есть только в рабочей базе
+                row = rows.using(writer).first()
+            return row
+        except Exception as e:
+            logger.warning(f"Mirror lookup failed for {queryset.model.__name__} {api_id}: {e}")
+            return None
+
+    def recount(self, model, pks=None) -> int:
+        """
+        Пересчитывает счетчики связей строк pks (None - всей таблицы) одним
+        UPDATE в текущей транзакции. Возвращает число обновленных строк;
+        для всей таблицы обновляются только разошедшиеся.
+        """
+        counters = {field: _count_subquery(*source) for field, source in RELATION_COUNTERS[model].items()}
+        if pks is not None:
+            pks = [pk for pk in pks if pk is not None]
+            return model.objects.filter(pk__in=pks).update(**counters) if pks else 0
+
+        drift = Q()
+        for field in counters:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        # Сверка по рабочей базе: чтение зеркала может идти из снимка (SnapshotRouter)
+        actual = {f'actual_{field}': count for field, count in counters.items()}
+        drifted = list(
+            model.objects.using(router.db_for_write(model))
+            .annotate(**actual).filter(drift).values_list('pk', flat=True)
+        )
+        if drifted:
+            model.objects.filter(pk__in=drifted).update(**counters)
+        return len(drifted)
+
+    def episodes_changed(self, instance, action: str, reverse: bool, pk_set) -> None:
+        """m2m_changed для Character.episodes: счетчики обеих сторон связи"""
+        if action == 'pre_clear':
+            related = instance.characters if reverse else instance.episodes
+            writer = router.db_for_write(type(instance))
+            instance._cleared_pks = set(related.using(writer).values_list('pk', flat=True))
+            return
+        if action == 'post_clear':
+            pk_set = getattr(instance, '_cleared_pks', None)
+        elif action not in ('post_add', 'post_remove'):
+            return
+        if not pk_set:
+            return
+        characters, episodes = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        self.recount(Character, characters)
+        self.recount(Episode, episodes)
+
+    def character_saved(self, instance: Character, created: bool) -> None:
+        """post_save персонажа: счетчики старой и новой origin/location"""
+        previous = getattr(instance, 'loaded_locations', set())
+        locations = {instance.origin_id, instance.location_id}
+        if created or locations != previous:
+            self.recount(Location, locations | previous)
+        instance.loaded_locations = locations
+
+    def capture_related(self, instance) -> None:
+        """pre_delete: связанные строки, чьи счетчики изменит удаление"""
+        # Связи читаются из рабочей базы, а не из снимка
+        writer = router.db_for_write(type(instance))
+        if isinstance(instance, Character):
+            instance._counter_pks = {
+                Episode: list(instance.episodes.using(writer).values_list('pk', flat=True)),
+                Location: [instance.origin_id, instance.location_id],
+            }
+        elif isinstance(instance, Episode):
+            instance._counter_pks = {Character: list(instance.characters.using(writer).values_list('pk', flat=True))}
+
+    @staticmethod
+    def _purge_pages(*tags: str) -> None:
+        """Сбрасывает кэш страниц с измененными данными после фиксации транзакции"""
+        transaction.on_commit(lambda: page_cache.purge(*tags))
+
     def sync_location(self, location_data: Dict) -> Location:
         """Синхронизирует данные локации"""
         try:
@@ -191,16 +426,33 @@ class DataSyncService:
                     'type': location_data.get('type', ''),
                     'dimension': location_data.get('dimension', ''),
                     'url': location_data.get('url', ''),
+                    'payload': location_data,
                 }
             )
             
+            renamed = False
+            state = None if created else self._field_state(location)
             if not created:
                 # Обновляем существующую запись
+                renamed = location.name != location_data.get('name', 'Unknown')
                 location.name = location_data.get('name', 'Unknown')
                 location.type = location_data.get('type', '')
                 location.dimension = location_data.get('dimension', '')
                 location.url = location_data.get('url', '')
+                location.payload = location_data
                 location.save()
+
+            if created or self._field_state(location) != state:
+                self._purge_pages(f"location:{location.api_id}")
+
+            fulltext_index.index_location(location)
+            if renamed:
+                # Название локации входит в поисковый документ персонажей
+                related = Character.objects.filter(
+                    Q(origin=location) | Q(location=location)
+                ).select_related('origin', 'location')
+                for character in related:
+                    fulltext_index.index_character(character)
                 
             return location
         except KeyError as e:
@@ -220,15 +472,23 @@ class DataSyncService:
                     'air_date': episode_data.get('air_date', ''),
                     'episode': episode_data.get('episode', ''),
                     'url': episode_data.get('url', ''),
+                    'payload': episode_data,
                 }
             )
             
+            state = None if created else self._field_state(episode)
             if not created:
                 episode.name = episode_data.get('name', 'Unknown')
                 episode.air_date = episode_data.get('air_date', '')
                 episode.episode = episode_data.get('episode', '')
                 episode.url = episode_data.get('url', '')
+                episode.payload = episode_data
                 episode.save()
+
+            if created or self._field_state(episode) != state:
+                self._purge_pages(f"episode:{episode.api_id}")
+
+            fulltext_index.index_episode(episode)
                 
             return episode
         except KeyError as e:
@@ -238,32 +498,44 @@ class DataSyncService:
             logger.error(f"Error syncing episode: {e}")
             raise
 
+    def _fetch_location(self, character_data: Dict, field: str) -> Optional[Dict]:
+        """Ответ API для локации персонажа (origin / location) или None"""
+        if not (character_data.get(field) and character_data[field].get('url')):
+            return None
+        try:
+            location_data = self.api_service.get_location(int(character_data[field]['url'].split('/')[-1]))
+        except (ValueError, IndexError, KeyError):
+            logger.warning(f"Could not parse {field} location for character {character_data.get('id')}")
+            return None
+        return location_data if location_data and 'id' in location_data else None
+
+    def _fetch_episodes(self, character_data: Dict) -> List[Dict]:
+        """Ответы API для эпизодов персонажа"""
+        episodes = []
+        for episode_url in character_data.get('episode', []):
+            try:
+                episode_data = self.api_service.get_episode(int(episode_url.split('/')[-1]))
+            except (ValueError, IndexError, KeyError):
+                logger.warning(f"Could not parse episode URL: {episode_url}")
+                continue
+            if episode_data and 'id' in episode_data:
+                episodes.append(episode_data)
+        return episodes
+
     def sync_character(self, character_data: Dict) -> Character:
         """Синхронизирует данные персонажа"""
         try:
+            # Запросы к API - до транзакции: она должна завершиться сразу после
+            # записи, иначе строка с ранним `updated` станет видна позже горизонта
+            # ленты изменений (CHANGES_SETTLE_SECONDS) и будет пропущена
+            origin_data = self._fetch_location(character_data, 'origin')
+            location_data = self._fetch_location(character_data, 'location')
+            episodes_data = self._fetch_episodes(character_data)
+
             with transaction.atomic():
                 # Синхронизируем связанные локации
-                origin_location = None
-                if character_data.get('origin') and character_data['origin'].get('url'):
-                    try:
-                        origin_id = int(character_data['origin']['url'].split('/')[-1])
-                        origin_data = self.api_service.get_location(origin_id)
-                        if origin_data:
-                            origin_location = self.sync_location(origin_data)
-                    except (ValueError, IndexError, KeyError):
-                        logger.warning(f"Could not parse origin location for character {character_data.get('id')}")
-                        pass
-
-                current_location = None
-                if character_data.get('location') and character_data['location'].get('url'):
-                    try:
-                        location_id = int(character_data['location']['url'].split('/')[-1])
-                        location_data = self.api_service.get_location(location_id)
-                        if location_data:
-                            current_location = self.sync_location(location_data)
-                    except (ValueError, IndexError, KeyError):
-                        logger.warning(f"Could not parse current location for character {character_data.get('id')}")
-                        pass
+                origin_location = self.sync_location(origin_data) if origin_data else None
+                current_location = self.sync_location(location_data) if location_data else None
 
                 # Создаем или обновляем персонажа
                 character, created = Character.objects.get_or_create(
@@ -278,9 +550,14 @@ class DataSyncService:
                         'location': current_location,
                         'image': character_data.get('image', ''),
                         'url': character_data.get('url', ''),
+                        'payload': character_data,
                     }
                 )
                 
+                state = None if created else self._field_state(character)
+                known_episodes = set() if created else set(
+                    character.episodes.using(router.db_for_write(Character)).values_list('api_id', flat=True)
+                )
                 if not created:
                     character.name = character_data.get('name', 'Unknown')
                     character.status = character_data.get('status', 'unknown').lower()
@@ -291,20 +568,21 @@ class DataSyncService:
                     character.location = current_location
                     character.image = character_data.get('image', '')
                     character.url = character_data.get('url', '')
+                    character.payload = character_data
                     character.save()
 
-                # Синхронизируем эпизоды
-                episode_urls = character_data.get('episode', [])
-                for episode_url in episode_urls:
-                    try:
-                        episode_id = int(episode_url.split('/')[-1])
-                        episode_data = self.api_service.get_episode(episode_id)
-                        if episode_data:
-                            episode = self.sync_episode(episode_data)
-                            character.episodes.add(episode)
-                    except (ValueError, IndexError, KeyError):
-                        logger.warning(f"Could not parse episode URL: {episode_url}")
-                        continue
+                fulltext_index.index_character(character)
+
+                # Синхронизируем эпизоды; связи добавляются одним add - один пересчет счетчиков
+                episodes = [self.sync_episode(episode_data) for episode_data in episodes_data]
+                synced_episodes = {episode.api_id for episode in episodes}
+                if not synced_episodes <= known_episodes:
+                    character.episodes.add(*episodes)
+                    # Счетчик пересчитан UPDATE в БД - возвращаем актуальное значение
+                    character.refresh_from_db(using=router.db_for_write(Character), fields=['episodes_count'])
+
+                if created or self._field_state(character) != state or not synced_episodes <= known_episodes:
+                    self._purge_pages(f"character:{character.api_id}")
 
             return character
         except KeyError as e:
@@ -314,16 +592,141 @@ class DataSyncService:
             logger.error(f"Error syncing character: {e}")
             raise
 
+    def record_deletion(self, instance) -> None:
+        """Пишет tombstone удаленной записи зеркала и убирает ее из полнотекстового индекса"""
+        resource = instance._meta.model_name
+        Tombstone.objects.create(resource=resource, api_id=instance.api_id)
+        # У таблиц FTS5 нет внешних ключей - документ удаляется явно
+        fulltext_index.remove(resource, instance.pk)
+        for model, pks in getattr(instance, '_counter_pks', {}).items():
+            self.recount(model, pks)
+        self._purge_pages(f"{resource}:{instance.api_id}", f"list:{resource}s")
+
     def save_search_history(self, query: str, search_type: str, results_count: int):
-        """Сохраняет историю поиска"""
-        SearchHistory.objects.create(
-            query=query,
-            search_type=search_type,
-            results_count=results_count
+        """Сохраняет историю поиска (через буфер отложенной записи)"""
+        search_history_buffer.add(query, search_type, results_count)
+        trending_tracker.record(query, search_type)
+
+
+class SearchHistoryBuffer:
+    """
+    Буфер отложенной записи истории поиска.
+
+    Запросы копятся в памяти процесса и записываются одним bulk_create,
+    когда буфер заполнен или с момента первой записи прошло
+    SEARCH_HISTORY_FLUSH_INTERVAL секунд. Срок проверяется только при
+    add() и в конце каждого запроса (request_finished): фонового таймера
+    нет, поэтому простаивающий воркер держит записи до следующего запроса
+    или до выхода процесса (atexit). Вместе с сырыми строками обновляются
+    дневные агрегаты SearchHistoryRollup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: List[SearchHistory] = []
+        self._first_added_at: Optional[float] = None
+
+    @property
+    def max_size(self) -> int:
+        return getattr(settings, 'SEARCH_HISTORY_BUFFER_SIZE', 50)
+
+    @property
+    def flush_interval(self) -> int:
+        return getattr(settings, 'SEARCH_HISTORY_FLUSH_INTERVAL', 10)
+
+    def add(self, query: str, search_type: str, results_count: int) -> None:
+        """Ставит запрос в буфер и при необходимости сбрасывает его в БД"""
+        with self._lock:
+            self._pending.append(SearchHistory(
+                query=query[:500],
+                search_type=search_type,
+                results_count=results_count,
+                created=timezone.now(),
+            ))
+            if self._first_added_at is None:
+                self._first_added_at = time.monotonic()
+        self.flush_if_due()
+
+    def flush_if_due(self) -> None:
+        """Сбрасывает буфер, если он заполнен или устарел"""
+        with self._lock:
+            if not self._pending:
+                return
+            due = (
+                len(self._pending) >= self.max_size
+                or time.monotonic() - self._first_added_at >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Записывает накопленные запросы и обновляет агрегаты"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._first_added_at = None
+        if not batch:
+            return 0
+
+        try:
+            with transaction.atomic():
+                SearchHistory.objects.bulk_create(batch)
+                self._update_rollups(batch)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} search history entries: {e}")
+            with self._lock:
+                # Возвращаем пачку в буфер, ограничивая его рост
+                self._pending = (batch + self._pending)[-self.max_size * 10:]
+                if self._first_added_at is None:
+                    self._first_added_at = time.monotonic()
+            return 0
+        return len(batch)
+
+    def _update_rollups(self, batch: List[SearchHistory]) -> None:
+        totals: Dict[tuple, List[int]] = OrderedDict()
+        for entry in batch:
+            key = (entry.query, entry.search_type, timezone.localdate(entry.created))
+            count, _ = totals.get(key, (0, 0))
+            totals[key] = [count + 1, entry.results_count]
+
+        SearchHistoryRollup.objects.bulk_create(
+            [SearchHistoryRollup(query=query, search_type=search_type, day=day)
+             for query, search_type, day in totals],
+            ignore_conflicts=True
         )
+        # Инкремент через F() безопасен при одновременном сбросе из нескольких воркеров
+        for (query, search_type, day), (count, last_results_count) in totals.items():
+            SearchHistoryRollup.objects.filter(
+                query=query, search_type=search_type, day=day
+            ).update(
+                count=F('count') + count,
+                last_results_count=last_results_count,
+                updated=timezone.now()
+            )
+
+    def prune(self, days: int) -> int:
+        """Удаляет сырые записи старше указанного количества дней"""
+        cutoff = timezone.now() - timedelta(days=days)
+        deleted, _ = SearchHistory.objects.filter(created__lt=cutoff).delete()
+        return deleted
 
 
 # Глобальные экземпляры сервисов
 api_service = RickAndMortyAPIService()
+async_api_service = AsyncRickAndMortyAPIService()
 sync_service = DataSyncService()
+search_history_buffer = SearchHistoryBuffer()
+
 
+def warm_trending_cache(limit: int = 10) -> int:
+    """Прогревает кэш API для текущих популярных запросов"""
+    fetchers = {
+        'character': lambda query: api_service.get_characters(page=1, name=query),
+        'episode': lambda query: api_service.get_episodes(page=1, name=query),
+        'location': lambda query: api_service.get_locations(page=1, name=query),
+    }
+    warmed = 0
+    for item in trending_tracker.top(limit):
+        fetcher = fetchers.get(item['search_type'])
+        if fetcher and fetcher(item['query']):
+            warmed += 1
+    return warmed
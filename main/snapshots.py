@@ -0,0 +1,125 @@
+"""
+Снимки зеркала для чтения: неизменяемая копия базы SQLite.
+
+Синхронизация и запись (история поиска, админка) идут в рабочую базу
+`default`. После синхронизации sync_data выполняет ANALYZE и копирует базу
+через `VACUUM INTO` в новый файл снимка, затем атомарно переключает
+символическую ссылку `current.sqlite3` на него. Чтение зеркала
+(SnapshotRouter) идет в базу `snapshot`, открытую как
+`?mode=ro&immutable=1`: без блокировок и без конкуренции с записью.
+
+Соединение воркера остается на своем файле до конца запроса; в начале
+следующего запроса reopen_if_published() закрывает его, если опубликован
+новый снимок. Старые файлы удаляются, кроме SNAPSHOT_KEEP последних
+(открытые соединения продолжают читать удаленный файл до закрытия).
+"""
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DB = 'snapshot'
+CURRENT_LINK = 'current.sqlite3'
+
+
+def snapshot_uri(path: str) -> str:
+    """URI для открытия файла снимка только на чтение без блокировок"""
+    return f'file:{path}?mode=ro&immutable=1'
+
+
+class SnapshotStore:
+    """Публикация снимков и переключение соединений на новый снимок"""
+
+    @property
+    def directory(self) -> str:
+        return getattr(settings, 'SNAPSHOT_DIR', '')
+
+    @property
+    def keep(self) -> int:
+        return max(getattr(settings, 'SNAPSHOT_KEEP', 2), 1)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and SNAPSHOT_DB in settings.DATABASES
+
+    @property
+    def link_path(self) -> str:
+        return os.path.join(self.directory, CURRENT_LINK)
+
+    def current_path(self) -> Optional[str]:
+        """Файл опубликованного снимка или None, если снимков еще нет"""
+        if not self.directory:
+            return None
+        path = os.path.realpath(self.link_path)
+        return path if os.path.exists(path) and path != self.link_path else None
+
+    @property
+    def available(self) -> bool:
+        return self.enabled and self.current_path() is not None
+
+    def snapshots(self) -> List[str]:
+        """Файлы снимков от старых к новым"""
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith('mirror-') and name.endswith('.sqlite3')
+        )
+        return [os.path.join(self.directory, name) for name in names]
+
+    def publish(self, using: str = DEFAULT_DB_ALIAS) -> str:
+        """Копирует рабочую базу в новый снимок и переключает на него чтение"""
+        connection = connections[using]
+        if connection.vendor != 'sqlite':
+            raise ValueError('Снимки поддерживаются только для SQLite')
+        os.makedirs(self.directory, exist_ok=True)
+
+        path = os.path.join(self.directory, f'mirror-{time.time_ns()}.sqlite3')
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            # Статистика планировщика попадает в снимок вместе с данными
+            cursor.execute('ANALYZE')
+            cursor.execute('VACUUM INTO %s', [path])
+
+        # rename атомарен: читатель видит либо старую, либо новую ссылку
+        temporary = f'{self.link_path}.{os.getpid()}.tmp'
+        os.symlink(os.path.basename(path), temporary)
+        os.replace(temporary, self.link_path)
+        logger.info(f"Published mirror snapshot {path} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        self.prune()
+        return path
+
+    def prune(self) -> None:
+        current = self.current_path()
+        for path in self.snapshots()[:-self.keep]:
+            if path != current:
+                os.remove(path)
+
+    def reopen_if_published(self) -> None:
+        """Начало запроса: соединение со старым снимком переключается на текущий"""
+        if not self.enabled:
+            return
+        current = self.current_path()
+        wrapper = connections[SNAPSHOT_DB]
+        if current is None or getattr(wrapper, 'snapshot_path', None) == current:
+            return
+        if wrapper.connection is not None:
+            wrapper.close()
+        # Словарь настроек общий для потоков - у соединения потока своя копия
+        wrapper.settings_dict = {**wrapper.settings_dict, 'NAME': snapshot_uri(current)}
+        wrapper.snapshot_path = current
+
+    def stats(self) -> Dict:
+        current = self.current_path()
+        return {
+            'enabled': self.enabled,
+            'current': os.path.basename(current) if current else None,
+            'published': os.path.getmtime(current) if current else None,
+        }
+
+
+snapshot_store = SnapshotStore()
@@ -0,0 +1,36 @@
+"""
+Шаблонный тег для кэширования карточек.
+
+    {% load fragment_cache %}
+    {% cardcache 'character-card' character %}
+        ...разметка карточки...
+    {% endcardcache %}
+"""
+from django import template
+
+from ..fragment_cache import fragment_cache
+
+register = template.Library()
+
+
+class CardCacheNode(template.Node):
+    def __init__(self, nodelist, fragment, obj):
+        self.nodelist = nodelist
+        self.fragment = fragment
+        self.obj = obj
+
+    def render(self, context):
+        fragment = self.fragment.resolve(context)
+        obj = self.obj.resolve(context)
+        return fragment_cache.render(fragment, obj, lambda: self.nodelist.render(context))
+
+
+@register.tag('cardcache')
+def do_cardcache(parser, token):
+    """{% cardcache <имя фрагмента> <сущность> %} ... {% endcardcache %}"""
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name and an object")
+    nodelist = parser.parse(('endcardcache',))
+    parser.delete_first_token()
+    return CardCacheNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
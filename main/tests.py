@@ -1,9 +1,20 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, AsyncRequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse
 from django.contrib.auth.models import User
-from unittest.mock import patch, MagicMock
-from .models import Character, Episode, Location, SearchHistory
-from .services import api_service, sync_service
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import date, timedelta
+import json
+import re
+from asgiref.sync import sync_to_async
+from io import StringIO
+from unittest.mock import patch, MagicMock, AsyncMock
+from .models import (
+    Character, Episode, Location, MirrorCoverage, SearchHistory, SearchHistoryRollup, Tombstone,
+)
+from .services import api_service, sync_service, search_history_buffer
 
 
 class ModelTests(TestCase):
@@ -60,6 +71,10 @@ class ViewTests(TestCase):
     def setUp(self):
         self.client = Client()
     
+    def tearDown(self):
+        # Записываем буфер истории поиска внутри транзакции теста
+        search_history_buffer.flush()
+    
     def test_home_view(self):
         """Тест главной страницы"""
         response = self.client.get(reverse('main:home'))
@@ -127,14 +142,19 @@ class ServiceTests(TestCase):
     
     def test_search_history_creation(self):
         """Тест создания истории поиска"""
+        search_history_buffer.flush()
         initial_count = SearchHistory.objects.count()
         sync_service.save_search_history("Rick", "character", 5)
+        search_history_buffer.flush()
         self.assertEqual(SearchHistory.objects.count(), initial_count + 1)
 
 
 class APITests(TestCase):
     """Простые тесты для API"""
     
+    def tearDown(self):
+        search_history_buffer.flush()
+    
     def test_api_search_endpoint(self):
         """Тест API поиска"""
         with patch('main.services.api_service.get_characters') as mock_api:
@@ -174,3 +194,1521 @@ class IntegrationTests(TestCase):
             mock_api.return_value = None
             response = self.client.get(reverse('main:character-detail', kwargs={'character_id': 9999}))
             self.assertEqual(response.status_code, 404)
+
+
+class FullTextSearchTests(TestCase):
+    """Тесты полнотекстового индекса"""
+    
+    def setUp(self):
+        earth = sync_service.sync_location({
+            'id': 1, 'name': 'Earth (C-137)', 'type': 'Planet', 'dimension': 'Dimension C-137'
+        })
+        Character.objects.create(api_id=2, name="Morty Smith", species="Human", origin=earth)
+        self.rick = Character.objects.create(api_id=1, name="Rick Sanchez", species="Human", origin=earth)
+        from .fulltext import fulltext_index
+        self.index = fulltext_index
+        self.index.rebuild()
+    
+    def tearDown(self):
+        search_history_buffer.flush()
+    
+    def test_search_by_name_prefix(self):
+        """Тест поиска по префиксам нескольких слов"""
+        results = self.index.search('character', 'rick sanch')
+        self.assertEqual([char.api_id for char in results], [1])
+    
+    def test_search_by_related_location_name(self):
+        """Тест поиска персонажей по названию локации происхождения"""
+        results = self.index.search('character', 'earth')
+        self.assertEqual({char.api_id for char in results}, {1, 2})
+    
+    def test_sync_updates_index(self):
+        """Тест обновления индекса при синхронизации"""
+        sync_service.sync_episode({'id': 1, 'name': 'Pilot', 'episode': 'S01E01'})
+        results = self.index.search('episode', 'S01E01')
+        self.assertEqual([ep.api_id for ep in results], [1])
+    
+    def test_delete_removes_from_index(self):
+        """Тест: удаленная запись зеркала больше не находится в индексе"""
+        rick_pk = self.rick.pk
+        episode = sync_service.sync_episode({'id': 1, 'name': 'Pilot', 'episode': 'S01E01'})
+        self.assertIn(rick_pk, self.index.search_ids('character', 'rick'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rick.delete()
+            episode.delete()
+        self.assertEqual(self.index.search_ids('character', 'rick'), [])
+        self.assertEqual(self.index.search_ids('episode', 'pilot'), [])
+        self.assertEqual(len(self.index.search_ids('character', 'earth')), 1)
+    
+    def test_search_view_uses_local_index_when_api_empty(self):
+        """Тест локального поиска, когда API ничего не вернул"""
+        with patch('main.services.api_service.get_characters') as mock_api:
+            mock_api.return_value = None
+            response = self.client.get(reverse('main:search'), {'q': 'Sanchez', 'type': 'character'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['data_source'], 'database')
+            self.assertContains(response, "Rick Sanchez")
+
+
+class FuzzySearchTests(TestCase):
+    """Тесты нечеткого поиска по триграммам"""
+    
+    def setUp(self):
+        Character.objects.create(api_id=1, name="Rick Sanchez")
+        Character.objects.create(api_id=2, name="Morty Smith")
+        Character.objects.create(api_id=3, name="Birdperson")
+        from .fuzzy import fuzzy_index
+        self.index = fuzzy_index
+        self.index.invalidate()
+    
+    def test_typo_suggestion(self):
+        """Тест подсказки для запроса с опечатками"""
+        self.assertEqual(self.index.suggest('character', 'Rik Sanches')[0], "Rick Sanchez")
+        self.assertEqual(self.index.suggest('character', 'Brdperson')[0], "Birdperson")
+    
+    def test_no_suggestion_for_unrelated_query(self):
+        """Тест отсутствия подсказок для несвязанного запроса"""
+        self.assertEqual(self.index.suggest('character', 'xyzzy'), [])
+    
+    def test_search_view_did_you_mean(self):
+        """Тест блока "Возможно, вы имели в виду" на странице поиска"""
+        with patch('main.services.api_service.get_characters') as mock_api:
+            mock_api.return_value = None
+            response = self.client.get(reverse('main:search'), {'q': 'Rik Sanches', 'type': 'character'})
+            self.assertEqual(response.context['suggestions'][0], "Rick Sanchez")
+            self.assertContains(response, "Возможно, вы имели в виду")
+    
+    def test_api_search_suggestions(self):
+        """Тест подсказок в API поиска"""
+        with patch('main.services.api_service.get_characters') as mock_api:
+            mock_api.return_value = None
+            response = self.client.get(reverse('main:api-search'), {'q': 'Mroty Smith', 'type': 'character'})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()['suggestions'][0], "Morty Smith")
+
+
+class AutocompleteTests(TestCase):
+    """Тесты автодополнения"""
+    
+    def setUp(self):
+        Character.objects.create(api_id=1, name="Rick Sanchez")
+        Character.objects.create(api_id=2, name="Morty Smith")
+        Character.objects.create(api_id=3, name="Rick Sanchez")
+        from .autocomplete import autocomplete_index
+        autocomplete_index.invalidate()
+    
+    def test_prefix_and_word_prefix(self):
+        """Тест совпадений по началу названия и по началу слова"""
+        response = self.client.get(reverse('main:api-suggest'), {'q': 'ric', 'type': 'character'})
+        self.assertEqual(response.json()['suggestions'], ["Rick Sanchez"])
+        response = self.client.get(reverse('main:api-suggest'), {'q': 'smi', 'type': 'character'})
+        self.assertEqual(response.json()['suggestions'], ["Morty Smith"])
+    
+    def test_response_is_cacheable(self):
+        """Тест заголовков кэширования"""
+        response = self.client.get(reverse('main:api-suggest'), {'q': 'r'})
+        self.assertIn('max-age=300', response['Cache-Control'])
+    
+    def test_invalid_type(self):
+        """Тест неверного типа"""
+        response = self.client.get(reverse('main:api-suggest'), {'q': 'r', 'type': 'planet'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchHistoryBufferTests(TestCase):
+    """Тесты буфера отложенной записи истории поиска"""
+    
+    def setUp(self):
+        search_history_buffer.flush()
+    
+    def tearDown(self):
+        search_history_buffer.flush()
+    
+    def test_entries_are_buffered_until_flush(self):
+        """Тест отложенной записи и агрегатов по дням"""
+        initial_count = SearchHistory.objects.count()
+        sync_service.save_search_history("Squanchy", "character", 5)
+        sync_service.save_search_history("Squanchy", "character", 7)
+        self.assertEqual(SearchHistory.objects.count(), initial_count)
+        
+        self.assertEqual(search_history_buffer.flush(), 2)
+        self.assertEqual(SearchHistory.objects.count(), initial_count + 2)
+        rollup = SearchHistoryRollup.objects.get(query="Squanchy", search_type="character")
+        self.assertEqual(rollup.count, 2)
+        self.assertEqual(rollup.last_results_count, 7)
+        
+        sync_service.save_search_history("Squanchy", "character", 3)
+        search_history_buffer.flush()
+        rollup.refresh_from_db()
+        self.assertEqual(rollup.count, 3)
+    
+    @override_settings(SEARCH_HISTORY_BUFFER_SIZE=2)
+    def test_flush_on_size_threshold(self):
+        """Тест сброса при заполнении буфера"""
+        initial_count = SearchHistory.objects.count()
+        sync_service.save_search_history("Morty", "character", 1)
+        sync_service.save_search_history("Summer", "character", 1)
+        self.assertEqual(SearchHistory.objects.count(), initial_count + 2)
+    
+    def test_prune_keeps_rollups(self):
+        """Тест удаления старых записей с сохранением агрегатов"""
+        sync_service.save_search_history("Pilot", "episode", 1)
+        search_history_buffer.flush()
+        SearchHistory.objects.filter(query="Pilot").update(created=timezone.now() - timedelta(days=40))
+        
+        call_command('prune_search_history', days=30, stdout=StringIO())
+        self.assertFalse(SearchHistory.objects.filter(query="Pilot").exists())
+        self.assertTrue(SearchHistoryRollup.objects.filter(query="Pilot").exists())
+
+
+class TrendingTests(TestCase):
+    """Тесты популярных запросов"""
+    
+    def setUp(self):
+        from .trending import TrendingTracker
+        # Отдельный трекер, чтобы счетчики других тестов не попадали в топ
+        self.tracker = TrendingTracker()
+        for target in ('main.services.trending_tracker', 'main.views.trending_tracker'):
+            patcher = patch(target, self.tracker)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def tearDown(self):
+        search_history_buffer.flush()
+    
+    def test_space_saving_evicts_minimum(self):
+        """Тест вытеснения минимального счетчика"""
+        from .trending import SpaceSaving
+        sketch = SpaceSaving(2)
+        for query in ["rick", "rick", "morty", "summer"]:
+            sketch.add(query, query, 'character')
+        self.assertEqual(set(sketch.counters), {"rick", "summer"})
+        self.assertEqual(sketch.counters["summer"][:2], [2.0, 1.0])
+    
+    def test_space_saving_merge_adds_floors(self):
+        """Тест слияния: ключ, которого нет в заполненном скетче, получает его минимум к счетчику и ошибке"""
+        from .trending import SpaceSaving
+        
+        def sketch(capacity, queries):
+            result = SpaceSaving(capacity)
+            for query in queries:
+                result.add(query, query, 'character')
+            return result
+        
+        shared = sketch(2, ["rick"] * 5 + ["morty"] * 3)
+        shared.merge(sketch(2, ["summer"]))
+        # summer могла быть вытеснена из общего скетча со счетчиком до 3 (его минимум)
+        self.assertEqual(shared.counters["summer"][:2], [4.0, 3.0])
+        self.assertEqual(set(shared.counters), {"rick", "summer"})
+        
+        # Оба скетча заполнены: ключам только одного из них добавляется минимум другого
+        shared = sketch(2, ["rick"] * 5 + ["morty"] * 3)
+        shared.merge(sketch(2, ["rick", "summer", "summer"]))
+        self.assertEqual(shared.counters["rick"][:2], [6.0, 0.0])
+        self.assertEqual(shared.counters["summer"][:2], [5.0, 3.0])
+        self.assertNotIn("morty", shared.counters)
+        
+        # Незаполненный скетч ничего не вытеснял - его минимум 0
+        partial = sketch(3, ["rick"])
+        partial.merge(sketch(2, ["summer"]))
+        self.assertEqual(partial.counters["summer"][:2], [1.0, 0.0])
+    
+    def test_persist_merges_into_shared_sketch(self):
+        """Тест сохранения и чтения общего скетча"""
+        for _ in range(3):
+            sync_service.save_search_history("Pickle Rick", "character", 2)
+        sync_service.save_search_history("Pilot", "episode", 1)
+        search_history_buffer.flush()
+        self.tracker.persist()
+        
+        top = self.tracker.top(10, 'character')
+        self.assertEqual(top[0]['query'], "Pickle Rick")
+        self.assertEqual(top[0]['score'], 3.0)
+        
+        response = self.client.get(reverse('main:api-trending'), {'type': 'episode'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['query'], "Pilot")
+    
+    def test_home_shows_trending(self):
+        """Тест блока популярных запросов на главной"""
+        sync_service.save_search_history("Birdperson", "character", 1)
+        search_history_buffer.flush()
+        response = self.client.get(reverse('main:home'))
+        self.assertContains(response, "Популярные поисковые запросы")
+        self.assertContains(response, "Birdperson")
+
+
+class PageCacheTests(TestCase):
+    """Тесты кэша страниц"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        Character.objects.create(api_id=999, name="Test Character", status="alive")
+        self.url = reverse('main:character-detail', kwargs={'character_id': 999})
+    
+    def test_second_request_is_served_from_cache(self):
+        """Тест попадания в кэш и ответа 304 по ETag"""
+        with patch('main.services.api_service.get_characters') as mock_api:
+            mock_api.return_value = {'results': [], 'info': {'count': 0, 'pages': 1}}
+            first = self.client.get(reverse('main:characters'), {'page': 1, 'name': ''})
+            second = self.client.get(reverse('main:characters'), {'page': '1'})
+            self.assertEqual(mock_api.call_count, 1)
+        self.assertEqual(first['X-Page-Cache'], 'MISS')
+        self.assertEqual(second['X-Page-Cache'], 'HIT')
+        self.assertIn('max-age=60', second['Cache-Control'])
+        
+        not_modified = self.client.get(reverse('main:characters'), {'page': '1'},
+                                       HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+    
+    def test_purge_by_tag(self):
+        """Тест инвалидации страницы по тегу"""
+        from .page_cache import page_cache
+        with patch('main.services.api_service.get_character') as mock_api:
+            mock_api.return_value = None
+            self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'MISS')
+            self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'HIT')
+            page_cache.purge('character:1000')
+            self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'HIT')
+            page_cache.purge('character:999')
+            self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'MISS')
+    
+    def test_sync_purges_only_changed_entities(self):
+        """Тест сброса кэша при изменении данных синхронизацией"""
+        location_data = {'id': 5, 'name': 'Citadel', 'type': 'Space station', 'dimension': 'unknown'}
+        sync_service.sync_location(location_data)
+        with patch('main.page_cache.PageCache.purge') as mock_purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                sync_service.sync_location(location_data)
+            mock_purge.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                sync_service.sync_location(dict(location_data, name='Citadel of Ricks'))
+            mock_purge.assert_called_once_with('location:5')
+
+
+class FragmentCacheTests(TestCase):
+    """Тесты кэша карточек"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+    
+    def test_card_key_follows_updated(self):
+        """Тест повторного использования карточки до изменения сущности"""
+        from django.template import Template, Context
+        from .fragment_cache import fragment_cache
+        template = Template(
+            "{% load fragment_cache %}{% cardcache 'test-card' character %}{{ character.name }}{% endcardcache %}"
+        )
+        character = Character.objects.create(api_id=1, name="Rick Sanchez")
+        hits = fragment_cache.hits
+        
+        self.assertEqual(template.render(Context({'character': character})), "Rick Sanchez")
+        self.assertEqual(template.render(Context({'character': character})), "Rick Sanchez")
+        self.assertEqual(fragment_cache.hits, hits + 1)
+        
+        character.name = "Evil Rick"
+        character.save()
+        self.assertEqual(template.render(Context({'character': character})), "Evil Rick")
+    
+    def test_server_timing_reports_fragment_hits(self):
+        """Тест заголовка Server-Timing со статистикой фрагментов"""
+        characters = [
+            {'id': i, 'name': f'Character {i}', 'status': 'Alive', 'species': 'Human',
+             'gender': 'Male', 'origin': {'name': 'Earth'}, 'image': ''}
+            for i in (1, 2)
+        ]
+        with patch('main.services.api_service.get_characters') as mock_api, \
+             patch('main.services.sync_service.sync_character'):
+            mock_api.return_value = {'results': characters, 'info': {'count': 2, 'pages': 1}}
+            first = self.client.get(reverse('main:characters'))
+            # Другие параметры - другая страница в кэше страниц, но те же карточки
+            second = self.client.get(reverse('main:characters'), {'species': 'Human'})
+        
+        self.assertIn('fragments;desc="hits=0 misses=2', first['Server-Timing'])
+        self.assertIn('fragments;desc="hits=2 misses=0', second['Server-Timing'])
+        self.assertIn('total;dur=', second['Server-Timing'])
+
+
+class AsyncViewsTests(TestCase):
+    """Тесты асинхронных views и неблокирующего клиента API"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+    
+    async def test_async_client_caches_responses(self):
+        """Тест запроса через httpx и повторного ответа из кэша"""
+        import httpx
+        from .services import AsyncRickAndMortyAPIService
+        
+        calls = []
+        
+        def handler(request):
+            calls.append(request.url.path)
+            if request.url.path.endswith('/404'):
+                return httpx.Response(404)
+            return httpx.Response(200, json={'id': 1, 'name': 'Rick Sanchez'})
+        
+        clients = []
+        
+        def new_client():
+            clients.append(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            return clients[-1]
+        
+        service = AsyncRickAndMortyAPIService()
+        service._new_client = new_client
+        
+        self.assertEqual((await service.get_character(1))['name'], 'Rick Sanchez')
+        self.assertEqual((await service.get_character(1))['name'], 'Rick Sanchez')
+        self.assertIsNone(await service.get_character(404))
+        self.assertEqual(len(calls), 2)
+        # Тест выполняется во временном loop async_to_sync: клиент на запрос закрывается
+        self.assertEqual(len(clients), 2)
+        self.assertTrue(all(client.is_closed for client in clients))
+        self.assertIsNone(service._client)
+    
+    def test_server_loop_shares_client(self):
+        """Тест: loop главного потока (ASGI) держит общий клиент, при смене loop старый закрывается"""
+        import asyncio
+        import httpx
+        from .services import AsyncRickAndMortyAPIService
+        
+        clients = []
+        
+        def handler(request):
+            return httpx.Response(200, json={'id': 1, 'name': 'Rick Sanchez'})
+        
+        def new_client():
+            clients.append(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            return clients[-1]
+        
+        service = AsyncRickAndMortyAPIService()
+        service._new_client = new_client
+        
+        async def fetch(*ids):
+            for api_id in ids:
+                await service._make_request(f'character/{api_id}')
+        
+        asyncio.run(fetch(1, 2))
+        self.assertEqual(len(clients), 1)
+        self.assertFalse(clients[0].is_closed)
+        asyncio.run(fetch(3))
+        self.assertEqual(len(clients), 2)
+        self.assertTrue(clients[0].is_closed)
+        asyncio.run(clients[1].aclose())
+    
+    async def test_async_list_view(self):
+        """Тест асинхронной страницы списка персонажей"""
+        from .views import characters_view_async
+        api_data = {
+            'results': [{'id': 1, 'name': 'Rick Sanchez', 'status': 'Alive', 'species': 'Human',
+                         'gender': 'Male', 'origin': {'name': 'Earth'}, 'image': ''}],
+            'info': {'count': 1, 'pages': 1},
+        }
+        with patch('main.views.async_api_service._make_request', new=AsyncMock(return_value=api_data)), \
+             patch('main.services.sync_service.sync_character'):
+            response = await characters_view_async(self.factory.get('/characters/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Rick Sanchez')
+    
+    async def test_async_search_api(self):
+        """Тест асинхронного API поиска: подсказки при недоступном API и валидация"""
+        from .views import search_api_view_async
+        with patch('main.views.async_api_service._make_request', new=AsyncMock(return_value=None)):
+            response = await search_api_view_async(self.factory.get('/api/search/', {'q': 'Rick'}))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('suggestions', json.loads(response.content))
+        
+        response = await search_api_view_async(self.factory.get('/api/search/'))
+        self.assertEqual(response.status_code, 400)
+
+
+class FreshMirrorTests(TestCase):
+    """Тесты рендера детальных страниц из свежего зеркала"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.character_data = {
+            'id': 1, 'name': 'Rick Sanchez', 'status': 'Alive', 'species': 'Human', 'type': '',
+            'gender': 'Male', 'origin': {'name': 'Earth (C-137)', 'url': ''},
+            'location': {'name': 'Citadel of Ricks', 'url': ''}, 'image': '', 'episode': [], 'url': '',
+        }
+        sync_service.sync_character(self.character_data)
+        self.url = reverse('main:character-detail', kwargs={'character_id': 1})
+    
+    def test_fresh_row_skips_api(self):
+        """Тест рендера из сохраненного ответа API без запроса к API"""
+        with patch('main.services.api_service.get_character') as mock_api, \
+             patch('main.services.sync_service.sync_character') as mock_sync:
+            response = self.client.get(self.url)
+        mock_api.assert_not_called()
+        mock_sync.assert_not_called()
+        self.assertContains(response, 'Citadel of Ricks')
+        self.assertFalse(response.context['from_db'])
+    
+    def test_stale_row_is_refreshed(self):
+        """Тест обращения к API, когда строка зеркала устарела"""
+        Character.objects.filter(api_id=1).update(updated=timezone.now() - timedelta(days=2))
+        with patch('main.services.api_service.get_character') as mock_api:
+            mock_api.return_value = dict(self.character_data, name='Rick Prime')
+            response = self.client.get(self.url)
+        mock_api.assert_called_once_with(1)
+        self.assertContains(response, 'Rick Prime')
+        self.assertEqual(Character.objects.get(api_id=1).payload['name'], 'Rick Prime')
+    
+    @override_settings(MIRROR_FRESHNESS_SECONDS=0)
+    def test_freshness_window_disabled(self):
+        """Тест отключения окна свежести"""
+        with patch('main.services.api_service.get_character') as mock_api:
+            mock_api.return_value = self.character_data
+            self.client.get(self.url)
+        mock_api.assert_called_once_with(1)
+
+
+class CastHydrationTests(TestCase):
+    """Тесты карточек состава эпизода и жителей локации"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+    
+    @staticmethod
+    def character_payload(api_id):
+        return {'id': api_id, 'name': f'Character {api_id}', 'status': 'Alive',
+                'species': 'Human', 'image': f'https://example.com/{api_id}.jpeg'}
+    
+    def test_mirror_first_then_one_batch_request(self):
+        """Тест: промахи зеркала загружаются одним запросом, порядок сохраняется"""
+        from .hydration import hydrate_characters
+        Character.objects.create(api_id=2, name="Morty Smith", status="alive")
+        service = MagicMock()
+        service.get_characters_batch.return_value = [self.character_payload(3), self.character_payload(1)]
+        
+        cards = hydrate_characters([1, 2, 3], service)
+        
+        service.get_characters_batch.assert_called_once_with([1, 3])
+        self.assertEqual([card['name'] for card in cards], ['Character 1', 'Morty Smith', 'Character 3'])
+    
+    def test_batch_request_uses_per_id_cache(self):
+        """Тест запроса по нескольким id и кэша по одному ключу на персонажа"""
+        with patch.object(api_service, '_make_request') as mock_request:
+            mock_request.return_value = [self.character_payload(5), self.character_payload(6)]
+            first = api_service.get_characters_batch([5, 6])
+            second = api_service.get_characters_batch([6, 5])
+            single = api_service.get_character(5)
+        
+        mock_request.assert_called_once_with('character/5,6', expected=(dict, list))
+        self.assertEqual([item['id'] for item in first], [5, 6])
+        self.assertEqual([item['id'] for item in second], [6, 5])
+        self.assertEqual(single['name'], 'Character 5')
+    
+    def test_episode_page_is_paginated(self):
+        """Тест: на странице эпизода разрешаются только id текущей страницы состава"""
+        episode_data = {
+            'id': 1, 'name': 'Pilot', 'air_date': 'December 2, 2013', 'episode': 'S01E01', 'url': '',
+            'characters': [f'https://rickandmortyapi.com/api/character/{i}' for i in range(1, 31)],
+        }
+        url = reverse('main:episode-detail', kwargs={'episode_id': 1})
+        with patch('main.services.api_service.get_episode', return_value=episode_data), \
+             patch('main.services.api_service.get_characters_batch') as mock_batch:
+            mock_batch.side_effect = lambda ids: [self.character_payload(i) for i in ids]
+            first = self.client.get(url)
+            self.assertEqual(mock_batch.call_args[0][0], list(range(1, 25)))
+            second = self.client.get(url, {'cast_page': 2})
+            self.assertEqual(mock_batch.call_args[0][0], list(range(25, 31)))
+        
+        self.assertContains(first, 'Character 24')
+        self.assertNotContains(first, 'Character 25')
+        self.assertContains(second, 'Character 30')
+        self.assertContains(second, '25-30 из 30')
+
+
+class MirrorAPITests(TestCase):
+    """Тесты read-only API над локальным зеркалом"""
+    
+    def setUp(self):
+        from .trending import trending_tracker
+        # Сохранение скетча по сигналу request_finished не должно попасть в подсчет запросов
+        trending_tracker.persist()
+    
+    def create_characters(self, start, count):
+        earth = Location.objects.get_or_create(api_id=1, defaults={'name': 'Earth'})[0]
+        episode = Episode.objects.get_or_create(api_id=1, defaults={'name': 'Pilot', 'episode': 'S01E01'})[0]
+        for api_id in range(start, start + count):
+            character = Character.objects.create(
+                api_id=api_id, name=f"Character {api_id}", status="alive",
+                origin=earth, location=earth
+            )
+            character.episodes.add(episode)
+    
+    def test_list_query_count_is_constant(self):
+        """Тест: число запросов на страницу не зависит от числа персонажей"""
+        self.create_characters(1, 3)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/characters/')
+        self.assertEqual(response.json()['results'][0]['episodes_count'], 1)
+        
+        self.create_characters(100, 15)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/characters/')
+        self.assertEqual(response.json()['count'], 18)
+    
+    def test_detail_query_count_is_constant(self):
+        """Тест: детальные эпизод и локация с вложенными персонажами без N+1"""
+        self.create_characters(1, 10)
+        Character.objects.get(api_id=1).episodes.add(Episode.objects.create(api_id=2, name="Lawnmower Dog"))
+        with self.assertNumQueries(2):
+            episode = self.client.get('/api/episodes/1/').json()
+        self.assertEqual(episode['characters_count'], 10)
+        self.assertEqual(len(episode['characters']), 10)
+        self.assertEqual(episode['characters'][0]['origin_name'], 'Earth')
+        self.assertEqual(episode['characters'][0]['episodes_count'], 2)
+        
+        with self.assertNumQueries(3):
+            location = self.client.get('/api/locations/1/').json()
+        self.assertEqual(location['current_characters_count'], 10)
+        self.assertEqual(location['origin_characters_count'], 10)
+    
+    def test_filters(self):
+        """Тест фильтров и их валидации"""
+        self.create_characters(1, 2)
+        Character.objects.create(api_id=50, name="Birdperson", status="dead")
+        response = self.client.get('/api/characters/', {'status': 'dead'})
+        self.assertEqual([item['name'] for item in response.json()['results']], ['Birdperson'])
+        response = self.client.get('/api/characters/', {'name': 'charac'})
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(self.client.get('/api/characters/', {'status': 'zombie'}).status_code, 400)
+
+
+class KeysetPaginationTests(TestCase):
+    """Тесты курсорной пагинации API"""
+    
+    def setUp(self):
+        from .trending import trending_tracker
+        trending_tracker.persist()
+        # Повторяющиеся имена проверяют второй компонент ключа (id)
+        for api_id in range(1, 26):
+            Character.objects.create(api_id=api_id, name=f"Rick {api_id % 7}")
+        self.expected = list(
+            Character.objects.order_by('name', 'id').values_list('api_id', flat=True)
+        )
+    
+    def walk(self, url, link):
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append([item['api_id'] for item in data['results']])
+            url = data[link]
+        return pages
+    
+    def test_forward_and_backward(self):
+        """Тест обхода страниц вперед и назад без пропусков и повторов"""
+        pages = self.walk('/api/characters/?page_size=10', 'next')
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), self.expected)
+        
+        last = self.client.get('/api/characters/?page_size=10').json()
+        last = self.client.get(last['next']).json()
+        last = self.client.get(last['next']).json()
+        backward = self.walk(last['previous'], 'previous')
+        self.assertEqual(sum(reversed(backward), []), self.expected[:20])
+    
+    def test_deep_page_query_count(self):
+        """Тест: глубокая страница - те же два запроса, без OFFSET"""
+        data = self.client.get('/api/characters/?page_size=10').json()
+        data = self.client.get(data['next']).json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(data['next'])
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('OFFSET', queries[1]['sql'])
+    
+    def test_count_modes(self):
+        """Тест режимов подсчета и неверного курсора"""
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/characters/', {'count': 'none'}).json()
+        self.assertIsNone(data['count'])
+        
+        data = self.client.get('/api/characters/', {'count': 'approximate'}).json()
+        self.assertTrue(data['count_approximate'])
+        self.assertGreaterEqual(data['count'], 25)
+        data = self.client.get('/api/characters/', {'count': 'approximate', 'name': 'rick 1'}).json()
+        self.assertEqual(data['count'], 4)
+        
+        self.assertEqual(self.client.get('/api/characters/', {'cursor': 'garbage'}).status_code, 404)
+
+
+class SparseFieldsetTests(TestCase):
+    """Тесты выбора полей ответа API (?fields= / ?expand=)"""
+    
+    def setUp(self):
+        from .trending import trending_tracker
+        trending_tracker.persist()
+        earth = Location.objects.create(api_id=1, name="Earth", type="Planet")
+        episode = Episode.objects.create(api_id=1, name="Pilot", episode="S01E01")
+        for api_id in (1, 2):
+            character = Character.objects.create(
+                api_id=api_id, name=f"Rick {api_id}", status="alive",
+                image=f"https://example.com/{api_id}.jpeg", origin=earth, location=earth
+            )
+            character.episodes.add(episode)
+    
+    def test_list_projection(self):
+        """Тест: в ответе и в SELECT только запрошенные поля"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/characters/', {'fields': 'api_id,name,image,status'})
+        item = response.json()['results'][0]
+        self.assertEqual(set(item), {'api_id', 'name', 'image', 'status'})
+        select = queries[-1]['sql']
+        self.assertNotIn('JOIN', select)
+        self.assertNotIn('"species"', select)
+        self.assertNotIn('episodes', select)
+    
+    def test_related_column_projection(self):
+        """Тест: поле связанной модели добавляет JOIN только к ней"""
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/characters/', {'fields': 'name,origin_name,status_display'})
+        item = response.json()['results'][0]
+        self.assertEqual(item, {'name': 'Rick 1', 'origin_name': 'Earth', 'status_display': 'Живой'})
+    
+    def test_detail_expand(self):
+        """Тест: вложенные связи загружаются только по запросу"""
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/characters/1/', {'fields': 'name'}).json()
+        self.assertEqual(data, {'name': 'Rick 1'})
+        
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/characters/1/', {'fields': 'name', 'expand': 'episodes'}).json()
+        self.assertEqual([episode['episode'] for episode in data['episodes']], ['S01E01'])
+        
+        data = self.client.get('/api/characters/1/').json()
+        self.assertEqual(data['origin']['name'], 'Earth')
+        self.assertEqual(len(data['episodes']), 1)
+    
+    def test_unknown_fields(self):
+        """Тест: неизвестные поля и нераскрываемые связи - 400"""
+        self.assertEqual(self.client.get('/api/characters/', {'fields': 'name,secret'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/episodes/1/', {'expand': 'name'}).status_code, 400)
+
+
+class FastSerializationTests(TestCase):
+    """Тесты быстрой сериализации списков и orjson рендерера"""
+    
+    def setUp(self):
+        from .trending import trending_tracker
+        trending_tracker.persist()
+        earth = Location.objects.create(api_id=1, name="Earth", type="Planet", dimension="C-137")
+        Episode.objects.create(api_id=1, name="Pilot", episode="S01E01", air_date="December 2, 2013")
+        Character.objects.create(api_id=1, name="Rick", status="alive", gender="male", origin=earth)
+        Character.objects.create(api_id=2, name="Мистер Жопосранчик", status="dead")
+    
+    def test_matches_model_serializers(self):
+        """Тест: вывод совпадает с ModelSerializer для всех списков"""
+        from .fast_serialization import fast_row_serializer
+        from .serializers import CharacterListSerializer, EpisodeSerializer, LocationSerializer
+        from .views import characters_with_relations
+        cases = [
+            (CharacterListSerializer, characters_with_relations()),
+            (EpisodeSerializer, Episode.objects.all()),
+            (LocationSerializer, Location.objects.all()),
+        ]
+        for serializer_class, queryset in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                fast = fast_row_serializer(serializer_class)
+                expected = serializer_class(queryset.order_by('id'), many=True).data
+                self.assertEqual(fast.serialize(queryset.order_by('id').values(*fast.columns)), expected)
+    
+    def test_list_endpoint_uses_fast_path(self):
+        """Тест: список API совпадает с сериализатором и отдается orjson"""
+        response = self.client.get('/api/characters/', {'fields': 'api_id,name,status_display,origin_name'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('Мистер Жопосранчик'.encode(), response.content)
+        self.assertEqual(response.json()['results'], [
+            {'api_id': 1, 'name': 'Rick', 'status_display': 'Живой', 'origin_name': 'Earth'},
+            {'api_id': 2, 'name': 'Мистер Жопосранчик', 'status_display': 'Мертвый', 'origin_name': None},
+        ])
+    
+    def test_renderer_matches_drf_json(self):
+        """Тест: orjson рендерер кодирует даты и lazy строки как JSONRenderer"""
+        from datetime import datetime, timezone as dt_timezone
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import ORJSONRenderer
+        data = {'when': datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+                'label': gettext_lazy('Пилот'), 'ids': [1, 2]}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+
+class ExportTests(TestCase):
+    """Тесты потоковой выгрузки зеркала"""
+    
+    def setUp(self):
+        from .trending import trending_tracker
+        trending_tracker.persist()
+        earth = Location.objects.create(api_id=1, name="Earth", type="Planet")
+        pilot = Episode.objects.create(api_id=1, name="Pilot", episode="S01E01")
+        dog = Episode.objects.create(api_id=2, name="Lawnmower Dog", episode="S01E02")
+        rick = Character.objects.create(api_id=1, name="Rick", status="alive", origin=earth, location=earth)
+        rick.episodes.add(pilot, dog)
+        Character.objects.create(api_id=2, name="Морти, \"младший\"", status="alive")
+    
+    def read(self, response):
+        return b''.join(response.streaming_content)
+    
+    @override_settings(EXPORT_CHUNK_SIZE=1)
+    def test_ndjson_with_relations(self):
+        """Тест NDJSON: по строке на запись, связи списками api_id"""
+        response = self.client.get('/api/export/characters.ndjson')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['api_id'] for row in rows], [1, 2])
+        self.assertEqual(rows[0]['episodes'], [1, 2])
+        self.assertEqual(rows[0]['origin_api_id'], 1)
+        self.assertEqual(rows[1]['episodes'], [])
+        self.assertIsNone(rows[1]['location_api_id'])
+        
+        rows = [json.loads(line) for line in self.read(self.client.get('/api/export/locations.ndjson')).splitlines()]
+        self.assertEqual(rows[0]['current_characters'], [1])
+    
+    def test_csv(self):
+        """Тест CSV: заголовок, экранирование и списки через пробел"""
+        import csv
+        content = self.read(self.client.get('/api/export/episodes.csv')).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(rows[0]['characters'], '1')
+        self.assertEqual(rows[1]['episode'], 'S01E02')
+        
+        content = self.read(self.client.get('/api/export/characters.csv')).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(rows[1]['name'], 'Морти, "младший"')
+    
+    def test_updated_since_and_gzip(self):
+        """Тест фильтра updated_since, сжатия и неверных параметров"""
+        import gzip
+        Character.objects.filter(api_id=1).update(updated=timezone.now() - timedelta(days=10))
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        response = self.client.get('/api/export/characters.ndjson', {'updated_since': since},
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = gzip.decompress(self.read(response)).splitlines()
+        self.assertEqual([json.loads(row)['api_id'] for row in rows], [2])
+        
+        response = self.client.get('/api/export/characters.ndjson', {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/export/users.csv').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/characters.xml').status_code, 404)
+    
+    async def test_asgi_streams_async(self):
+        """Тест: под ASGI выгрузка отдается асинхронным итератором по пачкам"""
+        response = await self.async_client.get('/api/export/characters.ndjson')
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.splitlines()), 2)
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    """Тесты ленты изменений /api/changes/"""
+    
+    def setUp(self):
+        from .trending import trending_tracker
+        trending_tracker.persist()
+        for api_id in (1, 2, 3):
+            Character.objects.create(api_id=api_id, name=f"Rick {api_id}")
+        Episode.objects.create(api_id=1, name="Pilot", episode="S01E01")
+    
+    def feed(self, since=None, **params):
+        if since:
+            params['since'] = since
+        return self.client.get('/api/changes/', params).json()
+    
+    def test_resumable_cursor(self):
+        """Тест: курсор продолжает ленту без пропусков и повторов"""
+        first = self.feed(limit=3)
+        self.assertTrue(first['has_more'])
+        second = self.feed(first['next'], limit=3)
+        self.assertFalse(second['has_more'])
+        changes = [(c['resource'], c['api_id']) for c in first['changes'] + second['changes']]
+        self.assertEqual(sorted(changes), [('character', 1), ('character', 2), ('character', 3), ('episode', 1)])
+        
+        idle = self.feed(second['next'])
+        self.assertEqual(idle['changes'], [])
+        self.assertEqual(idle['next'], second['next'])
+    
+    def test_updates_and_deletions(self):
+        """Тест: после курсора видны только обновленные и удаленные записи"""
+        cursor = self.feed()['next']
+        rick = Character.objects.get(api_id=2)
+        rick.name = "Evil Rick"
+        rick.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Character.objects.filter(api_id=3).delete()
+        
+        changes = self.feed(cursor)['changes']
+        self.assertEqual(
+            [(c['resource'], c['api_id'], c['op']) for c in changes],
+            [('character', 2, 'upsert'), ('character', 3, 'delete')]
+        )
+        self.assertTrue(Tombstone.objects.filter(resource='character', api_id=3).exists())
+    
+    @override_settings(CHANGES_SETTLE_SECONDS=60)
+    def test_recent_changes_held_back(self):
+        """Тест: незакрепившиеся изменения и неверный курсор"""
+        self.assertEqual(self.feed()['changes'], [])
+        self.assertEqual(self.client.get('/api/changes/', {'since': 'bogus'}).status_code, 400)
+    
+    def test_sync_transaction_has_no_upstream_calls(self):
+        """Тест: запросы к API при синхронизации персонажа идут до транзакции записи"""
+        from django.db import connection
+        depth = len(connection.atomic_blocks)
+        depths = []
+        
+        def fetch(payload):
+            def fetch_one(api_id):
+                depths.append(len(connection.atomic_blocks))
+                return dict(payload, id=api_id)
+            return fetch_one
+        
+        character_data = {
+            'id': 7, 'name': 'Squanchy', 'status': 'Alive', 'species': 'Cat-Person', 'gender': 'Male',
+            'origin': {'name': 'Earth', 'url': 'https://rickandmortyapi.com/api/location/1'},
+            'location': {'name': 'Earth', 'url': 'https://rickandmortyapi.com/api/location/1'},
+            'episode': ['https://rickandmortyapi.com/api/episode/1', 'https://rickandmortyapi.com/api/episode/2'],
+        }
+        upstream = sync_service.api_service
+        with patch.object(upstream, 'get_location', side_effect=fetch({'name': 'Earth'})), \
+                patch.object(upstream, 'get_episode', side_effect=fetch({'name': 'Episode', 'episode': 'S01E02'})):
+            character = sync_service.sync_character(character_data)
+        self.assertEqual(depths, [depth] * 4)
+        self.assertEqual(character.episodes_count, 2)
+        self.assertEqual(character.origin.api_id, 1)
+
+
+class BatchAPITests(TestCase):
+    """Тесты пакетных запросов /api/batch/"""
+    
+    def setUp(self):
+        from .trending import trending_tracker
+        trending_tracker.persist()
+        Character.objects.create(api_id=1, name="Rick Sanchez", status="alive")
+        Episode.objects.create(api_id=1, name="Pilot", episode="S01E01")
+    
+    def tearDown(self):
+        search_history_buffer.flush()
+    
+    def batch(self, items):
+        return self.client.post('/api/batch/', {'requests': items}, content_type='application/json')
+    
+    def test_combined_response(self):
+        """Тест: ответы в порядке запросов с id и статусом каждого"""
+        response = self.batch([
+            {'id': 'rick', 'path': '/api/characters/1/', 'params': {'fields': 'name'}},
+            {'path': '/api/episodes/?episode=S01'},
+            {'path': '/api/characters/999/'},
+            {'path': '/health/'},
+            {'path': '/api/characters/', 'method': 'DELETE'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['responses']
+        self.assertEqual(results[0], {'id': 'rick', 'status': 200, 'body': {'name': 'Rick Sanchez'}})
+        self.assertEqual(results[1]['id'], 1)
+        self.assertEqual(results[1]['body']['results'][0]['episode'], 'S01E01')
+        self.assertEqual([result['status'] for result in results[2:]], [404, 400, 400])
+    
+    def test_invalid_params_fail_only_their_item(self):
+        """Тест: params не объектом - 400 только у этого подзапроса"""
+        response = self.batch([
+            {'path': '/api/trending/', 'params': 'q=1'},
+            {'path': '/api/trending/', 'params': ['q']},
+            {'path': '/api/trending/'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['responses']], [400, 400, 200])
+    
+    def test_search_runs_concurrently(self):
+        """Тест: поисковые подзапросы ждут внешний API параллельно"""
+        import time
+        
+        def slow_search(page=1, name=None, **kwargs):
+            time.sleep(0.2)
+            return {'info': {'count': 1}, 'results': [{'id': 1, 'name': name}]}
+        
+        with patch.object(api_service, 'get_characters', side_effect=slow_search):
+            started = time.perf_counter()
+            response = self.batch([{'path': '/api/search/', 'params': {'q': name}} for name in ('a', 'b', 'c', 'd')])
+            elapsed = time.perf_counter() - started
+        
+        results = response.json()['responses']
+        self.assertEqual([result['body']['results'][0]['name'] for result in results], ['a', 'b', 'c', 'd'])
+        self.assertLess(elapsed, 0.6)
+    
+    @override_settings(BATCH_MAX_ITEMS=2)
+    def test_item_cap(self):
+        """Тест ограничения числа подзапросов и формата тела"""
+        self.assertEqual(self.batch([{'path': '/api/trending/'}] * 3).status_code, 400)
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([{'path': '/api/trending/'}] * 2).status_code, 200)
+
+
+@override_settings(SEARCH_THROTTLE_CAPACITY=2, SEARCH_THROTTLE_REFILL_RATE=0.1,
+                   SEARCH_THROTTLE_HIT_COST=0.5, SEARCH_THROTTLE_MISS_COST=1)
+class SearchThrottleTests(TestCase):
+    """Тесты ограничения частоты поиска"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.api_data = {'info': {'count': 1}, 'results': [{'id': 1, 'name': 'Rick'}]}
+    
+    def tearDown(self):
+        search_history_buffer.flush()
+    
+    def search(self, query, **extra):
+        with patch.object(api_service, '_make_request', return_value=self.api_data):
+            return self.client.get('/api/search/', {'q': query}, **extra)
+    
+    def test_misses_exhaust_bucket(self):
+        """Тест: промахи кэша расходуют bucket, ответ 429 с Retry-After"""
+        from .throttling import throttle_stats
+        throttled_before = throttle_stats.throttled
+        self.assertEqual(self.search('a').status_code, 200)
+        self.assertEqual(self.search('b').status_code, 200)
+        response = self.search('c')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(throttle_stats.throttled, throttled_before + 1)
+    
+    def test_cache_hits_are_cheaper(self):
+        """Тест: повтор закэшированного запроса стоит меньше токенов"""
+        self.assertEqual(self.search('rick').status_code, 200)
+        self.assertEqual(self.search('rick').status_code, 200)
+        self.assertEqual(self.search('rick').status_code, 200)
+        self.assertEqual(self.search('rick').status_code, 429)
+    
+    @override_settings(SEARCH_API_KEYS={'script', 'partner'})
+    def test_buckets_per_client(self):
+        """Тест: у каждого известного API ключа и IP свой bucket"""
+        for _ in range(2):
+            self.search('x', HTTP_X_API_KEY='script')
+        self.assertEqual(self.search('y', HTTP_X_API_KEY='script').status_code, 429)
+        self.assertEqual(self.search('y', HTTP_X_API_KEY='partner').status_code, 200)
+        self.assertEqual(self.search('y', REMOTE_ADDR='10.0.0.2').status_code, 200)
+    
+    @override_settings(SEARCH_API_KEYS={'partner'})
+    def test_unknown_key_shares_ip_bucket(self):
+        """Тест: неизвестные ключи не дают своего bucket - расходуется bucket IP"""
+        self.assertEqual(self.search('a', HTTP_X_API_KEY='random-1').status_code, 200)
+        self.assertEqual(self.search('b', HTTP_X_API_KEY='random-2').status_code, 200)
+        self.assertEqual(self.search('c', HTTP_X_API_KEY='random-3').status_code, 429)
+        self.assertEqual(self.search('d').status_code, 429)
+    
+    def test_forwarded_for_does_not_reset_bucket(self):
+        """Тест: подделанный X-Forwarded-For не дает нового bucket (без прокси и за одним прокси)"""
+        from django.conf import settings
+        from django.core.cache import cache
+        
+        def spoofed_searches():
+            cache.clear()
+            # Клиент подставляет свой адрес, доверенный прокси дописывает реальный последним
+            return [
+                self.search(f'q{index}', HTTP_X_FORWARDED_FOR=f'10.0.0.{index}, 203.0.113.5').status_code
+                for index in range(5)
+            ]
+        
+        self.assertEqual(spoofed_searches(), [200, 200, 429, 429, 429])
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(spoofed_searches(), [200, 200, 429, 429, 429])
+    
+    @override_settings(SEARCH_THROTTLE_REFILL_RATE=0)
+    def test_zero_refill_rate(self):
+        """Тест: нулевое пополнение не ломает поиск делением на ноль"""
+        self.assertEqual(self.search('a').status_code, 200)
+        self.assertEqual(self.search('b').status_code, 200)
+        self.assertEqual(self.search('c').status_code, 429)
+    
+    async def test_async_search_throttled(self):
+        """Тест: асинхронный поиск под ASGI ограничивается тем же bucket"""
+        from .views import search_api_view_async
+        from .throttling import search_bucket
+        await sync_to_async(search_bucket.consume)('ip:127.0.0.1', 2)
+        response = await search_api_view_async(AsyncRequestFactory().get('/api/search/', {'q': 'Rick'}))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+
+
+class QueryPlanTests(TestCase):
+    """
+    Регрессионные тесты планов ключевых запросов: EXPLAIN на синтетических
+    таблицах не должен содержать полного сканирования таблицы или сортировки
+    во временном B-дереве (SQLite) / Seq Scan (PostgreSQL).
+    """
+    rows = 3000
+    
+    @classmethod
+    def setUpTestData(cls):
+        import random
+        rng = random.Random(7)
+        offset = 10_000_000
+        locations = Location.objects.bulk_create([
+            Location(api_id=offset + i, name=f"Planet {i}", type=rng.choice(['Planet', 'Space station', 'Dream']),
+                     dimension=f"D-{i % 40}")
+            for i in range(300)
+        ])
+        Episode.objects.bulk_create([
+            Episode(api_id=offset + i, name=f"Episode {i}", episode=f"S{i // 50:02d}E{i % 50:02d}",
+                    season=i // 50, number=i % 50, aired=date(2013, 12, 2) + timedelta(days=7 * i))
+            for i in range(300)
+        ])
+        Character.objects.bulk_create([
+            Character(
+                api_id=offset + i, name=f"Character {rng.randint(0, 10 ** 6)}",
+                status=rng.choice(['alive', 'dead', 'unknown']),
+                gender=rng.choice(['female', 'male', 'genderless', 'unknown']),
+                species=rng.choice(['Human', 'Alien', 'Robot', 'Animal']),
+                origin=rng.choice(locations), location=rng.choice(locations),
+            )
+            for i in range(cls.rows)
+        ])
+        SearchHistory.objects.bulk_create([
+            SearchHistory(query=f"q{i}", search_type=rng.choice(['character', 'episode', 'location']))
+            for i in range(cls.rows)
+        ])
+        Tombstone.objects.bulk_create([Tombstone(resource='character', api_id=i) for i in range(300)])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            full_scans = [line for line in plan.splitlines()
+                          if re.search(r'\bSCAN \w+$', line.strip()) or 'TEMP B-TREE' in line]
+        elif connection.vendor == 'postgresql':
+            full_scans = [line for line in plan.splitlines() if 'Seq Scan' in line]
+        else:
+            self.skipTest(f"EXPLAIN не разбирается для {connection.vendor}")
+        self.assertEqual(full_scans, [], f"{queryset.query}\n{plan}")
+    
+    def test_mirror_api_queries(self):
+        """Тест: списки API (keyset, фильтры) и лента изменений идут по индексам"""
+        from django.db.models import Q
+        from datetime import datetime, timezone as dt_timezone
+        page = slice(0, 21)
+        moment = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        queries = {
+            'characters': Character.objects.order_by('name', 'id')[page],
+            'characters next page': Character.objects.filter(
+                Q(name__gt='Character 5') | Q(name='Character 5', id__gt=10)).order_by('name', 'id')[page],
+            'status filter': Character.objects.filter(status='dead').order_by('name', 'id')[page],
+            'gender filter': Character.objects.filter(gender='female').order_by('name', 'id')[page],
+            'episodes': Episode.objects.order_by('season', 'number', 'id')[page],
+            'season filter': Episode.objects.filter(season=3).order_by('season', 'number', 'id')[page],
+            'air date range': Episode.objects.filter(
+                aired__gte=date(2015, 1, 1), aired__lte=date(2015, 6, 30)).order_by('aired', 'id'),
+            'locations': Location.objects.order_by('name', 'id')[page],
+            'changes': Character.objects.filter(updated__gt=moment).order_by('updated', 'pk')[page],
+            'tombstones': Tombstone.objects.filter(deleted__gt=moment).order_by('deleted', 'pk')[page],
+            'api_id': Character.objects.filter(api_id=10_000_005),
+        }
+        for name, queryset in queries.items():
+            with self.subTest(query=name):
+                self.assertIndexed(queryset)
+    
+    def test_admin_and_history_queries(self):
+        """Тест: фильтры админки и выборки истории поиска идут по индексам"""
+        cutoff = timezone.now() - timedelta(days=30)
+        queries = {
+            'species filter': Character.objects.filter(species='Robot').order_by('name'),
+            'location type': Location.objects.filter(type='Dream').order_by('name'),
+            'location dimension': Location.objects.filter(dimension='D-3'),
+            'recent searches': SearchHistory.objects.order_by('-created')[:10],
+            'searches by type': SearchHistory.objects.filter(search_type='episode').order_by('-created')[:50],
+            'prune': SearchHistory.objects.filter(created__lt=cutoff),
+        }
+        for name, queryset in queries.items():
+            with self.subTest(query=name):
+                self.assertIndexed(queryset)
+
+
+class RelationCounterTests(TestCase):
+    """Тесты хранимых счетчиков связей"""
+    
+    def setUp(self):
+        from .trending import trending_tracker
+        trending_tracker.persist()
+        self.earth = Location.objects.create(api_id=1, name="Earth")
+        self.citadel = Location.objects.create(api_id=3, name="Citadel")
+        self.episodes = [
+            Episode.objects.create(api_id=i, name=f"Episode {i}", episode=f"S01E0{i}") for i in (1, 2, 3)
+        ]
+        self.rick = Character.objects.create(api_id=1, name="Rick", origin=self.earth, location=self.earth)
+    
+    def counts(self):
+        self.rick.refresh_from_db()
+        for obj in (self.earth, self.citadel, *self.episodes):
+            obj.refresh_from_db()
+        return (
+            self.rick.episodes_count,
+            [episode.characters_count for episode in self.episodes],
+            (self.earth.origin_characters_count, self.earth.current_characters_count),
+            (self.citadel.origin_characters_count, self.citadel.current_characters_count),
+        )
+    
+    def test_episode_links(self):
+        """Тест: add/remove/clear с обеих сторон связи обновляют счетчики"""
+        self.rick.episodes.add(*self.episodes)
+        self.assertEqual(self.counts()[:2], (3, [1, 1, 1]))
+        self.episodes[0].characters.remove(self.rick)
+        self.assertEqual(self.counts()[:2], (2, [0, 1, 1]))
+        self.rick.episodes.clear()
+        self.assertEqual(self.counts()[:2], (0, [0, 0, 0]))
+    
+    def test_location_change_and_delete(self):
+        """Тест: смена локации и удаление персонажа обновляют счетчики"""
+        self.assertEqual(self.counts()[2:], ((1, 1), (0, 0)))
+        self.rick.episodes.add(self.episodes[1])
+        self.rick.location = self.citadel
+        self.rick.save()
+        self.assertEqual(self.counts()[2:], ((1, 0), (0, 1)))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rick.delete()
+        for obj in (self.earth, self.citadel, self.episodes[1]):
+            obj.refresh_from_db()
+        self.assertEqual((self.earth.origin_characters_count, self.citadel.current_characters_count), (0, 0))
+        self.assertEqual(self.episodes[1].characters_count, 0)
+    
+    def test_save_keeps_counters(self):
+        """Тест: save() устаревшего экземпляра не перезаписывает счетчики"""
+        stale = Episode.objects.get(pk=self.episodes[0].pk)
+        self.rick.episodes.add(self.episodes[0])
+        stale.name = "Pilot"
+        stale.save()
+        self.assertEqual(self.counts()[1][0], 1)
+    
+    def test_recount_command_fixes_drift(self):
+        """Тест: команда recount исправляет разошедшиеся счетчики"""
+        self.rick.episodes.add(*self.episodes[:2])
+        Character.objects.update(episodes_count=7)
+        Location.objects.filter(pk=self.earth.pk).update(current_characters_count=0)
+        
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('исправлено строк: 2', out.getvalue())
+        self.assertEqual(self.counts(), (2, [1, 1, 0], (1, 1), (0, 0)))
+
+
+class EpisodeColumnsTests(TestCase):
+    """Тесты разобранных колонок эпизода (сезон, номер, дата выхода)"""
+    
+    def setUp(self):
+        from .trending import trending_tracker
+        trending_tracker.persist()
+        for api_id, code, air_date in (
+            (1, "S01E01", "December 2, 2013"),
+            (2, "S01E10", "April 7, 2014"),
+            (3, "S01E02", "December 9, 2013"),
+            (4, "S02E01", "July 26, 2015"),
+            (5, "Special", "someday"),
+        ):
+            Episode.objects.create(api_id=api_id, name=f"Episode {api_id}", episode=code, air_date=air_date)
+    
+    def test_parsed_on_save(self):
+        """Тест: сезон, номер и дата разбираются при сохранении и синхронизации"""
+        episode = Episode.objects.get(api_id=2)
+        self.assertEqual((episode.season, episode.number, episode.aired), (1, 10, date(2014, 4, 7)))
+        unknown = Episode.objects.get(api_id=5)
+        self.assertEqual((unknown.season, unknown.number, unknown.aired), (0, 0, None))
+        
+        synced = sync_service.sync_episode({'id': 5, 'name': 'Pilot 2', 'episode': 'S03E07',
+                                            'air_date': 'September 27, 2017'})
+        self.assertEqual((synced.season, synced.number, synced.aired), (3, 7, date(2017, 9, 27)))
+    
+    def test_api_filters_and_order(self):
+        """Тест: хронологический порядок, фильтр по сезону и диапазону дат в API"""
+        codes = [row['episode'] for row in self.client.get('/api/episodes/').json()['results']]
+        self.assertEqual(codes, ['Special', 'S01E01', 'S01E02', 'S01E10', 'S02E01'])
+        
+        season = self.client.get('/api/episodes/', {'season': 1, 'fields': 'episode,aired'}).json()['results']
+        self.assertEqual(season[0], {'episode': 'S01E01', 'aired': '2013-12-02'})
+        self.assertEqual(len(season), 3)
+        
+        aired = self.client.get('/api/episodes/', {'aired_after': '2013-12-05', 'aired_before': '2014-12-31'})
+        self.assertEqual([row['api_id'] for row in aired.json()['results']], [3, 2])
+        self.assertEqual(self.client.get('/api/episodes/', {'aired_after': 'soon'}).status_code, 400)
+
+
+class SnapshotTests(TransactionTestCase):
+    """Тесты снимков зеркала и маршрутизации чтения (VACUUM INTO нельзя выполнить внутри транзакции)"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        Character.objects.create(api_id=1, name="Rick")
+    
+    def test_publish_switches_current_snapshot(self):
+        """Тест: снимок публикуется атомарной заменой ссылки и открывается только на чтение"""
+        import os
+        import sqlite3
+        from .snapshots import snapshot_store, snapshot_uri
+        with override_settings(SNAPSHOT_DIR=self.directory, SNAPSHOT_KEEP=2):
+            first = snapshot_store.publish()
+            self.assertEqual(snapshot_store.current_path(), os.path.realpath(first))
+            
+            Character.objects.create(api_id=2, name="Morty")
+            second = snapshot_store.publish()
+            third = snapshot_store.publish()
+            self.assertEqual(snapshot_store.current_path(), os.path.realpath(third))
+            self.assertEqual(snapshot_store.snapshots(), [second, third])
+        
+        snapshot = sqlite3.connect(snapshot_uri(third), uri=True)
+        self.addCleanup(snapshot.close)
+        self.assertEqual(snapshot.execute('SELECT COUNT(*) FROM main_character').fetchone(), (2,))
+        with self.assertRaises(sqlite3.OperationalError):
+            snapshot.execute('DELETE FROM main_character')
+    
+    def test_router(self):
+        """Тест: чтение зеркала - из снимка, запись и остальные модели - в рабочую базу"""
+        from unittest.mock import PropertyMock
+        from .routers import SnapshotRouter
+        from .snapshots import SnapshotStore
+        router = SnapshotRouter()
+        with patch.object(SnapshotStore, 'available', new_callable=PropertyMock, return_value=True):
+            self.assertEqual(router.db_for_read(Character), 'snapshot')
+            self.assertEqual(router.db_for_read(Character.episodes.through), 'snapshot')
+            self.assertEqual(router.db_for_read(SearchHistory), 'default')
+            self.assertEqual(router.db_for_write(Character), 'default')
+        with patch.object(SnapshotStore, 'available', new_callable=PropertyMock, return_value=False):
+            self.assertEqual(router.db_for_read(Character), 'default')
+        self.assertFalse(router.allow_migrate('snapshot', 'main'))
+        self.assertTrue(router.allow_migrate('default', 'main'))
+    
+    def test_sync_data_purges_pages_after_publish(self):
+        """Тест: страницы, закэшированные до публикации снимка, сбрасываются после нее"""
+        from unittest.mock import PropertyMock
+        from django.core.cache import cache
+        from django.core.management import call_command
+        from .page_cache import page_cache
+        from .snapshots import SnapshotStore, snapshot_store
+        cache.clear()
+        api_data = {
+            'info': {'count': 1, 'next': None},
+            'results': [{'id': 1, 'name': 'Rick Sanchez', 'status': 'Alive', 'species': 'Human', 'episode': []}],
+        }
+        tags = ('list:characters', 'character:1')
+        seen_at_publish = {}
+        
+        def publish():
+            # Рендер во время VACUUM INTO читает старый снимок и сохраняет текущие версии тегов
+            seen_at_publish.update(page_cache.tag_versions(tags))
+            return 'mirror.sqlite3'
+        
+        with patch.object(SnapshotStore, 'enabled', new_callable=PropertyMock, return_value=True), \
+                patch.object(snapshot_store, 'publish', side_effect=publish), \
+                patch('main.management.commands.sync_data.api_service.get_characters', return_value=api_data):
+            call_command('sync_data', '--characters', '--limit', '1', stdout=StringIO())
+        
+        after = page_cache.tag_versions(tags)
+        for tag in tags:
+            self.assertGreater(after[tag], seen_at_publish[tag])
+    
+    def test_request_sync_visible_before_next_publish(self):
+        """Тест: строка, синхронизированная запросом после публикации, берется из рабочей базы без API"""
+        from unittest.mock import PropertyMock
+        from django.core.cache import cache
+        from django.db import connections, router
+        from .routers import SnapshotRouter
+        from .snapshots import SNAPSHOT_DB, SnapshotStore, snapshot_store, snapshot_uri
+        api_data = {
+            'id': 2, 'name': 'Morty Smith', 'status': 'Alive', 'species': 'Human', 'type': '',
+            'gender': 'Male', 'image': '', 'url': '', 'created': '2017-11-04T18:50:21.651Z',
+            'origin': {'name': 'unknown', 'url': ''}, 'location': {'name': 'unknown', 'url': ''},
+            'episode': [],
+        }
+        
+        def remove_alias():
+            connections[SNAPSHOT_DB].close()
+            del connections.settings[SNAPSHOT_DB]
+            delattr(connections._connections, SNAPSHOT_DB)
+        
+        with override_settings(SNAPSHOT_DIR=self.directory), \
+                patch.object(SnapshotStore, 'enabled', new_callable=PropertyMock, return_value=True), \
+                patch.object(type(self), 'databases', {'default', SNAPSHOT_DB}), \
+                patch.object(router, 'routers', [SnapshotRouter()]):
+            snapshot_store.publish()
+            # В тестовых настройках базы снимка нет: подключаем опубликованный файл
+            connections.settings[SNAPSHOT_DB] = {
+                **connections.settings['default'], 'NAME': snapshot_uri(snapshot_store.link_path),
+            }
+            self.addCleanup(remove_alias)
+            self.assertTrue(snapshot_store.available)
+            
+            with patch('main.services.api_service.get_character', return_value=api_data) as mock_api:
+                for _ in range(2):
+                    cache.clear()
+                    response = self.client.get(reverse('main:character-detail', args=[2]))
+                    self.assertContains(response, 'Morty Smith')
+            mock_api.assert_called_once_with(2)
+            # В снимке строки нет до следующей публикации
+            self.assertFalse(Character.objects.using(SNAPSHOT_DB).filter(api_id=2).exists())
+
+
+class ColumnarIndexTests(TestCase):
+    """Тесты колоночного снимка персонажей"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from .columnar import character_columns
+        cache.clear()
+        earth = Location.objects.create(api_id=1, name="Earth")
+        citadel = Location.objects.create(api_id=3, name="Citadel")
+        pilot = Episode.objects.create(api_id=1, name="Pilot", episode="S01E01")
+        rows = [
+            ("Rick Sanchez", "alive", "Human", "male", earth, citadel),
+            ("Morty Smith", "alive", "Human", "male", earth, earth),
+            ("Summer Smith", "alive", "Human", "female", earth, earth),
+            ("Birdperson", "dead", "Bird-Person", "male", None, citadel),
+            ("Evil Rick", "dead", "Humanoid", "male", citadel, None),
+        ]
+        for api_id, (name, status, species, gender, origin, location) in enumerate(rows, start=1):
+            character = Character.objects.create(api_id=api_id, name=name, status=status, species=species,
+                                                 gender=gender, origin=origin, location=location)
+            if api_id <= 2:
+                character.episodes.add(pilot)
+        self.index = character_columns
+        self.index.invalidate()
+    
+    def test_filters_match_orm(self):
+        """Тест: маски дают тех же персонажей, что и фильтры ORM, в порядке api_id"""
+        cases = [
+            ({'status': 'alive', 'gender': 'male'}, {'status': 'alive', 'gender': 'male'}),
+            ({'species': 'hum'}, {'species__icontains': 'hum'}),
+            ({'name': 'smith', 'gender': 'female'}, {'name__icontains': 'smith', 'gender': 'female'}),
+            ({'origin': 1, 'location': 3}, {'origin__api_id': 1, 'location__api_id': 3}),
+            ({'episode': 1, 'name': 'rick'}, {'episodes__api_id': 1, 'name__icontains': 'rick'}),
+            ({'status': 'unknown'}, {'status': 'unknown'}),
+        ]
+        for filters, lookups in cases:
+            with self.subTest(filters=filters):
+                count, cards = self.index.page(1, 20, **filters)
+                expected = list(Character.objects.filter(**lookups).order_by('api_id').values_list('api_id', flat=True))
+                self.assertEqual([card['id'] for card in cards], expected)
+                self.assertEqual(count, len(expected))
+        
+        count, cards = self.index.page(2, 2, species='hum')
+        self.assertEqual((count, [card['id'] for card in cards]), (4, [3, 5]))
+        self.assertEqual(cards[1]['origin'], {'name': 'Citadel'})
+    
+    def test_rebuilds_after_sync(self):
+        """Тест: снимок перестраивается, когда меняются данные зеркала"""
+        self.assertEqual(self.index.page(1, status='unknown')[0], 0)
+        Character.objects.create(api_id=6, name="Mr. Poopybutthole", status="unknown")
+        with patch.object(self.index, 'refresh_interval', 0):
+            self.assertEqual(self.index.page(1, status='unknown')[0], 1)
+    
+    @override_settings(MIRROR_CHARACTER_LISTS=True)
+    def test_characters_page_from_mirror(self):
+        """Тест: страница списка фильтруется в памяти без запроса к API"""
+        MirrorCoverage.record('character', 5)
+        with patch('main.services.api_service.get_characters') as mock_api:
+            response = self.client.get(reverse('main:characters'), {'status': 'dead'})
+        mock_api.assert_not_called()
+        self.assertContains(response, "Birdperson")
+        self.assertContains(response, "Evil Rick")
+        self.assertNotContains(response, "Morty Smith")
+    
+    @override_settings(MIRROR_CHARACTER_LISTS=True)
+    def test_partial_mirror_uses_api(self):
+        """Тест: пока в зеркале меньше записей, чем во внешнем API, список берется из API"""
+        from django.core.cache import cache
+        api_data = {'info': {'count': 826, 'pages': 42}, 'results': []}
+        for expected in (None, 826):
+            if expected:
+                MirrorCoverage.record('character', expected)
+            self.index.invalidate()
+            with self.subTest(expected=expected), \
+                    patch('main.services.api_service.get_characters', return_value=api_data) as mock_api:
+                cache.clear()
+                self.client.get(reverse('main:characters'), {'status': 'dead'})
+                mock_api.assert_called_once()
+        self.assertFalse(self.index.current().complete)
+
+
+class FacetTests(TestCase):
+    """Тесты фасетов фильтров списков"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from .columnar import character_columns, location_columns
+        cache.clear()
+        earth = Location.objects.create(api_id=1, name="Earth (C-137)", type="Planet", dimension="Dimension C-137")
+        Location.objects.create(api_id=2, name="Citadel of Ricks", type="Space station", dimension="unknown")
+        Location.objects.create(api_id=3, name="Earth (Replacement Dimension)", type="Planet",
+                                dimension="Replacement Dimension")
+        rows = [
+            ("Rick Sanchez", "alive", "Human", "male"),
+            ("Morty Smith", "alive", "Human", "male"),
+            ("Summer Smith", "alive", "Human", "female"),
+            ("Birdperson", "dead", "Bird-Person", "male"),
+            ("Evil Rick", "dead", "Human", "male"),
+            ("Tammy", "dead", "Human", "female"),
+        ]
+        for api_id, (name, status, species, gender) in enumerate(rows, start=1):
+            Character.objects.create(api_id=api_id, name=name, status=status, species=species,
+                                     gender=gender, origin=earth)
+        for index in (character_columns, location_columns):
+            index.invalidate()
+    
+    def test_counts_match_orm(self):
+        """Тест: фасет считается при остальных фильтрах и совпадает с GROUP BY"""
+        from django.db.models import Count
+        from .facets import facet_service
+        result = facet_service.facets('characters', status='dead', species='human')
+        self.assertEqual(result['count'], 2)
+        
+        expected = dict(
+            Character.objects.filter(status='dead').values_list('species').annotate(count=Count('id'))
+        )
+        species = {item['value']: item['count'] for item in result['facets']['species']}
+        self.assertEqual(species, expected)
+        # Собственный фильтр фасета не сужает его значения
+        statuses = [(item['value'], item['count']) for item in result['facets']['status']]
+        self.assertEqual(statuses, [('alive', 3), ('dead', 2)])
+        self.assertEqual(result['facets']['gender'], [
+            {'value': 'female', 'count': 1}, {'value': 'male', 'count': 1},
+        ])
+    
+    def test_api_endpoint(self):
+        """Тест: /api/facets/ для локаций и ошибки параметров"""
+        response = self.client.get(reverse('main:api-facets'), {'resource': 'locations', 'dimension': 'dimension'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertFalse(data['complete'])
+        self.assertEqual(data['facets']['type'], [{'value': 'Planet', 'count': 2}])
+        self.assertEqual(len(data['facets']['dimension']), 3)
+        
+        self.assertEqual(self.client.get(reverse('main:api-facets'), {'resource': 'episodes'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('main:api-facets'), {'status': 'zombie'}).status_code, 400)
+    
+    @override_settings(LIST_FACETS=True)
+    def test_list_page_shows_counts(self):
+        """Тест: форма фильтров показывает счетчики только у полностью синхронизированного зеркала"""
+        from django.core.cache import cache
+        from .columnar import character_columns
+        with patch('main.services.api_service.get_characters', return_value=None):
+            response = self.client.get(reverse('main:characters'), {'gender': 'female'})
+            self.assertNotContains(response, 'Мертвый (1)')
+            self.assertNotContains(response, 'id="species-options"')
+            
+            MirrorCoverage.record('character', 6)
+            character_columns.invalidate()
+            cache.clear()
+            response = self.client.get(reverse('main:characters'), {'gender': 'female'})
+        self.assertContains(response, 'Мертвый (1)')
+        self.assertContains(response, 'id="species-options"')
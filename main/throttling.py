@@ -0,0 +1,136 @@
+"""
+Ограничение частоты поиска, чтобы один клиент не расходовал общую квоту
+внешнего API.
+
+Каждому клиенту (известный API ключ из X-Api-Key, иначе IP) соответствует token bucket
+в общем кэше: емкость SEARCH_THROTTLE_CAPACITY, пополнение
+SEARCH_THROTTLE_REFILL_RATE токенов в секунду. Запрос, ответ на который уже
+лежит в кэше API, стоит SEARCH_THROTTLE_HIT_COST токенов, запрос во внешний
+API - SEARCH_THROTTLE_MISS_COST. Отклоненный запрос получает 429 с
+заголовком Retry-After.
+"""
+import time
+import hashlib
+import logging
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from .services import RickAndMortyAPIService
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'throttle'
+# Нижняя граница пополнения: при 0 bucket не наполнился бы никогда (и деление на ноль)
+MIN_REFILL_RATE = 0.001
+
+# Тип поиска -> ключ кэша ответа внешнего API (как в SearchAPIView)
+SEARCH_CACHE_KEYS = {
+    'character': RickAndMortyAPIService.characters_cache_key,
+    'episode': RickAndMortyAPIService.episodes_cache_key,
+    'location': RickAndMortyAPIService.locations_cache_key,
+}
+
+
+class TokenBucket:
+    """Token bucket в общем кэше (без блокировок: при гонке возможен лишний запрос)"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def capacity(self) -> float:
+        return getattr(settings, 'SEARCH_THROTTLE_CAPACITY', 30)
+
+    @property
+    def refill_rate(self) -> float:
+        return max(getattr(settings, 'SEARCH_THROTTLE_REFILL_RATE', 0.5), MIN_REFILL_RATE)
+
+    def consume(self, ident: str, cost: float) -> Tuple[bool, float]:
+        """(разрешен ли запрос, сколько секунд ждать при отказе)"""
+        key = f"{KEY_PREFIX}:{self.name}:{ident}"
+        now = time.time()
+        tokens, stamp = cache.get(key) or (self.capacity, now)
+        tokens = min(self.capacity, tokens + (now - stamp) * self.refill_rate)
+
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        # Пустой bucket наполняется за capacity / refill_rate секунд - дольше хранить незачем
+        cache.set(key, (tokens, now), int(self.capacity / self.refill_rate) + 60)
+        return allowed, 0.0 if allowed else (cost - tokens) / self.refill_rate
+
+
+class ThrottleStats:
+    """Счетчики решений ограничителя (в пределах процесса)"""
+
+    def __init__(self):
+        self.allowed = 0
+        self.throttled = 0
+        self.cache_hits = 0
+
+    def record(self, allowed: bool, cache_hit: bool) -> None:
+        if allowed:
+            self.allowed += 1
+        else:
+            self.throttled += 1
+        if cache_hit:
+            self.cache_hits += 1
+
+    def stats(self) -> Dict:
+        total = self.allowed + self.throttled
+        return {
+            'allowed': self.allowed,
+            'throttled': self.throttled,
+            'cache_hits': self.cache_hits,
+            'throttled_rate': round(self.throttled / total, 3) if total else None,
+        }
+
+
+search_bucket = TokenBucket('search')
+throttle_stats = ThrottleStats()
+
+
+class SearchRateThrottle(BaseThrottle):
+    """Token bucket на клиента: попадания в кэш API дешевле запросов во внешний API"""
+    api_key_header = 'HTTP_X_API_KEY'
+
+    def get_ident(self, request) -> str:
+        # Свой bucket только у ключей из SEARCH_API_KEYS: случайный ключ на каждый
+        # запрос не должен давать новый полный bucket
+        api_key = request.META.get(self.api_key_header)
+        if api_key and api_key in getattr(settings, 'SEARCH_API_KEYS', ()):
+            return f"key:{hashlib.sha256(api_key.encode()).hexdigest()[:32]}"
+        # IP из REMOTE_ADDR или от доверенного прокси (REST_FRAMEWORK NUM_PROXIES):
+        # подделанный X-Forwarded-For не дает нового bucket
+        return f"ip:{super().get_ident(request)}"
+
+    def is_cache_hit(self, request) -> bool:
+        params = getattr(request, 'query_params', request.GET)
+        key_func = SEARCH_CACHE_KEYS.get(params.get('type', 'character'))
+        query = params.get('q')
+        if key_func is None or not query:
+            return False
+        try:
+            page = int(params.get('page', 1))
+        except ValueError:
+            return False
+        return cache.has_key(key_func(page=page, name=query))
+
+    def allow_request(self, request, view) -> bool:
+        if search_bucket.capacity <= 0:
+            return True
+        cache_hit = self.is_cache_hit(request)
+        cost = getattr(settings, 'SEARCH_THROTTLE_HIT_COST' if cache_hit else 'SEARCH_THROTTLE_MISS_COST',
+                       0.2 if cache_hit else 1)
+        ident = self.get_ident(request)
+        allowed, self.wait_seconds = search_bucket.consume(ident, cost)
+        throttle_stats.record(allowed, cache_hit)
+        if not allowed:
+            logger.warning(f"Search throttled for {ident}, retry in {self.wait_seconds:.1f}s")
+        return allowed
+
+    def wait(self) -> float:
+        return self.wait_seconds
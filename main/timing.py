@@ -0,0 +1,73 @@
+"""
+Замеры времени в рамках одного запроса.
+
+RequestTimingMiddleware создает для каждого запроса RequestTimings и кладет
+его в contextvar, поэтому любой код (шаблонные теги, сервисы) может добавить
+свою метрику без передачи request по цепочке вызовов. Итог отдается
+клиенту в заголовке Server-Timing и виден во вкладке Network браузера.
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+_current: ContextVar[Optional['RequestTimings']] = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Накопленные длительности и счетчики одного запроса"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] += seconds
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing"""
+        metrics = [f"total;dur={self.total * 1000:.1f}"]
+        for name, seconds in self.durations.items():
+            metrics.append(f"{name};dur={seconds * 1000:.1f}")
+
+        hits = self.counters.get('fragment_hits', 0)
+        misses = self.counters.get('fragment_misses', 0)
+        if hits or misses:
+            ratio = hits / (hits + misses)
+            metrics.append(f'fragments;desc="hits={hits} misses={misses} ratio={ratio:.2f}"')
+        return ', '.join(metrics)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Замеры текущего запроса или None вне запроса (команды, тесты)"""
+    return _current.get()
+
+
+def start_request_timings() -> tuple:
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request_timings(token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name: str):
+    """Добавляет длительность блока к метрике текущего запроса"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, time.perf_counter() - started)
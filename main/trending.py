@@ -0,0 +1,177 @@
+"""
+Популярные поисковые запросы на основе алгоритма Space-Saving.
+
+Каждый воркер считает запросы в небольшом локальном скетче фиксированного
+размера и периодически вливает его в общий скетч в БД (TrendingSketch).
+Перед слиянием общий скетч затухает экспоненциально, поэтому в топе
+остаются запросы, популярные в последнее время. Чтение топа не обращается
+к SearchHistory и стоит один запрос к БД раз в TRENDING_PERSIST_INTERVAL.
+"""
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TrendingSketch
+
+logger = logging.getLogger(__name__)
+
+SKETCH_NAME = 'searches'
+
+
+class SpaceSaving:
+    """Скетч Space-Saving: top-K с ограниченной памятью"""
+
+    def __init__(self, capacity: int, counters: Optional[Dict[str, list]] = None):
+        self.capacity = capacity
+        # ключ -> [счетчик, оценка ошибки, отображаемый запрос, тип поиска]
+        self.counters: Dict[str, list] = counters or {}
+
+    def add(self, key: str, query: str, search_type: str, weight: float = 1.0) -> None:
+        entry = self.counters.get(key)
+        if entry is not None:
+            entry[0] += weight
+            entry[2] = query
+            return
+
+        if len(self.counters) < self.capacity:
+            self.counters[key] = [weight, 0.0, query, search_type]
+            return
+
+        # Вытесняем минимальный счетчик, новый ключ наследует его значение как ошибку
+        victim = min(self.counters, key=lambda k: self.counters[k][0])
+        floor = self.counters.pop(victim)[0]
+        self.counters[key] = [floor + weight, floor, query, search_type]
+
+    def floor(self) -> float:
+        """Верхняя граница счетчика ключа, которого нет в скетче (0, пока скетч не заполнен)"""
+        if len(self.counters) < self.capacity:
+            return 0.0
+        return min(entry[0] for entry in self.counters.values())
+
+    def merge(self, other: 'SpaceSaving') -> None:
+        """
+        Слияние скетчей: ключ, которого нет в одном из них, мог быть вытеснен
+        оттуда со счетчиком до минимального - минимум добавляется к счетчику и ошибке
+        """
+        own_floor, other_floor = self.floor(), other.floor()
+        if other_floor:
+            for key, entry in self.counters.items():
+                if key not in other.counters:
+                    entry[0] += other_floor
+                    entry[1] += other_floor
+        for key, (count, error, query, search_type) in other.counters.items():
+            entry = self.counters.get(key)
+            if entry is None:
+                self.counters[key] = [count + own_floor, error + own_floor, query, search_type]
+            else:
+                entry[0] += count
+                entry[1] += error
+                entry[2] = query
+        self.truncate()
+
+    def decay(self, factor: float) -> None:
+        for entry in self.counters.values():
+            entry[0] *= factor
+            entry[1] *= factor
+
+    def truncate(self) -> None:
+        if len(self.counters) > self.capacity:
+            self.counters = dict(self.top(self.capacity))
+
+    def top(self, limit: int) -> List[tuple]:
+        return sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+
+
+class TrendingTracker:
+    """Потоковый трекер популярных запросов, общий для воркеров через БД"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = SpaceSaving(self.capacity)
+        self._shared = SpaceSaving(self.capacity)
+        self._synced_at = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return getattr(settings, 'TRENDING_CAPACITY', 200)
+
+    @property
+    def persist_interval(self) -> int:
+        return getattr(settings, 'TRENDING_PERSIST_INTERVAL', 60)
+
+    @property
+    def half_life(self) -> float:
+        return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24) * 3600
+
+    def record(self, query: str, search_type: str) -> None:
+        """Учитывает успешный поисковый запрос"""
+        query = ' '.join(query.split())
+        if not query:
+            return
+        key = f"{search_type}:{query.lower()}"
+        with self._lock:
+            self._local.add(key, query, search_type)
+
+    def persist_if_due(self) -> None:
+        if time.monotonic() - self._synced_at >= self.persist_interval:
+            self.persist()
+
+    def persist(self) -> None:
+        """Вливает локальные счетчики в общий скетч и обновляет его копию в памяти"""
+        with self._lock:
+            local, self._local = self._local, SpaceSaving(self.capacity)
+            self._synced_at = time.monotonic()
+
+        try:
+            with transaction.atomic():
+                sketch, _ = TrendingSketch.objects.select_for_update().get_or_create(name=SKETCH_NAME)
+                shared = SpaceSaving(self.capacity, sketch.counters)
+
+                now = timezone.now()
+                elapsed = (now - sketch.updated).total_seconds()
+                if elapsed > 0 and self.half_life:
+                    shared.decay(0.5 ** (elapsed / self.half_life))
+
+                if local.counters:
+                    shared.merge(local)
+                    sketch.counters = shared.counters
+                    sketch.updated = now
+                    sketch.save(update_fields=['counters', 'updated'])
+        except Exception as e:
+            logger.warning(f"Failed to persist trending searches: {e}")
+            with self._lock:
+                # Не теряем счетчики: вернем их в локальный скетч до следующей попытки
+                self._local.merge(local)
+            return
+
+        with self._lock:
+            self._shared = shared
+
+    def top(self, limit: int = 10, search_type: Optional[str] = None) -> List[Dict]:
+        """Топ запросов: общий скетч плюс еще не сохраненные локальные счетчики"""
+        self.persist_if_due()
+        with self._lock:
+            combined = SpaceSaving(self.capacity, {key: list(entry) for key, entry in self._shared.counters.items()})
+            combined.merge(self._local)
+
+        results = []
+        for _, (count, error, query, entry_type) in combined.top(self.capacity):
+            if search_type and entry_type != search_type:
+                continue
+            results.append({
+                'query': query,
+                'search_type': entry_type,
+                'score': round(count, 2),
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+
+# Глобальный экземпляр трекера
+trending_tracker = TrendingTracker()
@@ -1,9 +1,19 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 
-# API роутер
+# API роутер (read-only API над локальным зеркалом)
 router = DefaultRouter()
+router.register('characters', views.CharacterViewSet, basename='api-character')
+router.register('episodes', views.EpisodeViewSet, basename='api-episode')
+router.register('locations', views.LocationViewSet, basename='api-location')
+
+
+def upstream_view(name):
+    """View, обращающийся к внешнему API: асинхронная версия при ASYNC_VIEWS"""
+    return getattr(views, f'{name}_async' if settings.ASYNC_VIEWS else name)
+
 
 app_name = 'main'
 
@@ -15,21 +25,28 @@ urlpatterns = [
     path('', views.home_view, name='home'),
     
     # Страницы персонажей
-    path('characters/', views.characters_view, name='characters'),
-    path('characters/<int:character_id>/', views.character_detail_view, name='character-detail'),
+    path('characters/', upstream_view('characters_view'), name='characters'),
+    path('characters/<int:character_id>/', upstream_view('character_detail_view'), name='character-detail'),
     
     # Страницы эпизодов
-    path('episodes/', views.episodes_view, name='episodes'),
-    path('episodes/<int:episode_id>/', views.episode_detail_view, name='episode-detail'),
+    path('episodes/', upstream_view('episodes_view'), name='episodes'),
+    path('episodes/<int:episode_id>/', upstream_view('episode_detail_view'), name='episode-detail'),
     
     # Страницы локаций
-    path('locations/', views.locations_view, name='locations'),
-    path('locations/<int:location_id>/', views.location_detail_view, name='location-detail'),
+    path('locations/', upstream_view('locations_view'), name='locations'),
+    path('locations/<int:location_id>/', upstream_view('location_detail_view'), name='location-detail'),
     
     # Поиск
-    path('search/', views.search_view, name='search'),
+    path('search/', upstream_view('search_view'), name='search'),
     
     # API endpoints
     path('api/', include(router.urls)),
-    path('api/search/', views.SearchAPIView.as_view(), name='api-search'),
+    path('api/search/', views.search_api_view_async if settings.ASYNC_VIEWS else views.SearchAPIView.as_view(),
+         name='api-search'),
+    path('api/suggest/', views.suggest_view, name='api-suggest'),
+    path('api/trending/', views.TrendingAPIView.as_view(), name='api-trending'),
+    path('api/batch/', views.BatchAPIView.as_view(), name='api-batch'),
+    path('api/changes/', views.ChangesAPIView.as_view(), name='api-changes'),
+    path('api/facets/', views.FacetsAPIView.as_view(), name='api-facets'),
+    path('api/export/<str:resource>.<str:fmt>', views.export_view, name='api-export'),
 ]
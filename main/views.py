@@ -1,6 +1,13 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
-from django.http import Http404, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET
 from django.db import connection
+from django.db.models import Prefetch
 from django.conf import settings
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -8,7 +15,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 
-from .models import Character, Episode, Location, SearchHistory
+from .models import Character, Episode, Location
 from .serializers import (
     CharacterListSerializer, CharacterDetailSerializer,
     EpisodeSerializer, EpisodeDetailSerializer,
@@ -17,8 +24,25 @@ from .serializers import (
     CharacterFilterSerializer, EpisodeFilterSerializer,
     LocationFilterSerializer
 )
-from .services import api_service, sync_service
+from .services import api_service, async_api_service, sync_service
+from .trending import trending_tracker
+from .page_cache import cache_page_with_tags, tag_response
+from .fragment_cache import fragment_cache
+from .fulltext import fulltext_index
+from .fuzzy import fuzzy_index
+from .columnar import character_columns
+from .facets import FACET_SOURCES, facet_service
+from .autocomplete import autocomplete_index
+from .hydration import cast_page, hydrate_characters, ahydrate_characters
+from .fast_serialization import fast_row_serializer
+from .batch import batch_executor
+from .throttling import SearchRateThrottle, throttle_stats
+from .snapshots import snapshot_store
+from .changes import change_feed, decode_cursor, encode_cursor
+from .export import EXPORTS, FORMATS as EXPORT_FORMATS, MirrorExport, aiterate, parse_updated_since
+import math
 import logging
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +56,7 @@ def home_view(request):
         characters_count = Character.objects.count()
         episodes_count = Episode.objects.count()
         locations_count = Location.objects.count()
-        recent_searches = SearchHistory.objects.order_by('-created')[:5]
+        trending_searches = trending_tracker.top(6)
         data_source = "database"
     except Exception as e:
         logger.warning(f"Database not available for home view: {e}")
@@ -48,7 +72,7 @@ def home_view(request):
             api_info = api_service._make_request('location')
             locations_count = api_info.get('info', {}).get('count', 126) if api_info else 126
             
-            recent_searches = []
+            trending_searches = []
             data_source = "api"
         except Exception as api_error:
             logger.error(f"API also failed: {api_error}")
@@ -56,37 +80,76 @@ def home_view(request):
             characters_count = 826
             episodes_count = 51
             locations_count = 126
-            recent_searches = []
+            trending_searches = []
             data_source = "fallback"
     
     context = {
         'characters_count': characters_count,
         'episodes_count': episodes_count,
         'locations_count': locations_count,
-        'recent_searches': recent_searches,
+        'trending_searches': trending_searches,
         'data_source': data_source,
     }
     return render(request, 'main/home.html', context)
 
 
+def _list_filters(request, *names):
+    """Параметры фильтрации списка из GET запроса"""
+    return {name: request.GET.get(name, '') for name in names}
+
+
+def _api_params(filters):
+    """Фильтры для запроса к API: пустые значения не передаются"""
+    return {name: value if value else None for name, value in filters.items()}
+
+
+def _list_facets(resource, filters):
+    """Фасеты формы фильтров списка или None (выключены или зеркало неполное)"""
+    # Счетчики частичного зеркала не совпали бы со списком из внешнего API
+    if not settings.LIST_FACETS or not FACET_SOURCES[resource].current().complete:
+        return None
+    result = facet_service.facets(resource, **_api_params(filters))
+    return {facet: values for facet, values in result['facets'].items() if values} or None
+
+
+def _facet_choices(choices, values):
+    """Варианты select с числом записей из фасета: (значение, "Метка (N)")"""
+    counts = {item['value']: item['count'] for item in values}
+    return [(value, f'{label} ({counts.get(value, 0)})') for value, label in choices]
+
+
+def _mirror_characters(page, filters):
+    """Страница списка из колоночного снимка зеркала в формате ответа API или None"""
+    # Частичное зеркало (детальные страницы, первые карточки списков) дало бы неполный список
+    if not settings.MIRROR_CHARACTER_LISTS or not character_columns.current().complete:
+        return None
+    page_size = 20  # как у внешнего API
+    count, results = character_columns.page(page, page_size, **_api_params(filters))
+    pages = -(-count // page_size)
+    return {
+        'info': {
+            'count': count,
+            'pages': pages,
+            'next': page + 1 if page < pages else None,
+            'prev': page - 1 if page > 1 else None,
+        },
+        'results': results,
+    }
+
+
+@cache_page_with_tags
 def characters_view(request):
     """Страница списка персонажей"""
-    # Получаем параметры фильтрации
-    name = request.GET.get('name', '')
-    status = request.GET.get('status', '')
-    species = request.GET.get('species', '')
-    gender = request.GET.get('gender', '')
-    page = request.GET.get('page', 1)
-
-    # Получаем данные из API
-    api_data = api_service.get_characters(
-        page=int(page),
-        name=name if name else None,
-        status=status if status else None,
-        species=species if species else None,
-        gender=gender if gender else None
-    )
-    
+    filters = _list_filters(request, 'name', 'status', 'species', 'gender')
+    page = int(request.GET.get('page', 1))
+    mirror_data = _mirror_characters(page, filters)
+    if mirror_data is not None:
+        return _render_characters(request, mirror_data, page, filters, from_mirror=True)
+    api_data = api_service.get_characters(page=page, **_api_params(filters))
+    return _render_characters(request, api_data, page, filters)
+
+
+def _render_characters(request, api_data, page, filters, from_mirror=False):
     characters = []
     pagination_info = {}
     
@@ -95,7 +158,9 @@ def characters_view(request):
         pagination_info = api_data.get('info', {})
         
         # Синхронизируем данные с локальной БД для популярных персонажей
-        for char_data in characters[:5]:  # Синхронизируем первых 5
+        # (карточки из зеркала синхронизировать незачем)
+        synced = [] if from_mirror else characters[:5]  # Синхронизируем первых 5
+        for char_data in synced:
             try:
                 sync_service.sync_character(char_data)
             except Exception as e:
@@ -104,26 +169,46 @@ def characters_view(request):
     context = {
         'characters': characters,
         'pagination_info': pagination_info,
-        'current_page': int(page),
-        'filters': {
-            'name': name,
-            'status': status,
-            'species': species,
-            'gender': gender,
-        },
+        'current_page': page,
+        'filters': filters,
         'status_choices': Character.STATUS_CHOICES,
         'gender_choices': Character.GENDER_CHOICES,
     }
-    return render(request, 'main/characters.html', context)
+    facets = _list_facets('characters', filters)
+    if facets:
+        context.update({
+            'status_choices': _facet_choices(Character.STATUS_CHOICES, facets.get('status', [])),
+            'gender_choices': _facet_choices(Character.GENDER_CHOICES, facets.get('gender', [])),
+            'species_options': facets.get('species', []),
+        })
+    response = render(request, 'main/characters.html', context)
+    if api_data:
+        # Кэшируем только успешный ответ API, чтобы не закрепить пустую страницу
+        tag_response(response, 'list:characters', *[f"character:{char.get('id')}" for char in characters])
+    return response
 
 
+def _fresh_character(character_id):
+    return sync_service.get_fresh(
+        Character.objects.select_related('origin', 'location').prefetch_related('episodes'),
+        character_id
+    )
+
+
+@cache_page_with_tags
 def character_detail_view(request, character_id):
     """Страница детальной информации о персонаже"""
+    # Свежая строка зеркала избавляет от запроса к API и повторной синхронизации
+    character = _fresh_character(character_id)
+    api_data = character.payload if character else api_service.get_character(character_id)
+    return _render_character_detail(request, character_id, api_data, character)
+
+
+def _render_character_detail(request, character_id, api_data, fresh=None):
     try:
-        # Сначала пытаемся получить из API
-        api_data = api_service.get_character(character_id)
-        
-        if not api_data:
+        if fresh is not None:
+            context = {'character_data': api_data, 'character': fresh, 'from_db': False}
+        elif not api_data:
             # Если API недоступен, ищем в локальной БД
             character = get_object_or_404(Character, api_id=character_id)
             context = {'character': character, 'from_db': True}
@@ -136,25 +221,24 @@ def character_detail_view(request, character_id):
                 logger.error(f"Error syncing character {character_id}: {e}")
                 context = {'character_data': api_data, 'from_db': False}
         
-        return render(request, 'main/character_detail.html', context)
+        response = render(request, 'main/character_detail.html', context)
+        return tag_response(response, f"character:{character_id}")
     except Exception as e:
         logger.error(f"Unexpected error in character_detail_view for {character_id}: {e}")
         # Fallback to 404 if something goes wrong
         raise Http404("Персонаж не найден")
 
 
+@cache_page_with_tags
 def episodes_view(request):
     """Страница списка эпизодов"""
-    name = request.GET.get('name', '')
-    episode = request.GET.get('episode', '')
-    page = request.GET.get('page', 1)
-
-    api_data = api_service.get_episodes(
-        page=int(page),
-        name=name if name else None,
-        episode=episode if episode else None
-    )
-    
+    filters = _list_filters(request, 'name', 'episode')
+    page = int(request.GET.get('page', 1))
+    api_data = api_service.get_episodes(page=page, **_api_params(filters))
+    return _render_episodes(request, api_data, page, filters)
+
+
+def _render_episodes(request, api_data, page, filters):
     episodes = []
     pagination_info = {}
     
@@ -165,21 +249,55 @@ def episodes_view(request):
     context = {
         'episodes': episodes,
         'pagination_info': pagination_info,
-        'current_page': int(page),
-        'filters': {
-            'name': name,
-            'episode': episode,
-        }
+        'current_page': page,
+        'filters': filters,
     }
-    return render(request, 'main/episodes.html', context)
+    response = render(request, 'main/episodes.html', context)
+    if api_data:
+        tag_response(response, 'list:episodes', *[f"episode:{ep.get('id')}" for ep in episodes])
+    return response
+
+
+def _fresh_episode(episode_id):
+    return sync_service.get_fresh(Episode.objects.all(), episode_id)
+
+
+def _cast_context(request, urls):
+    """Страница состава эпизода или жителей локации с карточками персонажей"""
+    page = cast_page(urls, request.GET.get('cast_page'))
+    return {'cast_page': page, 'cast': _load_cast(page.object_list)}
+
 
+def _load_cast(api_ids):
+    try:
+        return hydrate_characters(api_ids, api_service)
+    except Exception as e:
+        logger.error(f"Failed to hydrate characters {api_ids}: {e}")
+        return []
+
+
+async def _aload_cast(api_ids):
+    try:
+        return await ahydrate_characters(api_ids, async_api_service)
+    except Exception as e:
+        logger.error(f"Failed to hydrate characters {api_ids}: {e}")
+        return []
 
+
+@cache_page_with_tags
 def episode_detail_view(request, episode_id):
     """Страница детальной информации об эпизоде"""
+    episode = _fresh_episode(episode_id)
+    api_data = episode.payload if episode else api_service.get_episode(episode_id)
+    cast = _cast_context(request, api_data.get('characters')) if api_data else {}
+    return _render_episode_detail(request, episode_id, api_data, episode, cast)
+
+
+def _render_episode_detail(request, episode_id, api_data, fresh=None, cast=None):
     try:
-        api_data = api_service.get_episode(episode_id)
-        
-        if not api_data:
+        if fresh is not None:
+            context = {'episode_data': api_data, 'episode': fresh, 'from_db': False}
+        elif not api_data:
             episode = get_object_or_404(Episode, api_id=episode_id)
             context = {'episode': episode, 'from_db': True}
         else:
@@ -190,26 +308,24 @@ def episode_detail_view(request, episode_id):
                 logger.error(f"Error syncing episode {episode_id}: {e}")
                 context = {'episode_data': api_data, 'from_db': False}
         
-        return render(request, 'main/episode_detail.html', context)
+        context.update(cast or {})
+        response = render(request, 'main/episode_detail.html', context)
+        return tag_response(response, f"episode:{episode_id}")
     except Exception as e:
         logger.error(f"Unexpected error in episode_detail_view for {episode_id}: {e}")
         raise Http404("Эпизод не найден")
 
 
+@cache_page_with_tags
 def locations_view(request):
     """Страница списка локаций"""
-    name = request.GET.get('name', '')
-    type_filter = request.GET.get('type', '')
-    dimension = request.GET.get('dimension', '')
-    page = request.GET.get('page', 1)
-
-    api_data = api_service.get_locations(
-        page=int(page),
-        name=name if name else None,
-        type=type_filter if type_filter else None,
-        dimension=dimension if dimension else None
-    )
-    
+    filters = _list_filters(request, 'name', 'type', 'dimension')
+    page = int(request.GET.get('page', 1))
+    api_data = api_service.get_locations(page=page, **_api_params(filters))
+    return _render_locations(request, api_data, page, filters)
+
+
+def _render_locations(request, api_data, page, filters):
     locations = []
     pagination_info = {}
     
@@ -220,22 +336,39 @@ def locations_view(request):
     context = {
         'locations': locations,
         'pagination_info': pagination_info,
-        'current_page': int(page),
-        'filters': {
-            'name': name,
-            'type': type_filter,
-            'dimension': dimension,
-        }
+        'current_page': page,
+        'filters': filters,
     }
-    return render(request, 'main/locations.html', context)
+    facets = _list_facets('locations', filters)
+    if facets:
+        context.update({
+            'type_options': facets.get('type', []),
+            'dimension_options': facets.get('dimension', []),
+        })
+    response = render(request, 'main/locations.html', context)
+    if api_data:
+        tag_response(response, 'list:locations', *[f"location:{loc.get('id')}" for loc in locations])
+    return response
+
+
+def _fresh_location(location_id):
+    return sync_service.get_fresh(Location.objects.all(), location_id)
 
 
+@cache_page_with_tags
 def location_detail_view(request, location_id):
     """Страница детальной информации о локации"""
+    location = _fresh_location(location_id)
+    api_data = location.payload if location else api_service.get_location(location_id)
+    cast = _cast_context(request, api_data.get('residents')) if api_data else {}
+    return _render_location_detail(request, location_id, api_data, location, cast)
+
+
+def _render_location_detail(request, location_id, api_data, fresh=None, cast=None):
     try:
-        api_data = api_service.get_location(location_id)
-        
-        if not api_data:
+        if fresh is not None:
+            context = {'location_data': api_data, 'location': fresh, 'from_db': False}
+        elif not api_data:
             location = get_object_or_404(Location, api_id=location_id)
             context = {'location': location, 'from_db': True}
         else:
@@ -246,69 +379,111 @@ def location_detail_view(request, location_id):
                 logger.error(f"Error syncing location {location_id}: {e}")
                 context = {'location_data': api_data, 'from_db': False}
         
-        return render(request, 'main/location_detail.html', context)
+        context.update(cast or {})
+        response = render(request, 'main/location_detail.html', context)
+        return tag_response(response, f"location:{location_id}")
     except Exception as e:
         logger.error(f"Unexpected error in location_detail_view for {location_id}: {e}")
         raise Http404("Локация не найдена")
 
 
-def search_view(request):
-    """Универсальная страница поиска"""
+def local_search(search_type, query, limit=20):
+    """Поиск по локальной БД: полнотекстовый индекс, при недоступности - icontains"""
+    model = {'character': Character, 'episode': Episode, 'location': Location}.get(search_type)
+    if model is None:
+        return []
+    try:
+        local_results = fulltext_index.search(search_type, query, limit)
+    except Exception as e:
+        logger.warning(f"Full-text search unavailable, falling back to icontains: {e}")
+        local_results = model.objects.filter(name__icontains=query)[:limit]
+
+    if search_type == 'character':
+        return [{'id': char.api_id, 'name': char.name, 'status': char.status,
+                 'species': char.species, 'image': char.image} for char in local_results]
+    elif search_type == 'episode':
+        return [{'id': ep.api_id, 'name': ep.name, 'episode': ep.episode,
+                 'air_date': ep.air_date} for ep in local_results]
+    return [{'id': loc.api_id, 'name': loc.name, 'type': loc.type,
+             'dimension': loc.dimension} for loc in local_results]
+
+
+# Метод API и поля, по которым последовательно ищется запрос
+UPSTREAM_SEARCH = {
+    # Если ничего не найдено по имени, пробуем поиск по виду
+    'character': ('get_characters', ('name', 'species')),
+    # Если ничего не найдено по названию, пробуем поиск по номеру эпизода
+    'episode': ('get_episodes', ('name', 'episode')),
+    # Если ничего не найдено по названию, пробуем поиск по типу
+    'location': ('get_locations', ('name', 'type')),
+}
+
+
+def _search_params(request):
     query = request.GET.get('q', '')
     search_type = request.GET.get('type', 'character')
-    page = request.GET.get('page', 1)
-    
     # Преобразуем page в int сразу
     try:
-        page_int = int(page)
+        page = int(request.GET.get('page', 1))
     except (ValueError, TypeError):
-        page_int = 1
-    
+        page = 1
+    return query, search_type, page
+
+
+def _search_upstream(service, search_type, query, page):
+    """Поиск во внешнем API с перебором полей из UPSTREAM_SEARCH"""
+    if search_type not in UPSTREAM_SEARCH:
+        return None
+    method_name, fields = UPSTREAM_SEARCH[search_type]
+    api_data = None
+    for field in fields:
+        api_data = getattr(service, method_name)(page=page, **{field: query})
+        if api_data and api_data.get('results'):
+            break
+    return api_data
+
+
+async def _asearch_upstream(service, search_type, query, page):
+    """Асинхронный вариант _search_upstream"""
+    if search_type not in UPSTREAM_SEARCH:
+        return None
+    method_name, fields = UPSTREAM_SEARCH[search_type]
+    api_data = None
+    for field in fields:
+        api_data = await getattr(service, method_name)(page=page, **{field: query})
+        if api_data and api_data.get('results'):
+            break
+    return api_data
+
+
+def search_view(request):
+    """Универсальная страница поиска"""
+    query, search_type, page_int = _search_params(request)
+    api_data = None
+    api_failed = False
+    if query:
+        try:
+            api_data = _search_upstream(api_service, search_type, query, page_int)
+        except Exception as api_error:
+            logger.error(f"API search failed for {search_type} '{query}': {api_error}")
+            api_failed = True
+    return _render_search(request, query, search_type, page_int, api_data, api_failed)
+
+
+def _render_search(request, query, search_type, page_int, api_data, api_failed):
     results = []
     pagination_info = {}
     results_count = 0
     error_message = None
     data_source = "api"
+    suggestions = []
     
     try:
         if query:
-            api_data = None
-            
-            try:
-                if search_type == 'character':
-                    # Улучшенный поиск персонажей - пробуем разные параметры
-                    api_data = api_service.get_characters(page=page_int, name=query)
-                    # Если ничего не найдено по имени, пробуем поиск по виду
-                    if not api_data or not api_data.get('results'):
-                        api_data = api_service.get_characters(page=page_int, species=query)
-                elif search_type == 'episode':
-                    api_data = api_service.get_episodes(page=page_int, name=query)
-                    # Если ничего не найдено по названию, пробуем поиск по номеру эпизода
-                    if not api_data or not api_data.get('results'):
-                        api_data = api_service.get_episodes(page=page_int, episode=query)
-                elif search_type == 'location':
-                    api_data = api_service.get_locations(page=page_int, name=query)
-                    # Если ничего не найдено по названию, пробуем поиск по типу
-                    if not api_data or not api_data.get('results'):
-                        api_data = api_service.get_locations(page=page_int, type=query)
-                        
-            except Exception as api_error:
-                logger.error(f"API search failed for {search_type} '{query}': {api_error}")
+            if api_failed:
                 # Fallback to local database search
                 try:
-                    if search_type == 'character':
-                        local_results = Character.objects.filter(name__icontains=query)[:20]
-                        results = [{'id': char.api_id, 'name': char.name, 'status': char.status, 
-                                  'species': char.species, 'image': char.image} for char in local_results]
-                    elif search_type == 'episode':
-                        local_results = Episode.objects.filter(name__icontains=query)[:20]
-                        results = [{'id': ep.api_id, 'name': ep.name, 'episode': ep.episode, 
-                                  'air_date': ep.air_date} for ep in local_results]
-                    elif search_type == 'location':
-                        local_results = Location.objects.filter(name__icontains=query)[:20]
-                        results = [{'id': loc.api_id, 'name': loc.name, 'type': loc.type, 
-                                  'dimension': loc.dimension} for loc in local_results]
-                    
+                    results = local_search(search_type, query)
                     results_count = len(results)
                     data_source = "database"
                     error_message = "API недоступен, результаты из локальной базы данных"
@@ -316,6 +491,16 @@ def search_view(request):
                 except Exception as db_error:
                     logger.error(f"Database search also failed: {db_error}")
                     error_message = "Поиск временно недоступен. Попробуйте позже."
+
+            if not api_data and not results and data_source == "api":
+                # API ничего не вернул - ищем по полнотекстовому индексу локального зеркала
+                try:
+                    results = local_search(search_type, query)
+                    results_count = len(results)
+                    if results:
+                        data_source = "database"
+                except Exception as db_error:
+                    logger.error(f"Database search failed: {db_error}")
                     
             if api_data and 'results' in api_data:
                 results = api_data['results']
@@ -328,6 +513,9 @@ def search_view(request):
                     sync_service.save_search_history(query, search_type, results_count)
                 except Exception as e:
                     logger.warning(f"Failed to save search history: {e}")
+            elif query:
+                # Ничего не найдено - предлагаем похожие названия
+                suggestions = fuzzy_index.suggest(search_type, query)
 
     except Exception as e:
         logger.error(f"Unexpected error in search_view: {e}")
@@ -342,6 +530,7 @@ def search_view(request):
         'results_count': results_count,
         'error_message': error_message,
         'data_source': data_source,
+        'suggestions': suggestions,
         'search_types': [
             ('character', 'Персонажи'),
             ('episode', 'Эпизоды'),
@@ -352,9 +541,159 @@ def search_view(request):
 
 
 # API ViewSets
+def characters_with_relations():
+    """Персонажи для списков: локации одним JOIN, число эпизодов хранится в строке"""
+    return Character.objects.select_related('origin', 'location')
+
+
+class MirrorReadOnlyViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only API над локальным зеркалом.
+    
+    Параметры фильтрации проверяются соответствующим *FilterSerializer,
+    filter_lookups задает lookup ORM для каждого параметра.
+    """
+    permission_classes = [AllowAny]
+    # Ключ KeysetPagination (DEFAULT_PAGINATION_CLASS), покрыт составным индексом
+    keyset_ordering = ('name', 'id')
+    lookup_field = 'api_id'
+    # Списки сериализуются из .values(); False - обычный путь ModelSerializer
+    fast_list = True
+    detail_serializer_class = None
+    filter_serializer_class = None
+    filter_lookups: Dict[str, str] = {}
+    
+    def get_serializer_class(self):
+        if self.action == 'retrieve' and self.detail_serializer_class is not None:
+            return self.detail_serializer_class
+        return self.serializer_class
+    
+    def selected_fields(self) -> Optional[set]:
+        """Поля из ?fields= / ?expand= или None, если нужны все"""
+        if not hasattr(self, '_selected_fields'):
+            self._selected_fields = self.get_serializer_class().selected_fields(self.request)
+        return self._selected_fields
+    
+    def wants(self, field: str) -> bool:
+        """Нужно ли поле в ответе - аннотации и prefetch только для запрошенных"""
+        selected = self.selected_fields()
+        return selected is None or field in selected
+    
+    def project(self, queryset):
+        """Загружает из БД только колонки запрошенных полей"""
+        selected = self.selected_fields()
+        if selected is None:
+            return queryset
+        columns = self.get_serializer_class().source_columns(selected)
+        columns |= {'id', self.lookup_field, *self.keyset_ordering}
+        
+        # JOIN только к связям, чьи колонки действительно выводятся
+        model = queryset.model
+        related = {
+            column.split('__')[0] for column in columns
+            if '__' in column or model._meta.get_field(column).many_to_one
+        }
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+    
+    def list(self, request, *args, **kwargs):
+        """Список через FastRowSerializer: строки .values() без экземпляров моделей"""
+        if not self.fast_list:
+            return super().list(request, *args, **kwargs)
+        selected = self.selected_fields()
+        fast = fast_row_serializer(self.get_serializer_class(), frozenset(selected) if selected is not None else None)
+        columns = dict.fromkeys([*fast.columns, *self.keyset_ordering])
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(fast.serialize(queryset))
+        return self.get_paginated_response(fast.serialize(page))
+    
+    def filter_queryset(self, queryset):
+        serializer = self.filter_serializer_class(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = {
+            lookup: serializer.validated_data[param]
+            for param, lookup in self.filter_lookups.items()
+            if serializer.validated_data.get(param)
+        }
+        return queryset.filter(**filters)
+
+
+class CharacterViewSet(MirrorReadOnlyViewSet):
+    """Персонажи из локального зеркала"""
+    serializer_class = CharacterListSerializer
+    detail_serializer_class = CharacterDetailSerializer
+    filter_serializer_class = CharacterFilterSerializer
+    filter_lookups = {
+        'name': 'name__icontains',
+        'status': 'status',
+        'species': 'species__icontains',
+        'gender': 'gender',
+    }
+    
+    def get_queryset(self):
+        if self.action == 'retrieve':
+            queryset = Character.objects.select_related('origin', 'location')
+            if self.wants('episodes'):
+                queryset = queryset.prefetch_related('episodes')
+        else:
+            queryset = characters_with_relations()
+        return self.project(queryset)
+
+
+class EpisodeViewSet(MirrorReadOnlyViewSet):
+    """Эпизоды из локального зеркала"""
+    serializer_class = EpisodeSerializer
+    detail_serializer_class = EpisodeDetailSerializer
+    filter_serializer_class = EpisodeFilterSerializer
+    keyset_ordering = ('season', 'number', 'id')
+    filter_lookups = {
+        'name': 'name__icontains',
+        'episode': 'episode__icontains',
+        'season': 'season',
+        'aired_after': 'aired__gte',
+        'aired_before': 'aired__lte',
+    }
+    
+    def get_queryset(self):
+        queryset = Episode.objects.all()
+        if self.action == 'retrieve':
+            if self.wants('characters'):
+                queryset = queryset.prefetch_related(
+                    Prefetch('characters', queryset=characters_with_relations())
+                )
+        return self.project(queryset)
+
+
+class LocationViewSet(MirrorReadOnlyViewSet):
+    """Локации из локального зеркала"""
+    serializer_class = LocationSerializer
+    detail_serializer_class = LocationDetailSerializer
+    filter_serializer_class = LocationFilterSerializer
+    filter_lookups = {
+        'name': 'name__icontains',
+        'type': 'type__icontains',
+        'dimension': 'dimension__icontains',
+    }
+    
+    def get_queryset(self):
+        queryset = Location.objects.all()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(*[
+                Prefetch(relation, queryset=characters_with_relations())
+                for relation in ('origin_characters', 'current_characters')
+                if self.wants(relation)
+            ])
+        return self.project(queryset)
+
+
 class SearchAPIView(APIView):
     """Универсальный API для поиска"""
     permission_classes = [AllowAny]
+    throttle_classes = [SearchRateThrottle]
     
     def get(self, request):
         serializer = SearchRequestSerializer(data=request.query_params)
@@ -364,34 +703,253 @@ class SearchAPIView(APIView):
             search_type = data['search_type']
             page = data['page']
             
-            if search_type == 'character':
-                api_data = api_service.get_characters(page=page, name=query)
-            elif search_type == 'episode':
-                api_data = api_service.get_episodes(page=page, name=query)
-            elif search_type == 'location':
-                api_data = api_service.get_locations(page=page, name=query)
-            else:
+            if search_type not in UPSTREAM_SEARCH:
                 return Response(
                     {'error': 'Неверный тип поиска'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            if api_data:
-                # Сохраняем в историю поиска
-                results_count = api_data.get('info', {}).get('count', 0)
-                if results_count > 0:
-                    sync_service.save_search_history(query, search_type, results_count)
-                
-                return Response(api_data)
-            else:
-                return Response(
-                    {'error': 'API недоступен'}, 
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
+            method_name, _ = UPSTREAM_SEARCH[search_type]
+            api_data = getattr(api_service, method_name)(page=page, name=query)
+            payload, status_code = _search_api_payload(query, search_type, api_data)
+            return Response(payload, status=status_code)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _search_api_payload(query, search_type, api_data):
+    """Тело и статус ответа API поиска"""
+    if api_data:
+        # Сохраняем в историю поиска
+        results_count = api_data.get('info', {}).get('count', 0)
+        if results_count > 0:
+            sync_service.save_search_history(query, search_type, results_count)
+        else:
+            api_data = dict(api_data, suggestions=fuzzy_index.suggest(search_type, query))
+        
+        return api_data, status.HTTP_200_OK
+    return {
+        'error': 'API недоступен',
+        'suggestions': fuzzy_index.suggest(search_type, query),
+    }, status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+class TrendingAPIView(APIView):
+    """Популярные поисковые запросы"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        search_type = request.query_params.get('type') or None
+        if search_type not in (None, 'character', 'episode', 'location'):
+            return Response(
+                {'error': 'Неверный тип поиска'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        
+        return Response({'results': trending_tracker.top(limit, search_type)})
+
+
+class ChangesAPIView(APIView):
+    """Лента изменений зеркала: /api/changes/?since=<курсор>"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        try:
+            position = decode_cursor(request.query_params.get('since'))
+        except ValueError:
+            return Response({'error': 'Неверный курсор'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), 1000)
+        except ValueError:
+            limit = 100
+        
+        changes, last, has_more = change_feed.read(position, limit)
+        return Response({
+            'changes': changes,
+            # Без изменений курсор не меняется - клиент опрашивает с ним же
+            'next': encode_cursor(last) if last else None,
+            'has_more': has_more,
+        })
+
+
+class FacetsAPIView(APIView):
+    """Фасеты фильтров: /api/facets/?resource=characters&status=dead"""
+    permission_classes = [AllowAny]
+    filter_serializers = {
+        'characters': CharacterFilterSerializer,
+        'locations': LocationFilterSerializer,
+    }
+    
+    def get(self, request):
+        resource = request.query_params.get('resource', 'characters')
+        if resource not in FACET_SOURCES:
+            return Response({'error': 'Неверный ресурс'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.filter_serializers[resource](data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        filters = {name: value for name, value in serializer.validated_data.items() if name != 'page'}
+        return Response({'resource': resource, 'filters': filters, **facet_service.facets(resource, **filters)})
+
+
+class BatchAPIView(APIView):
+    """Пакет GET запросов к API за один вызов: POST {"requests": [{"id", "path", "params"}]}"""
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        items = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Ожидается непустой список requests'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > batch_executor.max_items:
+            return Response(
+                {'error': f'Не больше {batch_executor.max_items} запросов в пакете'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'responses': batch_executor.execute(request._request, items)})
+
+
+@cache_control(public=True, max_age=300)
+def suggest_view(request):
+    """Автодополнение названий из префиксного индекса в памяти (без API и БД)"""
+    query = request.GET.get('q', '').strip()[:100]
+    search_type = request.GET.get('type', 'character')
+    if search_type not in ('character', 'episode', 'location'):
+        return JsonResponse({'error': 'Неверный тип поиска'}, status=400)
+
+    return JsonResponse({
+        'q': query,
+        'suggestions': autocomplete_index.complete(search_type, query),
+    })
+
+
+@require_GET
+def export_view(request, resource, fmt):
+    """Потоковая выгрузка зеркала: /api/export/characters.ndjson, ...csv"""
+    if resource not in EXPORTS or fmt not in EXPORT_FORMATS:
+        raise Http404("Неизвестный формат выгрузки")
+    try:
+        updated_since = parse_updated_since(request.GET.get('updated_since'))
+    except ValueError:
+        return JsonResponse({'error': 'Неверный updated_since, ожидается дата ISO 8601'}, status=400)
+    
+    chunks = MirrorExport(resource, updated_since).stream(fmt)
+    gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if gzip:
+        chunks = compress_sequence(chunks)
+    if isinstance(request, ASGIRequest):
+        chunks = aiterate(chunks)
+    
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{resource}.{fmt}"'
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+# ====== ASYNC VIEWS (ASGI, ASYNC_VIEWS=True) ======
+# Те же страницы, но запрос к внешнему API не блокирует воркер: пока ответ
+# не пришел, event loop обслуживает другие запросы. Работа с БД и рендер
+# шаблонов остаются синхронными и выполняются через sync_to_async.
+
+@cache_page_with_tags
+async def characters_view_async(request):
+    filters = _list_filters(request, 'name', 'status', 'species', 'gender')
+    page = int(request.GET.get('page', 1))
+    mirror_data = await sync_to_async(_mirror_characters)(page, filters)
+    if mirror_data is not None:
+        return await sync_to_async(_render_characters)(request, mirror_data, page, filters, True)
+    api_data = await async_api_service.get_characters(page=page, **_api_params(filters))
+    return await sync_to_async(_render_characters)(request, api_data, page, filters)
+
+
+@cache_page_with_tags
+async def character_detail_view_async(request, character_id):
+    character = await sync_to_async(_fresh_character)(character_id)
+    api_data = character.payload if character else await async_api_service.get_character(character_id)
+    return await sync_to_async(_render_character_detail)(request, character_id, api_data, character)
+
+
+@cache_page_with_tags
+async def episodes_view_async(request):
+    filters = _list_filters(request, 'name', 'episode')
+    page = int(request.GET.get('page', 1))
+    api_data = await async_api_service.get_episodes(page=page, **_api_params(filters))
+    return await sync_to_async(_render_episodes)(request, api_data, page, filters)
+
+
+@cache_page_with_tags
+async def episode_detail_view_async(request, episode_id):
+    episode = await sync_to_async(_fresh_episode)(episode_id)
+    api_data = episode.payload if episode else await async_api_service.get_episode(episode_id)
+    cast = {}
+    if api_data:
+        page = cast_page(api_data.get('characters'), request.GET.get('cast_page'))
+        cast = {'cast_page': page, 'cast': await _aload_cast(page.object_list)}
+    return await sync_to_async(_render_episode_detail)(request, episode_id, api_data, episode, cast)
+
+
+@cache_page_with_tags
+async def locations_view_async(request):
+    filters = _list_filters(request, 'name', 'type', 'dimension')
+    page = int(request.GET.get('page', 1))
+    api_data = await async_api_service.get_locations(page=page, **_api_params(filters))
+    return await sync_to_async(_render_locations)(request, api_data, page, filters)
+
+
+@cache_page_with_tags
+async def location_detail_view_async(request, location_id):
+    location = await sync_to_async(_fresh_location)(location_id)
+    api_data = location.payload if location else await async_api_service.get_location(location_id)
+    cast = {}
+    if api_data:
+        page = cast_page(api_data.get('residents'), request.GET.get('cast_page'))
+        cast = {'cast_page': page, 'cast': await _aload_cast(page.object_list)}
+    return await sync_to_async(_render_location_detail)(request, location_id, api_data, location, cast)
+
+
+async def search_view_async(request):
+    query, search_type, page_int = _search_params(request)
+    api_data = None
+    api_failed = False
+    if query:
+        try:
+            api_data = await _asearch_upstream(async_api_service, search_type, query, page_int)
+        except Exception as api_error:
+            logger.error(f"API search failed for {search_type} '{query}': {api_error}")
+            api_failed = True
+    return await sync_to_async(_render_search)(request, query, search_type, page_int, api_data, api_failed)
+
+
+@require_GET
+async def search_api_view_async(request):
+    """Асинхронный вариант SearchAPIView (DRF не поддерживает async views)"""
+    throttle = SearchRateThrottle()
+    if not await sync_to_async(throttle.allow_request)(request, None):
+        response = JsonResponse({'detail': 'Слишком много запросов'}, status=status.HTTP_429_TOO_MANY_REQUESTS,
+                                json_dumps_params={'ensure_ascii': False})
+        response['Retry-After'] = str(math.ceil(throttle.wait()))
+        return response
+    serializer = SearchRequestSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    query = data['query']
+    search_type = data['search_type']
+    if search_type not in UPSTREAM_SEARCH:
+        return JsonResponse({'error': 'Неверный тип поиска'}, status=status.HTTP_400_BAD_REQUEST)
+
+    method_name, _ = UPSTREAM_SEARCH[search_type]
+    api_data = await getattr(async_api_service, method_name)(page=data['page'], name=query)
+    payload, status_code = await sync_to_async(_search_api_payload)(query, search_type, api_data)
+    return JsonResponse(payload, status=status_code, json_dumps_params={'ensure_ascii': False})
+
+
 def health_check(request):
     """Health check endpoint for monitoring and debugging"""
     try:
@@ -441,6 +999,9 @@ def health_check(request):
             "api_service": {
                 "status": api_status
             },
+            "fragment_cache": fragment_cache.stats(),
+            "search_throttle": throttle_stats.stats(),
+            "snapshot": snapshot_store.stats(),
             "settings": {
                 "debug": settings.DEBUG,
                 "allowed_hosts": settings.ALLOWED_HOSTS,
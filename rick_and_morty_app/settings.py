@@ -65,8 +65,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # For static files in production
+    'main.middleware.AsyncWhiteNoiseMiddleware',  # For static files in production
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,7 +78,7 @@ MIDDLEWARE = [
 
 # Add database init middleware only in production
 if os.environ.get('RENDER'):
-    MIDDLEWARE.insert(2, 'main.middleware.DatabaseInitMiddleware')
+    MIDDLEWARE.insert(3, 'main.middleware.DatabaseInitMiddleware')
 
 ROOT_URLCONF = 'rick_and_morty_app.urls'
 
@@ -115,7 +116,7 @@ elif os.environ.get('RENDER'):
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': '/tmp/db.sqlite3',  # Use /tmp for writable storage on Render
+            'NAME': os.environ.get('SQLITE_PATH', '/tmp/db.sqlite3'),  # Use /tmp for writable storage on Render
         }
     }
 else:
@@ -123,10 +124,49 @@ else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
         }
     }
 
+# Tuned SQLite profile for several workers (opt-in): WAL lets readers run alongside the writer,
+# IMMEDIATE transactions take the write lock up front and wait busy_timeout instead of failing
+SQLITE_TUNED = os.environ.get('SQLITE_TUNED', 'False').lower() in ('true', '1', 'yes')
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))  # секунды ожидания блокировки
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))  # байты
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -32000))  # отрицательное значение - КиБ на соединение
+
+if SQLITE_TUNED and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # init_command выполняется на каждом новом соединении
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+            f'PRAGMA cache_size={SQLITE_CACHE_SIZE};'
+            'PRAGMA temp_store=MEMORY;'
+            f'PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}'
+        ),
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_BUSY_TIMEOUT,
+    }
+
+# Snapshot serving (SQLite): mirror reads go to an immutable copy that sync_data publishes
+# into SNAPSHOT_DIR (VACUUM INTO + atomic symlink swap); writes stay on the default database
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', '')
+SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', 2))  # файлов снимков на диске
+
+if SNAPSHOT_DIR and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['snapshot'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{os.path.join(SNAPSHOT_DIR, 'current.sqlite3')}?mode=ro&immutable=1",
+        'OPTIONS': {
+            'init_command': f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};PRAGMA cache_size={SQLITE_CACHE_SIZE}',
+        },
+        # В тестах снимок - та же тестовая база
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['main.routers.SnapshotRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -174,14 +214,81 @@ try:
 except NameError:
     RICK_AND_MORTY_API_BASE_URL = os.environ.get('RICK_AND_MORTY_API_BASE_URL', 'https://rickandmortyapi.com/api/')
 
+# Async upstream views for ASGI (uvicorn); under WSGI keep False
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() in ('true', '1', 'yes')
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get('UPSTREAM_MAX_CONNECTIONS', 100))  # пул httpx на процесс
+
+# Detail pages render from the local mirror while the row is fresher than this
+MIRROR_FRESHNESS_SECONDS = int(os.environ.get('MIRROR_FRESHNESS_SECONDS', 86400))  # 0 - всегда обращаться к API
+CAST_PAGE_SIZE = int(os.environ.get('CAST_PAGE_SIZE', 24))  # карточек персонажей на странице эпизода/локации
+# Character list pages are filtered in memory (columnar snapshot) once the mirror is fully synced
+# (sync_data records the upstream info.count in MirrorCoverage; until the mirror has as many rows, lists use the API)
+MIRROR_CHARACTER_LISTS = os.environ.get('MIRROR_CHARACTER_LISTS', 'False').lower() in ('true', '1', 'yes')
+# Filter forms of character/location lists show mirror counts per option (main.facets)
+LIST_FACETS = os.environ.get('LIST_FACETS', 'False').lower() in ('true', '1', 'yes')
+
+# Cache configuration
+# По умолчанию кэш локален для процесса; для нескольких воркеров задайте общий кэш
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+elif os.environ.get('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR'),
+        }
+    }
+
+# Full-page cache for anonymous HTML views
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 300))  # секунды в серверном кэше
+PAGE_CACHE_MAX_AGE = int(os.environ.get('PAGE_CACHE_MAX_AGE', 60))  # Cache-Control: max-age
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 3600))  # карточки сущностей
+
+# Search history write-behind buffer
+SEARCH_HISTORY_BUFFER_SIZE = int(os.environ.get('SEARCH_HISTORY_BUFFER_SIZE', 50))
+SEARCH_HISTORY_FLUSH_INTERVAL = int(os.environ.get('SEARCH_HISTORY_FLUSH_INTERVAL', 10))  # секунды
+SEARCH_HISTORY_RETENTION_DAYS = int(os.environ.get('SEARCH_HISTORY_RETENTION_DAYS', 30))
+
+# Trending searches (Space-Saving sketch shared between workers)
+TRENDING_CAPACITY = int(os.environ.get('TRENDING_CAPACITY', 200))
+TRENDING_PERSIST_INTERVAL = int(os.environ.get('TRENDING_PERSIST_INTERVAL', 60))  # секунды
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 24))
+
+# Mirror API counts: exact (COUNT(*)), approximate (DB statistics / capped COUNT) or none
+API_COUNT_MODE = os.environ.get('API_COUNT_MODE', 'exact')
+API_APPROXIMATE_COUNT_CAP = int(os.environ.get('API_APPROXIMATE_COUNT_CAP', 1000))
+
+# Change feed: rows younger than this are held back (transactions may still be committing)
+CHANGES_SETTLE_SECONDS = int(os.environ.get('CHANGES_SETTLE_SECONDS', 5))
+
+# Batch endpoint: sub-requests per call and threads for upstream (search) sub-requests
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 20))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 8))
+
+# Search API throttling: token bucket per client (known X-Api-Key or IP) in the shared cache, 0 capacity disables it
+SEARCH_THROTTLE_CAPACITY = float(os.environ.get('SEARCH_THROTTLE_CAPACITY', 30))
+SEARCH_THROTTLE_REFILL_RATE = float(os.environ.get('SEARCH_THROTTLE_REFILL_RATE', 0.5))  # токенов в секунду
+SEARCH_THROTTLE_HIT_COST = float(os.environ.get('SEARCH_THROTTLE_HIT_COST', 0.2))  # ответ уже в кэше API
+SEARCH_THROTTLE_MISS_COST = float(os.environ.get('SEARCH_THROTTLE_MISS_COST', 1))  # запрос во внешний API
+# API keys with their own bucket (comma separated); any other X-Api-Key shares the IP bucket
+SEARCH_API_KEYS = {key.strip() for key in os.environ.get('SEARCH_API_KEYS', '').split(',') if key.strip()}
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'main.pagination.KeysetPagination',
     'PAGE_SIZE': 20,
+    # orjson; HTML-интерфейс DRF только для разработки
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
-    ]
+        'main.renderers.ORJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    # Trusted reverse proxies in front of the app (1 on Render): the client IP for throttling is
+    # taken from that hop of X-Forwarded-For; 0 - REMOTE_ADDR, the header is ignored
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
 # Default primary key field type
@@ -225,6 +332,10 @@ LOGGING = {
             'level': 'DEBUG' if DEBUG else 'INFO',
             'propagate': False,
         },
+        # httpx пишет каждый запрос на уровне INFO
+        'httpx': {
+            'level': 'WARNING',
+        },
     },
 }
 
@@ -8,5 +8,15 @@ echo "Checking database health..."
 python debug_migration.py || echo "Debug check failed, continuing..."
 
 # Start the application directly
+# Те же значения, что принимает settings.ASYNC_VIEWS
+case "${ASYNC_VIEWS,,}" in
+    true|1|yes) ASYNC_SERVER=1 ;;
+esac
+if [ -n "$ASYNC_SERVER" ]; then
+    # ASGI: один процесс держит сотни запросов к внешнему API одновременно
+    echo "Starting uvicorn server (ASGI)..."
+    exec uvicorn rick_and_morty_app.asgi:application --host 0.0.0.0 --port $PORT --workers 1
+fi
+
 echo "Starting gunicorn server..."
 exec gunicorn rick_and_morty_app.wsgi:application --bind 0.0.0.0:$PORT --workers 1 --timeout 120
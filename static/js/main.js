@@ -174,16 +174,76 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         }
 
-        // Live search suggestions with debouncing
+        // Live search suggestions with debouncing and request cancellation
         if (searchInput) {
+            // Unwrapped fetch: the API status wrapper below would show an alert on every keystroke
+            const nativeFetch = window.fetch.bind(window);
+            const suggestMenu = document.createElement('ul');
+            suggestMenu.className = 'dropdown-menu search-suggestions';
+            searchInput.setAttribute('autocomplete', 'off');
+            searchInput.parentElement.appendChild(suggestMenu);
+
             let searchTimeout;
+            let suggestController = null;
+
+            function hideSuggestions() {
+                suggestMenu.classList.remove('show');
+                suggestMenu.innerHTML = '';
+            }
+
+            function renderSuggestions(suggestions) {
+                suggestMenu.innerHTML = '';
+                suggestions.forEach(name => {
+                    const item = document.createElement('li');
+                    const button = document.createElement('button');
+                    button.type = 'button';
+                    button.className = 'dropdown-item';
+                    button.textContent = name;
+                    // mousedown fires before blur hides the menu
+                    button.addEventListener('mousedown', function(e) {
+                        e.preventDefault();
+                        searchInput.value = name;
+                        hideSuggestions();
+                        showSearchLoading();
+                        searchForm.submit();
+                    });
+                    item.appendChild(button);
+                    suggestMenu.appendChild(item);
+                });
+                suggestMenu.classList.toggle('show', suggestions.length > 0);
+            }
+
             searchInput.addEventListener('input', function() {
                 clearTimeout(searchTimeout);
+                if (suggestController) {
+                    suggestController.abort();
+                    suggestController = null;
+                }
+
+                const query = this.value.trim();
+                if (!query) {
+                    hideSuggestions();
+                    return;
+                }
+
                 searchTimeout = setTimeout(() => {
-                    // Here you could add live search suggestions
-                    console.log('🔍 Search query:', this.value);
-                }, 300);
+                    suggestController = new AbortController();
+                    const params = new URLSearchParams({
+                        q: query,
+                        type: searchType ? searchType.value : 'character'
+                    });
+                    nativeFetch(`/api/suggest/?${params}`, { signal: suggestController.signal })
+                        .then(response => response.ok ? response.json() : { suggestions: [] })
+                        .then(data => renderSuggestions(data.suggestions || []))
+                        .catch(error => {
+                            if (error.name !== 'AbortError') {
+                                console.warn('🔍 Suggestions failed:', error);
+                            }
+                        });
+                }, 150);
             });
+
+            searchInput.addEventListener('blur', hideSuggestions);
         }
     }
 